@@ -1,8 +1,5 @@
 import streamlit as st
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
 from pydantic import BaseModel, Field
-import PyPDF2
 import os
 from pathlib import Path
 import tempfile
@@ -10,14 +7,28 @@ import base64
 import json
 import re
 import io
-import pandas as pd
-from docx import Document
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
+import shutil
 import csv
+import time
+import hashlib
+import threading
+import uuid
+import weakref
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.json_scan import find_json_span
+from backend.app.pdf_pages import page_cache
+from backend.app.pdf_text import extract_in_pool
+from backend.app.analytics import class_analytics
+from backend.app.results_store import results_store
+from backend.app.services.ingest import list_submissions, read_submission
+from backend.app.session_store import BlobEvicted, StoredBlob, session_store
+
+# Heavy dependencies (google.generativeai, PyPDF2, ReportLab, python-docx) are
+# imported inside the functions that need them, so the first page render does
+# not wait on modules that only the grading/export stages use.
 
 # Set page config
 st.set_page_config(
@@ -26,7 +37,11 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize session state
+# Initialize session state. PDFs, extracted text and rendered results are kept
+# in the session store on disk (see backend/app/session_store.py); session
+# state only holds their handles.
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if 'api_key' not in st.session_state:
     st.session_state.api_key = None
 if 'rubric_improvements' not in st.session_state:
@@ -49,6 +64,25 @@ if 'results_pdf' not in st.session_state:
     st.session_state.results_pdf = None
 if 'results_dict' not in st.session_state:
     st.session_state.results_dict = None
+if 'grading_jobs' not in st.session_state:
+    st.session_state.grading_jobs = []
+if 'result_files' not in st.session_state:
+    st.session_state.result_files = {}
+# Uploads already hashed and stored, by file_id, so reruns don't read them again
+if 'upload_digests' not in st.session_state:
+    st.session_state.upload_digests = {}
+if 'stored_uploads' not in st.session_state:
+    st.session_state.stored_uploads = {}
+session_store.touch(st.session_state.session_id)
+
+# Models tried in order; a result is only re-graded by the next model if it fails validation
+MODEL_TIERS = [m.strip() for m in os.environ.get("GRADER_MODEL_TIERS", "gemini-2.0-flash-lite,gemini-2.0-flash").split(",") if m.strip()]
+# Bump when the grading prompt template changes; stored with each result
+PROMPT_VERSION = '1'
+# Gradings that run at once in the background, shared by all sessions
+GRADING_WORKERS = int(os.environ.get("GRADER_STREAMLIT_WORKERS", 4))
+# Submissions of an uploaded ZIP read ahead of grading; the rest wait in the ZIP
+ARCHIVE_READ_AHEAD = 2 * GRADING_WORKERS
 
 # Define Pydantic models for structured output
 class ImprovementSuggestion(BaseModel):
@@ -70,77 +104,162 @@ class GradingFeedback(BaseModel):
     strengths: list = Field(..., description="List of strengths in the submission")
     point_deductions: list = Field(..., description="Areas where points were deducted")
     concept_improvements: list = Field(..., description="Suggestions to better grasp concepts")
+    truncated: bool = Field(False, description="The model's response was cut off and recovered; items after the cut are missing")
 
-def extract_text_from_pdf(pdf_file):
-    """Extract text from a PDF file."""
-    text = ""
+def start_text_extraction(pdf_file):
+    """Start extracting a PDF's text in a worker process; returns a future (see backend/app/pdf_text.py)."""
+    source = str(pdf_file) if isinstance(pdf_file, Path) else pdf_file.getvalue()
+    return extract_in_pool(source, require_text=False)
+
+def extraction_result(future):
+    """Wait for a started extraction; return the text, or None after reporting the error."""
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        return future.result()
     except Exception as e:
         st.error(f"Error extracting text from PDF: {str(e)}")
         return None
-    return text
 
-def analyze_rubric(assignment_rubric_text, api_key):
-    """Analyze the rubric/assignment to provide improvement recommendations and grading advice."""
-    try:
-        # Configure the API
-        genai.configure(api_key=api_key)
-        
-        # Initialize the model with Gemini 2.0 Flash
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        # Create the prompt
-        prompt = f"""
-        You are an expert educator reviewing a grading rubric and assignment. 
-        Please analyze the following assignment and rubric to provide:
-        
-        1. RUBRIC IMPROVEMENT RECOMMENDATIONS: Analyze the rubric critically and suggest specific improvements 
-           that would make it clearer and more effective for consistent grading. Focus on structural improvements, 
-           clarity enhancements, and adding specific criteria that may be missing.
-        
-        2. GRADING ADVICE: Provide specific advice for any AI or human grader on how to interpret and apply 
-           this rubric consistently. Highlight key points to look for in submissions, potential pitfalls or 
-           misconceptions, and advice for fair evaluation.
-        
-        Assignment and Rubric:
-        {assignment_rubric_text}
-        
-        Format your response with clear section headers "## RUBRIC IMPROVEMENT RECOMMENDATIONS" and "## GRADING ADVICE".
-        Be specific, actionable, and concise in your recommendations.
-        """
-        
-        # Generate response
-        response = model.generate_content(prompt)
-        response_text = response.text
-        
-        # Extract the two sections
-        improvements_section = ""
-        advice_section = ""
-        
-        # Extract Rubric Improvement Recommendations
-        improvements_match = re.search(r'## RUBRIC IMPROVEMENT RECOMMENDATIONS(.*?)(?=## GRADING ADVICE|\Z)', response_text, re.DOTALL)
-        if improvements_match:
-            improvements_section = improvements_match.group(1).strip()
-        
-        # Extract Grading Advice
-        advice_match = re.search(r'## GRADING ADVICE(.*)', response_text, re.DOTALL)
-        if advice_match:
-            advice_section = advice_match.group(1).strip()
-        
-        return {
-            "improvements": improvements_section,
-            "advice": advice_section,
-            "full_response": response_text
-        }
-    except Exception as e:
-        st.error(f"Error analyzing rubric: {str(e)}")
-        return None
+class SpeculativeTasks:
+    """
+    Work started before a button asks for it, keyed by file content.
+
+    Extraction and rubric analysis are started as soon as the files are
+    uploaded, and the buttons pick up the running (or finished) future
+    instead of starting from scratch. Entries are shared by reruns and
+    sessions; the oldest finished ones are dropped past ``max_entries``.
+    """
+
+    def __init__(self, max_entries=64):
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculative")
+        self.max_entries = max_entries
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_start(self, key, start):
+        """Return the future for ``key``, calling ``start()`` to create it if there is none."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = self._futures[key] = start()
+                for old_key in [k for k, f in self._futures.items() if f.done()][:max(0, len(self._futures) - self.max_entries)]:
+                    del self._futures[old_key]
+            else:
+                self._futures.move_to_end(key)
+            return future
+
+    def discard(self, key, future):
+        """Forget a failed future so the next request for ``key`` starts over."""
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+@st.cache_resource
+def speculative_tasks():
+    return SpeculativeTasks()
+
+def file_digest(pdf_file):
+    """Hash of an uploaded file's (or sample file's) content, computed once per upload."""
+    if isinstance(pdf_file, Path):
+        return sample_file_digest(str(pdf_file), pdf_file.stat().st_mtime)
+    digests = st.session_state.upload_digests
+    if pdf_file.file_id not in digests:
+        digests[pdf_file.file_id] = hashlib.sha256(pdf_file.getvalue()).hexdigest()
+    return digests[pdf_file.file_id]
+
+def speculative_extraction(pdf_file):
+    """Return the future for a file's text, starting the extraction if it hasn't been started."""
+    return speculative_tasks().get_or_start(("text", file_digest(pdf_file)), lambda: start_text_extraction(pdf_file))
+
+def speculative_rubric_analysis(assignment_file, api_key):
+    """Return the cache key and future for an assignment's rubric analysis, starting it in the background if needed."""
+    extraction = speculative_extraction(assignment_file)
+
+    def run():
+        assignment_text = extraction.result()
+        if not assignment_text:
+            raise ValueError("Failed to extract text from the assignment file.")
+        return request_rubric_analysis(assignment_text, api_key)
+
+    tasks = speculative_tasks()
+    key = ("rubric", file_digest(assignment_file))
+    return key, tasks.get_or_start(key, lambda: tasks.executor.submit(run))
+
+def request_rubric_analysis(assignment_rubric_text, api_key):
+    """Ask Gemini to analyze the rubric/assignment; raises on failure, so it can run off the script thread."""
+    import google.generativeai as genai
+
+    # Configure the API
+    genai.configure(api_key=api_key)
+    
+    # Initialize the model with Gemini 2.0 Flash
+    model = genai.GenerativeModel('gemini-2.0-flash')
+    
+    # Create the prompt
+    prompt = f"""
+    You are an expert educator reviewing a grading rubric and assignment. 
+    Please analyze the following assignment and rubric to provide:
+    
+    1. RUBRIC IMPROVEMENT RECOMMENDATIONS: Analyze the rubric critically and suggest specific improvements 
+       that would make it clearer and more effective for consistent grading. Focus on structural improvements, 
+       clarity enhancements, and adding specific criteria that may be missing.
+    
+    2. GRADING ADVICE: Provide specific advice for any AI or human grader on how to interpret and apply 
+       this rubric consistently. Highlight key points to look for in submissions, potential pitfalls or 
+       misconceptions, and advice for fair evaluation.
+    
+    Assignment and Rubric:
+    {assignment_rubric_text}
+    
+    Format your response with clear section headers "## RUBRIC IMPROVEMENT RECOMMENDATIONS" and "## GRADING ADVICE".
+    Be specific, actionable, and concise in your recommendations.
+    """
+    
+    # Generate response
+    response = model.generate_content(prompt)
+    response_text = response.text
+    
+    # Extract the two sections
+    improvements_section = ""
+    advice_section = ""
+    
+    # Extract Rubric Improvement Recommendations
+    improvements_match = re.search(r'## RUBRIC IMPROVEMENT RECOMMENDATIONS(.*?)(?=## GRADING ADVICE|\Z)', response_text, re.DOTALL)
+    if improvements_match:
+        improvements_section = improvements_match.group(1).strip()
+    
+    # Extract Grading Advice
+    advice_match = re.search(r'## GRADING ADVICE(.*)', response_text, re.DOTALL)
+    if advice_match:
+        advice_section = advice_match.group(1).strip()
+    
+    return {
+        "improvements": improvements_section,
+        "advice": advice_section,
+        "full_response": response_text
+    }
 
-def grade_assignment(assignment_text, solution_text, submission_text, api_key, include_grading_advice=False, grading_advice=None):
+def notify(notices, level, message):
+    """Show a message, or add it to ``notices`` as (level, message) when grading runs in a background job."""
+    if notices is None:
+        getattr(st, level)(message)
+    else:
+        notices.append((level, message))
+
+def add_usage(usage, model_name, response):
+    """Add a response's model and token counts to a usage dict, if one is being collected."""
+    if usage is None:
+        return
+    metadata = getattr(response, 'usage_metadata', None)
+    if model_name not in usage.setdefault('models', []):
+        usage['models'].append(model_name)
+    usage['input_tokens'] = usage.get('input_tokens', 0) + (getattr(metadata, 'prompt_token_count', 0) or 0)
+    usage['output_tokens'] = usage.get('output_tokens', 0) + (getattr(metadata, 'candidates_token_count', 0) or 0)
+
+def grade_assignment(assignment_text, solution_text, submission_text, api_key, include_grading_advice=False, grading_advice=None, model_name='gemini-2.0-flash', usage=None, notices=None):
     """Grade the assignment using Gemini with structured output."""
+    import google.generativeai as genai
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
     try:
         # Configure the API
         genai.configure(api_key=api_key)
@@ -161,7 +280,7 @@ def grade_assignment(assignment_text, solution_text, submission_text, api_key, i
         }
         
         model = genai.GenerativeModel(
-            model_name='gemini-2.0-flash',
+            model_name=model_name,
             generation_config=generation_config,
             safety_settings=safety_settings
         )
@@ -224,36 +343,362 @@ def grade_assignment(assignment_text, solution_text, submission_text, api_key, i
         # Generate structured response
         response = model.generate_content(prompt)
         text_response = response.text
+        add_usage(usage, model_name, response)
         
-        # Extract the JSON part from the response
-        json_match = re.search(r'```json\s*(.*?)\s*```', text_response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Try to find JSON without code blocks
-            json_match = re.search(r'\{.*\}', text_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                # If no JSON found, return the raw text
-                st.warning("Could not find valid JSON in the response. Using raw text instead.")
-                return {"raw_response": text_response}
+        # Extract the first JSON object from the response (repairing truncation)
+        found = find_json_span(text_response)
+        if found is None:
+            # If no JSON found, return the raw text
+            notify(notices, "warning", "Could not find valid JSON in the response. Using raw text instead.")
+            return {"raw_response": text_response}
+        value = found.value
+        if found.repaired:
+            notify(notices, "warning", "The model response was cut off; grading results were recovered from the truncated JSON.")
+            value = dict(value, truncated=True)
         
         try:
-            # Parse the JSON
-            data = json.loads(json_str)
             # Validate with Pydantic
-            grading_feedback = GradingFeedback(**data)
+            grading_feedback = GradingFeedback(**value)
             return grading_feedback
         except Exception as e:
-            st.error(f"Error parsing structured response: {str(e)}")
-            st.warning("Falling back to raw response due to parsing error.")
+            notify(notices, "error", f"Error parsing structured response: {str(e)}")
+            notify(notices, "warning", "Falling back to raw response due to parsing error.")
             return {"raw_response": text_response}
             
     except Exception as e:
-        st.error(f"Error grading assignment: {str(e)}")
+        notify(notices, "error", f"Error grading assignment: {str(e)}")
         return None
 
+def score_discrepancy(result):
+    """Return a description of the problem if the deductions don't add up to 100 - grade, else None."""
+    total_deducted = sum(deduction.get('points', 0) for deduction in result.point_deductions)
+    if total_deducted != 100 - result.numerical_grade:
+        return f"deductions total {total_deducted} but the grade is {result.numerical_grade}"
+    return None
+
+def grade_with_escalation(assignment_text, solution_text, submission_text, api_key, include_grading_advice=False, grading_advice=None, usage=None, notices=None):
+    """Grade with the cheapest model tier first, moving to the next tier only if the result is invalid."""
+    result = None
+    for i, model_name in enumerate(MODEL_TIERS):
+        attempt = grade_assignment(
+            assignment_text,
+            solution_text,
+            submission_text,
+            api_key,
+            include_grading_advice=include_grading_advice,
+            grading_advice=grading_advice,
+            model_name=model_name,
+            usage=usage,
+            notices=notices
+        )
+        if isinstance(attempt, GradingFeedback):
+            result = attempt
+            problem = score_discrepancy(attempt)
+            if problem is None:
+                return attempt
+        elif result is None:
+            result = attempt
+            problem = "the response could not be parsed"
+        else:
+            continue
+        if i < len(MODEL_TIERS) - 1:
+            notify(notices, "info", f"Re-grading with {MODEL_TIERS[i + 1]}: {problem}.")
+    return result
+
+def reconcile_scores(result, api_key, usage=None):
+    """Make the grade agree with the deductions: recompute it locally if possible, else ask the model to fix the JSON."""
+    if not isinstance(result, GradingFeedback):
+        return result
+    problem = score_discrepancy(result)
+    policy = os.environ.get("GRADER_RECONCILE_POLICY", "deductions")
+    if problem is None or policy == "off":
+        return result
+    
+    total_deducted = sum(deduction.get('points', 0) for deduction in result.point_deductions)
+    # A truncated result has lost deductions, so recomputing would raise its grade
+    if policy == "deductions" and not result.truncated and 0 <= 100 - total_deducted <= 100:
+        return result.copy(update={"numerical_grade": 100 - total_deducted})
+    
+    # Send only the inconsistent JSON and the problem, not the documents
+    import google.generativeai as genai
+    
+    try:
+        genai.configure(api_key=api_key)
+        repair_model = os.environ.get("GRADER_REPAIR_MODEL", "gemini-2.0-flash")
+        model = genai.GenerativeModel(
+            model_name=repair_model,
+            generation_config={"temperature": 0, "max_output_tokens": 8192}
+        )
+        prompt = f"""
+        The following grading result is internally inconsistent: {problem}.
+        
+        The points in point_deductions must add up to exactly (100 - numerical_grade).
+        Correct the result so that they do, changing as little as possible: adjust numerical_grade
+        and/or the points of individual deductions, and keep all other fields unchanged.
+        
+        Grading result:
+        {result.json()}
+        
+        Please respond with ONLY the corrected JSON object.
+        """
+        response = model.generate_content(prompt)
+        add_usage(usage, repair_model, response)
+        found = find_json_span(response.text)
+        repaired = GradingFeedback(**found.value) if found else None
+    except Exception:
+        repaired = None
+    if result.truncated and repaired is not None:
+        # Keep the reported grade (and the flag) rather than raise it
+        repaired = repaired.copy(update={"truncated": True}) if repaired.numerical_grade <= result.numerical_grade else None
+    if repaired is not None and score_discrepancy(repaired) is None:
+        return repaired
+    return result
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_class_analytics(student=None, top=10):
+    """Class analytics over the results history; cached because every tab runs on each rerun."""
+    return class_analytics(results_store, top=top, student=student)
+
+@st.cache_resource
+def grading_executor():
+    return ThreadPoolExecutor(max_workers=GRADING_WORKERS, thread_name_prefix="grading")
+
+class GradingJob:
+    """A submission queued for grading in the background, and its outcome."""
+
+    def __init__(self, session_id, assignment_file, submission_file, name=None, spool=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        # Sample file paths, handles to uploads in the session store, or PDFs
+        # in an archive's spool (kept on disk while the job is referenced)
+        self.assignment_file = assignment_file
+        self.submission_file = submission_file
+        self.submission_name = name or submission_file.name
+        self.spool = spool
+        self.status = "queued"  # then "running", and finally "done" or "failed"
+        self.queued_at = time.time()
+        self.finished_at = None
+        self.notices = []
+        # Session store handles, set when grading succeeds
+        self.assignment_text = None
+        self.submission_text = None
+        self.results_pdf = None
+        self.result = None
+        self.results_dict = None
+        # Set once the session has reacted to the job finishing
+        self.reported = False
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+def run_grading_job(job, extractions, api_key, include_grading_advice, grading_advice):
+    """Grade a queued submission on a worker thread. Messages go to job.notices, not the page."""
+    job.status = "running"
+    status = "failed"
+    try:
+        texts = []
+        for extraction in extractions:
+            try:
+                texts.append(extraction.result())
+            except Exception as e:
+                job.notices.append(("error", f"Error extracting text from PDF: {str(e)}"))
+                texts.append(None)
+        assignment_text, solution_text, submission_text = texts
+        if not all(texts):
+            job.notices.append(("error", "Failed to extract text from one or more PDF files. Please ensure they are text-based PDFs."))
+            return
+
+        usage = {}
+        started = time.perf_counter()
+        result = grade_with_escalation(
+            assignment_text,
+            solution_text,
+            submission_text,
+            api_key,
+            include_grading_advice=include_grading_advice,
+            grading_advice=grading_advice,
+            usage=usage,
+            notices=job.notices
+        )
+        result = reconcile_scores(result, api_key, usage=usage)
+        if not result:
+            return
+
+        job.result = result
+        # Convert a Pydantic model to a dict once and reuse it below
+        if hasattr(result, 'dict'):
+            job.results_dict = result.dict()
+        elif isinstance(result, dict):
+            job.results_dict = result
+
+        if isinstance(result, GradingFeedback):
+            # Keep a history of results (see backend/app/results_store.py)
+            try:
+                results_store.record(
+                    assignment_text,
+                    submission_text,
+                    job.results_dict,
+                    source="streamlit",
+                    student=job.submission_name,
+                    model=",".join(usage.get('models', [])) or None,
+                    prompt_version=PROMPT_VERSION,
+                    input_tokens=usage.get('input_tokens', 0),
+                    output_tokens=usage.get('output_tokens', 0),
+                    latency_ms=round((time.perf_counter() - started) * 1000, 1)
+                )
+                load_class_analytics.clear()
+            except Exception as e:
+                job.notices.append(("warning", f"Could not save the result to the history: {str(e)}"))
+
+        job.assignment_text = session_store.put_text(job.session_id, assignment_text)
+        job.submission_text = session_store.put_text(job.session_id, submission_text)
+        results_pdf = generate_results_pdf(job.results_dict)
+        if results_pdf:
+            job.results_pdf = session_store.put(job.session_id, results_pdf.getvalue(), name="grading_results.pdf")
+        status = "done"
+    except Exception as e:
+        job.notices.append(("error", f"Error grading assignment: {str(e)}"))
+    finally:
+        job.finished_at = time.time()
+        job.status = status
+
+def queue_grading_job(assignment_file, solution_file, submission, submission_extraction):
+    """Queue a submission (a sample file path or stored PDF handle) for grading in the background."""
+    job = GradingJob(st.session_state.session_id, stored_pdf(assignment_file), submission)
+    # Pick up the extractions started when the files were uploaded, or start them
+    extractions = [speculative_extraction(assignment_file), speculative_extraction(solution_file), submission_extraction]
+    grading_executor().submit(
+        run_grading_job,
+        job,
+        extractions,
+        st.session_state.api_key,
+        st.session_state.use_analysis_in_grading,
+        st.session_state.grading_advice
+    )
+    st.session_state.grading_jobs.append(job)
+    return job
+
+class ArchiveSpool:
+    """
+    Directory holding the PDFs read from one uploaded ZIP of submissions.
+
+    It is outside the session store, so a class's submissions don't count
+    against (and evict other files from) the session's quota. The directory
+    is removed once no grading job from the archive is referenced any more,
+    e.g. when the session ends.
+    """
+
+    def __init__(self):
+        self.path = Path(tempfile.mkdtemp(prefix="grader-archive-"))
+        weakref.finalize(self, shutil.rmtree, self.path, True)
+
+def queue_archive_jobs(assignment_file, solution_file, archive_file):
+    """
+    Queue a grading job for each PDF in an uploaded ZIP of submissions.
+
+    Only the ZIP's central directory is read here; the jobs are named after
+    the student in each entry name (see backend/app/services/ingest.py). A
+    feeder thread then reads the entries (see feed_archive). Raises
+    zipfile.BadZipFile if the upload isn't a ZIP.
+    """
+    archive = zipfile.ZipFile(archive_file)
+    entries = list_submissions(archive)
+    if not entries:
+        archive.close()
+        return []
+    spool = ArchiveSpool()
+    assignment = stored_pdf(assignment_file)
+    jobs = [
+        GradingJob(st.session_state.session_id, assignment, spool.path / f"{i}.pdf", name=entry.name.student, spool=spool)
+        for i, entry in enumerate(entries)
+    ]
+    extractions = [speculative_extraction(assignment_file), speculative_extraction(solution_file)]
+    threading.Thread(
+        target=feed_archive,
+        args=(
+            archive, entries, jobs, extractions, speculative_tasks(), grading_executor(),
+            (st.session_state.api_key, st.session_state.use_analysis_in_grading, st.session_state.grading_advice)
+        ),
+        name="archive-feeder",
+        daemon=True
+    ).start()
+    st.session_state.grading_jobs.extend(jobs)
+    return jobs
+
+def feed_archive(archive, entries, jobs, extractions, tasks, executor, grading_args):
+    """
+    Read an archive's entries one at a time into its spool and queue them for grading (runs on its own thread).
+
+    Each PDF is extracted from its file in the spool, and at most
+    ARCHIVE_READ_AHEAD submissions are read but not yet graded, so the rest
+    stay compressed in the ZIP. Entries that can't be read fail their job.
+    """
+    slots = threading.BoundedSemaphore(ARCHIVE_READ_AHEAD)
+    with archive:
+        for entry, job in zip(entries, jobs):
+            slots.acquire()
+            path = job.submission_file
+            try:
+                data, digest = read_submission(archive, entry)
+                path.write_bytes(data)
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                job.notices.append(("warning", f"Skipped {entry.entry}: {str(e)}"))
+                job.finished_at = time.time()
+                job.status = "failed"
+                slots.release()
+                continue
+            del data
+            extraction = tasks.get_or_start(("text", digest), lambda: extract_in_pool(str(path), require_text=False))
+            future = executor.submit(run_grading_job, job, extractions + [extraction], *grading_args)
+            future.add_done_callback(lambda _: slots.release())
+
+def show_job_results(job):
+    """Make a finished job the one shown in the Results View and Export Results tabs."""
+    st.session_state.grading_results = job.result
+    st.session_state.results_dict = job.results_dict
+    st.session_state.results_pdf = job.results_pdf
+    st.session_state.assignment_text = job.assignment_text
+    st.session_state.submission_text = job.submission_text
+    st.session_state.assignment_uploaded_file = job.assignment_file
+    st.session_state.submission_uploaded_file = job.submission_file
+    # Exports are rendered on demand for each result
+    st.session_state.result_files = {}
+
+def grading_queue():
+    """This session's grading jobs; polled while any are running (see the Upload & Grade tab)."""
+    jobs = st.session_state.grading_jobs
+    st.subheader("Grading Queue")
+    for job in reversed(jobs):
+        elapsed = (job.finished_at or time.time()) - job.queued_at
+        col1, col2, col3 = st.columns([3, 2, 1])
+        with col1:
+            st.markdown(f"**{job.submission_name}**")
+        with col2:
+            st.write(f"{job.status.capitalize()} ({elapsed:.0f}s)")
+        with col3:
+            if job.status == "done" and st.button("Show results", key=f"show-{job.id}"):
+                show_job_results(job)
+                st.rerun()
+        for level, message in job.notices:
+            getattr(st, level)(message)
+
+    newly_finished = [job for job in jobs if job.finished and not job.reported]
+    if newly_finished:
+        for job in newly_finished:
+            job.reported = True
+            if job.status == "done":
+                st.toast(f"Graded {job.submission_name}. Check the 'Results View' tab to see the results.")
+            else:
+                st.toast(f"Grading {job.submission_name} failed.")
+        done = [job for job in newly_finished if job.status == "done"]
+        if done:
+            # Show the latest result, as when grading ran on the script thread
+            show_job_results(done[-1])
+            st.query_params["tab"] = "results"
+        # Rerun the whole page so the other tabs update and polling stops once nothing is running
+        st.rerun()
+
 def load_sample_files():
     """Load sample files from the data directory."""
     data_dir = Path("data")
@@ -271,6 +716,7 @@ def load_sample_files():
         st.error(f"Error loading sample files: {str(e)}")
         return None
 
+@st.cache_data(show_spinner=False)
 def get_file_download_link(file_path, link_text):
     """Generate a download link for a file."""
     with open(file_path, "rb") as f:
@@ -295,9 +741,14 @@ def display_grading_results(results):
         
         # Calculate final score based on deductions
         final_score = 100 - total_deducted
+        if results.truncated:
+            # Deductions after the cut are missing; show the grade the model gave
+            final_score = results.numerical_grade
         
         # Display structured results
         st.markdown(f"### Grade: {final_score}/100")
+        if results.truncated:
+            st.warning("The model's response was cut off, so some point deductions may be missing from this result.")
         
         st.markdown("#### Overall Assessment")
         st.write(results.overall_assessment)
@@ -368,6 +819,8 @@ def export_to_docx(results):
     if not isinstance(results, (GradingFeedback, dict)):
         return None
     
+    from docx import Document
+
     doc = Document()
     doc.add_heading('Assignment Grading Results', 0)
     
@@ -419,6 +872,11 @@ def generate_results_pdf(results):
     if results is None:
         return None
     
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib import colors
+
     try:
         # If we have results already in dict form, use those
         if hasattr(results, 'dict'):
@@ -429,9 +887,6 @@ def generate_results_pdf(results):
             # For any other type, convert to string and return a simple PDF
             results_dict = {"raw_response": str(results)}
         
-        # Save results_dict to session state for later use
-        st.session_state.results_dict = results_dict
-        
         # Create a BytesIO object to save the PDF
         pdf_buffer = io.BytesIO()
         
@@ -626,43 +1081,191 @@ def export_to_csv(results):
     csv_file.seek(0)
     return csv_file
 
-def display_pdf(pdf_file):
-    """Display a PDF file using an iframe."""
+def is_archive(uploaded_file):
+    """Whether an uploaded submission is a ZIP of submissions rather than a PDF."""
+    return not isinstance(uploaded_file, (str, Path)) and uploaded_file.name.lower().endswith(".zip")
+
+def stored_pdf(pdf_file):
+    """
+    A sample file's path as is, or a handle to an uploaded file's copy in the session store.
+
+    Each upload is stored once; reruns reuse its handle unless the copy was
+    evicted since.
+    """
+    if isinstance(pdf_file, (str, Path)):
+        return pdf_file
+    session_id = st.session_state.session_id
+    blob = st.session_state.stored_uploads.get(pdf_file.file_id)
+    if blob is None or not session_store.exists(session_id, blob):
+        blob = session_store.put(session_id, pdf_file.getvalue(), name=pdf_file.name)
+        st.session_state.stored_uploads[pdf_file.file_id] = blob
+        st.session_state.upload_digests[pdf_file.file_id] = blob.digest
+    return blob
+
+@st.cache_data(show_spinner=False)
+def sample_file_digest(path, mtime):
+    """Hash of a sample file's content, cached per path and modification time."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+def pdf_source(pdf_file):
+    """Return (content hash, loader) for a sample file path or a PDF in the session store."""
+    if isinstance(pdf_file, StoredBlob):
+        session_id = st.session_state.session_id
+        return pdf_file.digest, lambda: session_store.get(session_id, pdf_file)
+    path = Path(pdf_file)
+    return sample_file_digest(str(path), path.stat().st_mtime), path.read_bytes
+
+def results_pdf_blob():
+    """Handle to the shown result's PDF, rendering it again if it isn't stored (e.g. it was evicted)."""
+    blob = st.session_state.results_pdf
+    if blob is not None and session_store.exists(st.session_state.session_id, blob):
+        return blob
+    results_pdf = generate_results_pdf(st.session_state.results_dict)
+    if results_pdf is None:
+        return None
+    st.session_state.results_pdf = session_store.put(st.session_state.session_id, results_pdf.getvalue(), name="grading_results.pdf")
+    return st.session_state.results_pdf
+
+# Viewer zoom levels; pages are rendered (and cached) at each
+ZOOM_LEVELS = {"75%": 0.75, "100%": 1.0, "125%": 1.25, "150%": 1.5, "200%": 2.0}
+
+def display_pdf(pdf_file, key):
+    """
+    Display a PDF a page at a time, with page and zoom controls named by ``key``.
+
+    Only the shown page is sent to the browser, cut out of the document as a
+    small PDF of its own and cached (see backend/app/pdf_pages.py); the pages
+    next to it are rendered in the background.
+    """
     if pdf_file is None:
         return
     
     try:
-        # Handle different types of PDF inputs
-        if isinstance(pdf_file, io.BytesIO):
-            # If it's a BytesIO object, just read it
-            pdf_file.seek(0)
-            pdf_bytes = pdf_file.read()
-        elif isinstance(pdf_file, (str, Path)):
-            # If it's a file path (string or Path object)
-            with open(pdf_file, "rb") as f:
-                pdf_bytes = f.read()
-        else:
-            # If it's a file-like object (e.g., from st.file_uploader)
-            # Reset pointer to the beginning of the file
-            pdf_file.seek(0)
-            pdf_bytes = pdf_file.read()
-        
-        # Encode as base64
-        base64_pdf = base64.b64encode(pdf_bytes).decode('utf-8')
-        
-        # Create iframe HTML with improved styling for better scrolling
-        pdf_display = f'''
-        <div style="display: flex; justify-content: center; width: 100%; height: 500px; overflow: hidden;">
-            <iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="100%" 
-                    style="border: none; overflow: auto;" type="application/pdf"></iframe>
-        </div>
-        '''
-        st.markdown(pdf_display, unsafe_allow_html=True)
+        digest, load = pdf_source(pdf_file)
+        page_count = page_cache.page_count(digest, load)
+        if page_count == 0:
+            st.info("This PDF has no pages.")
+            return
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            # Keyed by document too, so a different document starts at its first page
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1, key=f"{key}-page-{digest}")
+        with col2:
+            zoom = ZOOM_LEVELS[st.selectbox("Zoom", list(ZOOM_LEVELS), index=1, key=f"{key}-zoom")]
+        
+        rendered = page_cache.page(digest, load, page - 1, zoom)
+        show_pdf_base64(base64.b64encode(rendered.data).decode('utf-8'), height=int(rendered.height * 96 / 72) + 60)
+        # Pages are numbered from 0 in the cache: the next page is `page`, the previous `page - 2`
+        page_cache.prefetch(digest, load, [page, page - 2, page + 1], zoom)
+    except BlobEvicted:
+        st.info("This PDF is no longer stored for this session. Please upload it again.")
     except Exception as e:
         st.error(f"Error displaying PDF: {str(e)}")
         import traceback
         st.error(traceback.format_exc())
 
+def show_pdf_base64(base64_pdf, height=500):
+    """Show a base64-encoded PDF in an iframe, at its actual size."""
+    # Create iframe HTML with improved styling for better scrolling
+    pdf_display = f'''
+    <div style="display: flex; justify-content: center; width: 100%; height: {height}px; overflow: hidden;">
+        <iframe src="data:application/pdf;base64,{base64_pdf}#zoom=100" width="100%" height="100%" 
+                style="border: none; overflow: auto;" type="application/pdf"></iframe>
+    </div>
+    '''
+    st.markdown(pdf_display, unsafe_allow_html=True)
+
+@st.fragment
+def results_viewer():
+    """The submission/assignment viewer of the Results View tab; switching views or pages reruns only this."""
+    # Show the submission with a toggle for assignment view
+    view_type = st.radio(
+        "View:",
+        ["Student Submission", "Assignment & Rubric"]
+    )
+    
+    if view_type == "Student Submission" and st.session_state.submission_uploaded_file:
+        st.subheader("Student Submission")
+        pdf_file = st.session_state.submission_uploaded_file
+        display_pdf(pdf_file, key="viewer-submission")
+    elif view_type == "Assignment & Rubric" and st.session_state.assignment_uploaded_file:
+        st.subheader("Assignment & Rubric")
+        pdf_file = st.session_state.assignment_uploaded_file
+        display_pdf(pdf_file, key="viewer-assignment")
+    else:
+        st.info("No PDF available to display. Please grade an assignment first.")
+
+@st.fragment
+def results_output():
+    """The grading output of the Results View tab; paging through it reruns only this."""
+    # Display grading results as PDF
+    st.subheader("Grading Output")
+    
+    # The PDF is rendered once per result, when grading finishes
+    results_pdf = results_pdf_blob()
+    if results_pdf:
+        display_pdf(results_pdf, key="results")
+    else:
+        # Fallback to displaying structured content if PDF generation fails
+        st.warning("PDF generation failed. Displaying text version instead:")
+        display_grading_results(st.session_state.grading_results)
+
+# Export format: (key, download label, file name, MIME type)
+EXPORT_FORMATS = {
+    "Word Document (.docx)": ("docx", "Download Word Document", "grading_results.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "PDF Document (.pdf)": ("pdf", "Download PDF Document", "grading_results.pdf", "application/pdf"),
+    "CSV File (.csv)": ("csv", "Download CSV File", "grading_results.csv", "text/csv"),
+}
+
+def exported_file(kind):
+    """The shown result as a docx/pdf/csv file's bytes, rendered once per result and format."""
+    session_id = st.session_state.session_id
+    if kind == "pdf":
+        # The results PDF is rendered when grading finishes
+        blob = results_pdf_blob()
+        return session_store.get(session_id, blob) if blob else None
+    
+    files = st.session_state.result_files
+    if kind in files:
+        try:
+            return session_store.get(session_id, files[kind])
+        except BlobEvicted:
+            del files[kind]
+    
+    results = st.session_state.grading_results
+    if isinstance(st.session_state.results_dict, dict) and 'numerical_grade' in st.session_state.results_dict:
+        # Each script run redefines GradingFeedback, so rebuild the stored result as this run's class
+        results = GradingFeedback(**st.session_state.results_dict)
+    exported = export_to_docx(results) if kind == "docx" else export_to_csv(results)
+    if not exported:
+        return None
+    data = exported.getvalue()
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    files[kind] = session_store.put(session_id, data, name=f"grading_results.{kind}")
+    return data
+
+@st.fragment
+def export_panel():
+    """The Export Results tab; changing the format or exporting reruns only this."""
+    export_format = st.selectbox(
+        "Select export format:",
+        list(EXPORT_FORMATS)
+    )
+    
+    if st.button("Export Results"):
+        kind, label, file_name, mime = EXPORT_FORMATS[export_format]
+        data = exported_file(kind)
+        if data:
+            # Create download button
+            st.download_button(
+                label=label,
+                data=data,
+                file_name=file_name,
+                mime=mime
+            )
+
 # Main app
 st.title("📚 AI Assignment Grader")
 st.markdown("""
@@ -676,7 +1279,7 @@ if api_key:
     st.session_state.api_key = api_key
 
 # Create tabs for different sections
-tabs = st.tabs(["Upload & Grade", "Results View", "Export Results"])
+tabs = st.tabs(["Upload & Grade", "Results View", "Export Results", "Class Analytics"])
 
 with tabs[0]:  # Upload & Grade tab
     # Sample files section
@@ -720,11 +1323,31 @@ with tabs[0]:  # Upload & Grade tab
     if not use_sample_files:
         assignment_file = st.file_uploader("Upload Assignment PDF (includes rubric)", type="pdf")
         solution_file = st.file_uploader("Upload Solution PDF", type="pdf")
-        submission_file = st.file_uploader("Upload Student Submission PDF", type="pdf")
+        submission_file = st.file_uploader(
+            "Upload Student Submission PDF",
+            type=["pdf", "zip"],
+            help="Or a ZIP of submissions, such as a Canvas, Moodle or Blackboard download, to grade each PDF in it"
+        )
         if assignment_file:
-            st.session_state.assignment_uploaded_file = assignment_file
-        if submission_file:
-            st.session_state.submission_uploaded_file = submission_file
+            st.session_state.assignment_uploaded_file = stored_pdf(assignment_file)
+        if submission_file and not is_archive(submission_file):
+            st.session_state.submission_uploaded_file = stored_pdf(submission_file)
+
+    # Start work in the background as soon as the files are there, so the buttons
+    # below only wait for whatever is still running
+    speculate_analysis = st.checkbox(
+        "Analyze the rubric as soon as the assignment is uploaded",
+        value=False,
+        help="Starts the rubric analysis in the background, before you click \"Analyze Rubric/Assignment\". This uses a model call even if you never look at the analysis."
+    )
+    if assignment_file:
+        speculative_extraction(assignment_file)
+        if speculate_analysis and st.session_state.api_key:
+            speculative_rubric_analysis(assignment_file, st.session_state.api_key)
+    if assignment_file and solution_file and submission_file:
+        speculative_extraction(solution_file)
+        if not is_archive(submission_file):
+            speculative_extraction(submission_file)
 
     # Add option to analyze rubric
     if assignment_file and st.button("Analyze Rubric/Assignment"):
@@ -732,10 +1355,17 @@ with tabs[0]:  # Upload & Grade tab
             st.error("Please enter your Google API Key first!")
         else:
             with st.spinner("Analyzing rubric and assignment..."):
-                assignment_text = extract_text_from_pdf(assignment_file)
+                assignment_text = extraction_result(speculative_extraction(assignment_file))
                 if assignment_text:
-                    st.session_state.assignment_text = assignment_text
-                    analysis_result = analyze_rubric(assignment_text, st.session_state.api_key)
+                    st.session_state.assignment_text = session_store.put_text(st.session_state.session_id, assignment_text)
+                    analysis_key, analysis = speculative_rubric_analysis(assignment_file, st.session_state.api_key)
+                    try:
+                        analysis_result = analysis.result()
+                    except Exception as e:
+                        # Don't keep the failure (e.g. a wrong API key): the next click tries again
+                        speculative_tasks().discard(analysis_key, analysis)
+                        st.error(f"Error analyzing rubric: {str(e)}")
+                        analysis_result = None
                     if analysis_result:
                         st.session_state.rubric_improvements = analysis_result["improvements"]
                         st.session_state.grading_advice = analysis_result["advice"]
@@ -766,54 +1396,31 @@ with tabs[0]:  # Upload & Grade tab
                 value=st.session_state.use_analysis_in_grading
             )
 
-    # Grade button
+    # Grade button: grading runs in the background, so files can be uploaded and
+    # results reviewed while earlier submissions are being graded
     if st.button("Grade Assignment"):
         if not st.session_state.api_key:
             st.error("Please enter your Google API Key first!")
         elif not use_sample_files and (not assignment_file or not solution_file or not submission_file):
             st.error("Please upload all required PDF files!")
-        else:
-            with st.spinner("Grading assignment..."):
-                # Extract text from PDFs
-                assignment_text = extract_text_from_pdf(assignment_file)
-                solution_text = extract_text_from_pdf(solution_file)
-                submission_text = extract_text_from_pdf(submission_file)
-                
-                # Store texts in session state for later use
-                if assignment_text:
-                    st.session_state.assignment_text = assignment_text
-                if submission_text:
-                    st.session_state.submission_text = submission_text
-                
-                if all([assignment_text, solution_text, submission_text]):
-                    # Grade the assignment
-                    result = grade_assignment(
-                        assignment_text,
-                        solution_text,
-                        submission_text,
-                        st.session_state.api_key,
-                        include_grading_advice=st.session_state.use_analysis_in_grading,
-                        grading_advice=st.session_state.grading_advice
-                    )
-                    
-                    if result:
-                        # Store results in session state
-                        st.session_state.grading_results = result
-                        
-                        # Convert to dict if it's a Pydantic model
-                        if hasattr(result, 'dict'):
-                            st.session_state.results_dict = result.dict()
-                        elif isinstance(result, dict):
-                            st.session_state.results_dict = result
-                        
-                        # Generate results PDF
-                        st.session_state.results_pdf = generate_results_pdf(result)
-                        
-                        st.success("Grading completed! Check the 'Results View' tab to see the results.")
-                        # Switch to the results tab
-                        st.query_params["tab"] = "results"
+        elif is_archive(submission_file):
+            try:
+                jobs = queue_archive_jobs(assignment_file, solution_file, submission_file)
+            except zipfile.BadZipFile:
+                st.error("The submissions file is not a valid ZIP file.")
+            else:
+                if jobs:
+                    st.info(f"Grading {len(jobs)} submissions from {submission_file.name} in the background.")
                 else:
-                    st.error("Failed to extract text from one or more PDF files. Please ensure they are text-based PDFs.")
+                    st.error("The ZIP file contains no PDF submissions.")
+        else:
+            # Text is extracted in parallel worker processes
+            job = queue_grading_job(assignment_file, solution_file, stored_pdf(submission_file), speculative_extraction(submission_file))
+            st.info(f"Grading {job.submission_name} in the background. You can upload the next submission meanwhile.")
+
+    if st.session_state.grading_jobs:
+        running = any(not job.finished for job in st.session_state.grading_jobs)
+        st.fragment(grading_queue, run_every=1 if running else None)()
 
 with tabs[1]:  # Results View tab
     st.header("Grading Results")
@@ -823,46 +1430,10 @@ with tabs[1]:  # Results View tab
         col1, col2 = st.columns([1, 1])
         
         with col1:
-            # Show the submission with a toggle for assignment view
-            view_type = st.radio(
-                "View:",
-                ["Student Submission", "Assignment & Rubric"]
-            )
-            
-            if view_type == "Student Submission" and st.session_state.submission_uploaded_file:
-                st.subheader("Student Submission")
-                display_pdf(st.session_state.submission_uploaded_file)
-            elif view_type == "Assignment & Rubric" and st.session_state.assignment_uploaded_file:
-                st.subheader("Assignment & Rubric")
-                display_pdf(st.session_state.assignment_uploaded_file)
-            else:
-                st.info("No PDF available to display. Please grade an assignment first.")
+            results_viewer()
         
         with col2:
-            # Display grading results as PDF
-            st.subheader("Grading Output")
-            
-            # If we have results in dict form, regenerate the PDF each time
-            if st.session_state.results_dict:
-                try:
-                    # Generate a fresh PDF from the stored dict
-                    results_pdf = generate_results_pdf(st.session_state.results_dict)
-                    if results_pdf:
-                        display_pdf(results_pdf)
-                    else:
-                        # Fallback to displaying structured content if PDF generation fails
-                        st.warning("PDF generation failed. Displaying text version instead:")
-                        display_grading_results(st.session_state.grading_results)
-                except Exception as e:
-                    st.error(f"Error displaying results: {str(e)}")
-                    # Fallback to displaying structured content
-                    display_grading_results(st.session_state.grading_results)
-            elif st.session_state.results_pdf:
-                # Use the stored PDF if available
-                display_pdf(st.session_state.results_pdf)
-            else:
-                # Last resort fallback
-                display_grading_results(st.session_state.grading_results)
+            results_output()
     else:
         st.info("No grading results available. Please grade an assignment first.")
         if st.button("Debug Info"):
@@ -878,47 +1449,45 @@ with tabs[2]:  # Export Results tab
     st.header("Export Results")
     
     if st.session_state.grading_results:
-        export_format = st.selectbox(
-            "Select export format:",
-            ["Word Document (.docx)", "PDF Document (.pdf)", "CSV File (.csv)"]
-        )
-        
-        if st.button("Export Results"):
-            if export_format == "Word Document (.docx)":
-                docx_file = export_to_docx(st.session_state.grading_results)
-                if docx_file:
-                    # Create download button
-                    st.download_button(
-                        label="Download Word Document",
-                        data=docx_file,
-                        file_name="grading_results.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                    )
-            
-            elif export_format == "PDF Document (.pdf)":
-                pdf_file = generate_results_pdf(st.session_state.grading_results)
-                if pdf_file:
-                    # Create download button
-                    st.download_button(
-                        label="Download PDF Document",
-                        data=pdf_file,
-                        file_name="grading_results.pdf",
-                        mime="application/pdf"
-                    )
-            
-            elif export_format == "CSV File (.csv)":
-                csv_file = export_to_csv(st.session_state.grading_results)
-                if csv_file:
-                    # Create download button
-                    st.download_button(
-                        label="Download CSV File",
-                        data=csv_file.getvalue(),
-                        file_name="grading_results.csv",
-                        mime="text/csv"
-                    )
+        export_panel()
     else:
         st.info("No grading results available for export. Please grade an assignment first.")
 
+with tabs[3]:  # Class Analytics tab
+    st.header("Class Analytics")
+    st.caption("Summarises every result in the grading history, including results graded through the API.")
+    
+    student_filter = st.text_input("Only results for student (optional):")
+    top_n = st.slider("Deduction areas and concepts to show", min_value=5, max_value=50, value=10)
+    analytics = load_class_analytics(student_filter or None, top_n)
+    grades = analytics['grades']
+    
+    if grades['count'] == 0:
+        st.info("No stored results yet. Grade some assignments first.")
+    else:
+        import pandas as pd
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Results", grades['count'])
+        col2.metric("Mean grade", grades['mean'])
+        col3.metric("Median grade", grades['median'])
+        col4.metric("Std. deviation", grades['std'])
+        
+        st.subheader("Grade Distribution")
+        st.bar_chart(pd.Series(grades['histogram'], name="Results"))
+        
+        st.subheader("Most Common Deduction Areas")
+        if analytics['deduction_areas']:
+            st.dataframe(pd.DataFrame(analytics['deduction_areas']).set_index('area'), use_container_width=True)
+        else:
+            st.write("No point deductions recorded.")
+        
+        st.subheader("Most Frequent Concept Improvements")
+        if analytics['concepts']:
+            st.dataframe(pd.DataFrame(analytics['concepts']).set_index('concept'), use_container_width=True)
+        else:
+            st.write("No concept improvements recorded.")
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -1 +1,11 @@
-# AI Assignment Grader Backend App 
\ No newline at end of file
+"""
+AI Assignment Grader backend app.
+
+The Streamlit app (``app.py``) imports some of these modules as
+``backend.app.<module>``: ``json_scan``, ``db``, ``results_store``,
+``analytics``, ``pdf_text``, ``pdf_pages``, ``session_store`` and
+``services.ingest``. They use only relative imports among themselves and
+don't import FastAPI, pydantic or the service layer, so the app can use them
+without the API's dependencies. Their own third-party dependencies (pandas and
+NumPy for analytics, PyPDF2 for PDF parsing) are imported on first use.
+"""
@@ -0,0 +1,114 @@
+"""
+Class-level analytics over stored grading results.
+
+Grades, point deductions and concept improvements are loaded from the results
+store's flattened tables as columns and summarised with
+NumPy/pandas in vectorized passes: the grade distribution, the most common
+deduction areas with the points lost in each, and how often each concept
+improvement is suggested. pandas and NumPy are imported on first use.
+"""
+from typing import Any, Dict
+
+from .results_store import ResultsStore, results_store
+
+# Grade histogram bands: 0-9, 10-19, ..., 90-100
+GRADE_BINS = list(range(0, 101, 10))
+
+
+def _grade_distribution(grades) -> Dict[str, Any]:
+    import numpy as np
+
+    if grades.size == 0:
+        return {"count": 0, "mean": None, "median": None, "std": None, "min": None, "max": None,
+                "percentiles": {}, "histogram": {}}
+    counts, _ = np.histogram(grades, bins=GRADE_BINS)
+    p10, p25, p75, p90 = np.percentile(grades, [10, 25, 75, 90])
+    labels = [f"{low}-{low + 9 if low < 90 else 100}" for low in GRADE_BINS[:-1]]
+    return {
+        "count": int(grades.size),
+        "mean": round(float(grades.mean()), 2),
+        "median": float(np.median(grades)),
+        "std": round(float(grades.std()), 2),
+        "min": int(grades.min()),
+        "max": int(grades.max()),
+        "percentiles": {"p10": float(p10), "p25": float(p25), "p75": float(p75), "p90": float(p90)},
+        "histogram": dict(zip(labels, counts.tolist())),
+    }
+
+
+def _normalise(labels):
+    """Group labels that differ only in case and whitespace; keep the most common spelling."""
+    import pandas as pd
+
+    key = labels.str.strip().str.replace(r"\s+", " ", regex=True).str.casefold()
+    # Count each (key, spelling) pair once, then keep the first row per key after a
+    # stable sort by count (ties go to the spelling seen first)
+    spellings = pd.DataFrame({"key": key, "label": labels}).groupby(["key", "label"], sort=False).size()
+    most_common = spellings.sort_values(ascending=False, kind="stable").reset_index()
+    display = most_common.drop_duplicates("key").set_index("key")["label"]
+    return key, display
+
+
+def class_analytics(store: ResultsStore = results_store, top: int = 20, **filters) -> Dict[str, Any]:
+    """
+    Summarise the stored results matching ``filters`` (as for ``ResultsStore.list``).
+
+    Returns the grade distribution, the ``top`` deduction areas by how many
+    results lost points there, and the ``top`` concept improvements by how
+    often they were suggested.
+    """
+    import numpy as np
+    import pandas as pd
+
+    grades = np.array([grade for _, grade in store.grades(**filters)], dtype=np.int64)
+    result_count = grades.size
+
+    deductions = pd.DataFrame.from_records(
+        store.items("deduction", **filters),
+        columns=["result_id", "area", "points"],
+    ).dropna(subset=["area"])
+    areas = []
+    if not deductions.empty:
+        deductions["points"] = pd.to_numeric(deductions["points"], errors="coerce").fillna(0)
+        deductions["key"], display = _normalise(deductions["area"].astype(str))
+        by_area = deductions.groupby("key").agg(
+            occurrences=("points", "size"),
+            results=("result_id", "nunique"),
+            total_points=("points", "sum"),
+            mean_points=("points", "mean"),
+        ).sort_values(["results", "total_points"], ascending=False).head(top)
+        areas = [
+            {
+                "area": display[row.Index],
+                "occurrences": int(row.occurrences),
+                "results": int(row.results),
+                "share_of_results": round(row.results / result_count, 4) if result_count else 0.0,
+                "total_points": float(row.total_points),
+                "mean_points": round(float(row.mean_points), 2),
+                "mean_points_per_result": round(float(row.total_points) / result_count, 2) if result_count else 0.0,
+            }
+            for row in by_area.itertuples()
+        ]
+
+    concepts = pd.DataFrame.from_records(
+        store.items("concept", **filters),
+        columns=["result_id", "concept", "points"],
+    ).dropna(subset=["concept"])
+    concept_counts = []
+    if not concepts.empty:
+        concepts["key"], display = _normalise(concepts["concept"].astype(str))
+        by_concept = concepts.groupby("key")["result_id"].nunique().sort_values(ascending=False).head(top)
+        concept_counts = [
+            {
+                "concept": display[key],
+                "results": int(count),
+                "share_of_results": round(count / result_count, 4) if result_count else 0.0,
+            }
+            for key, count in by_concept.items()
+        ]
+
+    return {
+        "grades": _grade_distribution(grades),
+        "deduction_areas": areas,
+        "concepts": concept_counts,
+    }
@@ -0,0 +1,497 @@
+"""
+Command-line batch grader.
+
+    python -m app.cli grade assignment.pdf solution.pdf submissions/ -o out/ --api-key KEY
+
+Grades every PDF in a directory (searched recursively) or ZIP file against
+one assignment and solution. ZIP files are read an entry at a time without
+extracting them, and the student is taken from Canvas, Moodle and
+Blackboard file naming where present. Text is extracted in a pool of worker
+processes, and up to --concurrency submissions are graded at a time.
+
+Each submission is added to OUT/journal.jsonl as soon as it is finished, so
+an interrupted run continues where it stopped when the same command is run
+again: submissions already graded against the same assignment and solution
+(with unchanged content) are skipped, and failed ones are retried. At the
+end, OUT/results.jsonl holds the feedback of every graded submission and
+OUT/gradebook.csv one row per submission. Results are also added to the
+results history, with source "cli".
+
+    python -m app.cli watch assignment.pdf solution.pdf incoming/ -o out/ --api-key KEY
+
+Keeps running and grades each PDF added to (or changed in) a directory once
+it has stopped changing for --debounce seconds, so submissions are graded
+through the submission window instead of all at the deadline. The journal,
+results and gradebook are kept up to date in the same way, and results are
+added to the results history with source "watch".
+"""
+import argparse
+import asyncio
+import csv
+import functools
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.pdf_text import EXTRACT_WORKERS, extract_pdf_text
+from app.services.ingest import list_submissions, parse_submission_name, read_submission
+from app.services.watcher import DEBOUNCE_SECONDS, POLL_INTERVAL_SECONDS, DirectoryWatcher
+
+# The grading pipeline is imported when a batch starts, so that extraction
+# worker processes (which import this module) start quickly
+
+logger = logging.getLogger("app.cli")
+
+DEFAULT_CONCURRENCY = int(os.environ.get("GRADER_CLI_CONCURRENCY", 4))
+
+
+class Submission(NamedTuple):
+    """A submission PDF in the batch."""
+
+    key: str  # path within the submissions directory or ZIP; unique in the batch
+    student: str
+    student_id: Optional[str]
+    read: Callable[[], Tuple[bytes, str]]  # returns the bytes and their SHA-256
+
+
+def _read_file(path: Path) -> Tuple[bytes, str]:
+    data = path.read_bytes()
+    return data, hashlib.sha256(data).hexdigest()
+
+
+def _file_submission(source: Path, path: Path) -> Submission:
+    key = path.relative_to(source).as_posix()
+    name = parse_submission_name(key)
+    return Submission(key, name.student, name.student_id, functools.partial(_read_file, path))
+
+
+def find_submissions(source: Path) -> List[Submission]:
+    """List the PDFs in a directory (recursively) or ZIP file, in name order."""
+    if source.is_dir():
+        files = sorted(path for path in source.rglob("*") if path.is_file() and path.suffix.lower() == ".pdf")
+        return [_file_submission(source, path) for path in files]
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        return [
+            Submission(entry.entry, entry.name.student, entry.name.student_id, functools.partial(read_submission, archive, entry))
+            for entry in sorted(list_submissions(archive), key=lambda entry: entry.entry)
+        ]
+    raise ValueError(f"{source} is not a directory or a ZIP file")
+
+
+class Journal:
+    """
+    Append-only record of finished submissions, one JSON object per line.
+
+    Lines are flushed and fsynced as they are written, so a crash loses at
+    most the line being written (which is skipped on reload). The last line
+    for a submission wins.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        needs_newline = False
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    needs_newline = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["file"]] = entry
+        self._file = open(path, "a", encoding="utf-8")
+        if needs_newline:
+            # Don't append to a partially written line
+            self._file.write("\n")
+
+    def graded(self, key: str, sha256: str, batch: str) -> bool:
+        """Whether this content of a submission was already graded in this batch."""
+        entry = self.entries.get(key)
+        return entry is not None and entry["status"] == "graded" and entry["sha256"] == sha256 and entry["batch"] == batch
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.entries[entry["file"]] = entry
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Progress:
+    """Logs each finished submission with the run's throughput so far."""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.started = time.perf_counter()
+        self.finished = 0
+        self.skipped = 0
+        self.graded = 0
+        self.failed = 0
+
+    def skip(self, submission: Submission) -> None:
+        self.skipped += 1
+        self.finished += 1
+        logger.info("[%d/%d] %s: already graded", self.finished, self.total, submission.key)
+
+    def update(self, entry: Dict[str, Any]) -> None:
+        self.finished += 1
+        if entry["status"] == "graded":
+            self.graded += 1
+            outcome = f"{entry['numerical_grade']}/100"
+        else:
+            self.failed += 1
+            outcome = f"failed ({entry['error']})"
+        elapsed = time.perf_counter() - self.started
+        per_minute = (self.graded + self.failed) / elapsed * 60
+        remaining = self.total - self.finished
+        logger.info(
+            "[%d/%d] %s: %s in %.1fs | %.1f submissions/min, about %.0f min left",
+            self.finished, self.total, entry["file"], outcome, entry["seconds"], per_minute,
+            remaining / per_minute if per_minute else 0
+        )
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        return (
+            f"Graded {self.graded}, failed {self.failed}, skipped {self.skipped} already graded "
+            f"in {elapsed:.0f}s ({(self.graded + self.failed) / elapsed * 60:.1f} submissions/min)"
+        )
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text, encoding="utf-8", newline="")
+    os.replace(tmp_path, path)
+
+
+def write_outputs(journal: Journal, submissions: List[Submission], output: Path) -> None:
+    """Write results.jsonl and gradebook.csv for the submissions in the batch."""
+    results = []
+    rows = [["student", "student_id", "file", "grade", "status", "error"]]
+    for submission in submissions:
+        entry = journal.entries.get(submission.key)
+        if entry is None:
+            rows.append([submission.student, submission.student_id or "", submission.key, "", "not graded", ""])
+            continue
+        rows.append([
+            entry["student"], entry.get("student_id") or "", entry["file"], entry.get("numerical_grade", ""),
+            entry["status"], entry.get("error") or ""
+        ])
+        if entry["status"] == "graded":
+            results.append(json.dumps({
+                "student": entry["student"],
+                "student_id": entry.get("student_id"),
+                "file": entry["file"],
+                "numerical_grade": entry["numerical_grade"],
+                "feedback": entry["feedback"],
+            }))
+    _write_atomic(output / "results.jsonl", "".join(line + "\n" for line in results))
+    gradebook = io.StringIO()
+    csv.writer(gradebook).writerows(rows)
+    _write_atomic(output / "gradebook.csv", gradebook.getvalue())
+
+
+class BatchGrader:
+    """
+    Grades submissions against one assignment and solution, journaling each in the output directory.
+
+    ``grade`` and ``watch`` share it. ``start`` extracts the assignment and
+    solution (raising ValueError if they can't be read), and ``close`` stops
+    the worker pools.
+    """
+
+    def __init__(
+        self,
+        assignment: Path,
+        solution: Path,
+        output: Path,
+        api_key: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        extract_workers: int = EXTRACT_WORKERS,
+        segmented: bool = False,
+        grading_advice: Optional[str] = None,
+        source: str = "cli"
+    ):
+        self.assignment = assignment
+        self.solution = solution
+        self.output = output
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.extract_workers = extract_workers
+        self.segmented = segmented
+        self.grading_advice = grading_advice
+        self.source = source
+        output.mkdir(parents=True, exist_ok=True)
+        self.journal = Journal(output / "journal.jsonl")
+        # spawn rather than fork: the grading threads may hold locks
+        self._processes = ProcessPoolExecutor(max_workers=extract_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._threads = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="grading")
+
+    async def start(self) -> None:
+        from app.services.ai_service import preload_model_client
+
+        loop = asyncio.get_running_loop()
+        try:
+            assignment_bytes = self.assignment.read_bytes()
+            solution_bytes = self.solution.read_bytes()
+            self._assignment_text, self._solution_text, _ = await asyncio.gather(
+                loop.run_in_executor(self._processes, extract_pdf_text, assignment_bytes),
+                loop.run_in_executor(self._processes, extract_pdf_text, solution_bytes),
+                loop.run_in_executor(self._threads, preload_model_client)
+            )
+        except Exception as e:
+            raise ValueError(f"Could not read the assignment or solution: {e}") from e
+        # Results are only reused for the same assignment, solution and options
+        self.batch = hashlib.sha256(
+            assignment_bytes + solution_bytes + json.dumps([self.segmented, self.grading_advice]).encode("utf-8")
+        ).hexdigest()
+        self._grading = asyncio.Semaphore(self.concurrency)
+        # Bounds how many submissions are read and extracted ahead of grading
+        self._extracting = asyncio.Semaphore(2 * self.extract_workers)
+
+    async def grade(self, submission: Submission) -> Optional[Dict[str, Any]]:
+        """Grade a submission and journal the outcome; returns the journal entry, or None if it was already graded."""
+        from app.services.grading import grade_texts
+
+        loop = asyncio.get_running_loop()
+        entry = {"file": submission.key, "student": submission.student, "student_id": submission.student_id, "batch": self.batch}
+        started = time.perf_counter()
+        submission_text = None
+        async with self._extracting:
+            try:
+                data, entry["sha256"] = await loop.run_in_executor(None, submission.read)
+            except (OSError, ValueError, zipfile.BadZipFile) as e:
+                data = None
+                entry.update(sha256=None, status="failed", error=f"Could not read the submission: {e}")
+            if data is not None:
+                if self.journal.graded(submission.key, entry["sha256"], self.batch):
+                    return None
+                try:
+                    submission_text = await loop.run_in_executor(self._processes, extract_pdf_text, data)
+                except Exception as e:
+                    entry.update(status="failed", error=f"Error extracting text from PDF: {e}")
+        if submission_text is not None:
+            async with self._grading:
+                try:
+                    feedback = await loop.run_in_executor(self._threads, functools.partial(
+                        grade_texts,
+                        self._assignment_text, self._solution_text, submission_text, self.api_key,
+                        include_grading_advice=bool(self.grading_advice), grading_advice=self.grading_advice,
+                        segmented=self.segmented, submission_label=submission.key, student=submission.student,
+                        source=self.source
+                    ))
+                    entry.update(status="graded", numerical_grade=feedback.numerical_grade, feedback=feedback.model_dump())
+                except Exception as e:
+                    entry.update(status="failed", error=str(e))
+        entry["seconds"] = round(time.perf_counter() - started, 2)
+        entry["finished_at"] = datetime.now(timezone.utc).isoformat()
+        self.journal.append(entry)
+        return entry
+
+    def close(self) -> None:
+        # On interruption, don't start queued work; gradings already running finish on exit
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._processes.shutdown(wait=False, cancel_futures=True)
+        self.journal.close()
+
+
+async def grade_batch(
+    assignment: Path,
+    solution: Path,
+    submissions: List[Submission],
+    output: Path,
+    api_key: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    extract_workers: int = EXTRACT_WORKERS,
+    segmented: bool = False,
+    grading_advice: Optional[str] = None
+) -> Progress:
+    """Grade the submissions, journaling each one in OUTPUT, then write the results and gradebook."""
+    grader = BatchGrader(
+        assignment, solution, output, api_key, concurrency=concurrency, extract_workers=extract_workers,
+        segmented=segmented, grading_advice=grading_advice
+    )
+    progress = Progress(len(submissions))
+    try:
+        await grader.start()
+
+        async def grade_one(submission: Submission) -> None:
+            entry = await grader.grade(submission)
+            if entry is None:
+                progress.skip(submission)
+            else:
+                progress.update(entry)
+
+        await asyncio.gather(*(grade_one(submission) for submission in submissions))
+    finally:
+        grader.close()
+    write_outputs(grader.journal, submissions, output)
+    return progress
+
+
+async def watch_folder(
+    assignment: Path,
+    solution: Path,
+    source: Path,
+    output: Path,
+    api_key: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    extract_workers: int = EXTRACT_WORKERS,
+    segmented: bool = False,
+    grading_advice: Optional[str] = None,
+    debounce_seconds: float = DEBOUNCE_SECONDS,
+    poll_interval: float = POLL_INTERVAL_SECONDS,
+    use_inotify: bool = True
+) -> None:
+    """
+    Grade submission PDFs in SOURCE as they arrive or change, until interrupted.
+
+    The results and gradebook in OUTPUT are rewritten after each submission.
+    A submission that changes while it is being graded is graded again once
+    that finishes.
+    """
+    grader = BatchGrader(
+        assignment, solution, output, api_key, concurrency=concurrency, extract_workers=extract_workers,
+        segmented=segmented, grading_advice=grading_advice, source="watch"
+    )
+    watcher = None
+    # poll blocks for up to a second; it runs on its own thread so it can be waited for on exit
+    polling = ThreadPoolExecutor(max_workers=1, thread_name_prefix="watcher")
+    loop = asyncio.get_running_loop()
+    # Every submission seen so far, for the gradebook
+    submissions: Dict[str, Submission] = {}
+    running: Dict[str, asyncio.Task] = {}
+    # Submissions that changed while being graded
+    changed_while_running = set()
+
+    async def grade_one(submission: Submission) -> None:
+        entry = await grader.grade(submission)
+        if entry is None:
+            logger.info("%s: already graded", submission.key)
+        elif entry["status"] == "graded":
+            logger.info("%s: %s/100 in %.1fs", submission.key, entry["numerical_grade"], entry["seconds"])
+        else:
+            logger.info("%s: failed (%s)", submission.key, entry["error"])
+        if entry is not None:
+            write_outputs(grader.journal, [submissions[key] for key in sorted(submissions)], output)
+
+    def finished(key: str, task: asyncio.Task) -> None:
+        del running[key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Grading %s failed", key, exc_info=task.exception())
+        if key in changed_while_running:
+            changed_while_running.discard(key)
+            queue(key)
+
+    def queue(key: str) -> None:
+        if key in running:
+            changed_while_running.add(key)
+            return
+        running[key] = asyncio.ensure_future(grade_one(submissions[key]))
+        running[key].add_done_callback(functools.partial(finished, key))
+
+    try:
+        await grader.start()
+        watcher = DirectoryWatcher(source, debounce_seconds=debounce_seconds, poll_interval=poll_interval, use_inotify=use_inotify)
+        logger.info("Watching %s for submissions (%s)", source, watcher.mode)
+        while True:
+            for path in await loop.run_in_executor(polling, watcher.poll, 1.0):
+                submission = _file_submission(source, path)
+                submissions[submission.key] = submission
+                queue(submission.key)
+    finally:
+        for task in running.values():
+            task.cancel()
+        polling.shutdown(wait=True)
+        if watcher is not None:
+            watcher.close()
+        grader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    grade = commands.add_parser("grade", help="Grade a directory or ZIP file of submissions")
+    watch = commands.add_parser("watch", help="Grade submissions as they are added to a directory, until interrupted")
+    for command in (grade, watch):
+        command.add_argument("assignment", type=Path, help="Assignment PDF (includes the rubric)")
+        command.add_argument("solution", type=Path, help="Solution PDF")
+    grade.add_argument("submissions", type=Path, help="Directory or ZIP file of submission PDFs")
+    watch.add_argument("submissions", type=Path, help="Directory to watch (recursively) for submission PDFs")
+    for command in (grade, watch):
+        command.add_argument("-o", "--output", type=Path, required=True, help="Directory for the journal, results and gradebook")
+        command.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"), help="Google API key (default: GOOGLE_API_KEY)")
+        command.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                             help="Submissions graded at once (default: GRADER_CLI_CONCURRENCY or 4)")
+        command.add_argument("--extract-workers", type=int, default=max(1, EXTRACT_WORKERS),
+                             help="Text extraction processes (default: GRADER_EXTRACT_WORKERS or up to 3)")
+        command.add_argument("--segmented", action="store_true", help="Grade each rubric section separately, as in the API")
+        command.add_argument("--grading-advice-file", type=Path, help="Text file of grading advice to include in the prompt")
+    watch.add_argument("--debounce", type=float, default=DEBOUNCE_SECONDS,
+                       help="Seconds a file must stay unchanged before it is graded (default: GRADER_WATCH_DEBOUNCE_SECONDS or 5)")
+    watch.add_argument("--poll", action="store_true",
+                       help="Rescan the directory instead of using inotify (e.g. on network filesystems)")
+    watch.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_SECONDS,
+                       help="Seconds between rescans when polling (default: GRADER_WATCH_POLL_SECONDS or 5)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not args.api_key:
+        parser.error("--api-key or GOOGLE_API_KEY is required")
+    grading_advice = args.grading_advice_file.read_text(encoding="utf-8") if args.grading_advice_file else None
+    options = dict(
+        concurrency=max(1, args.concurrency), extract_workers=max(1, args.extract_workers),
+        segmented=args.segmented, grading_advice=grading_advice
+    )
+
+    if args.command == "watch":
+        if not args.submissions.is_dir():
+            parser.error(f"{args.submissions} is not a directory")
+        try:
+            asyncio.run(watch_folder(
+                args.assignment, args.solution, args.submissions, args.output, args.api_key,
+                debounce_seconds=args.debounce, poll_interval=args.poll_interval, use_inotify=not args.poll, **options
+            ))
+        except KeyboardInterrupt:
+            logger.info("Stopped watching %s", args.submissions)
+            raise SystemExit(0)
+        except ValueError as e:
+            # The assignment or solution couldn't be read
+            logger.error("%s", e)
+            raise SystemExit(1)
+
+    try:
+        submissions = find_submissions(args.submissions)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    logger.info("Grading %d submissions from %s", len(submissions), args.submissions)
+    try:
+        progress = asyncio.run(grade_batch(
+            args.assignment, args.solution, submissions, args.output, args.api_key, **options
+        ))
+    except KeyboardInterrupt:
+        logger.warning("Interrupted; run the same command again to resume")
+        raise SystemExit(130)
+    except ValueError as e:
+        # The assignment or solution couldn't be read
+        logger.error("%s", e)
+        raise SystemExit(1)
+    logger.info("%s. Gradebook: %s", progress.summary(), args.output / "gradebook.csv")
+    raise SystemExit(1 if progress.failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Small helper for the SQLite databases shared by worker processes.
+
+Every database is opened in WAL mode so concurrent readers don't block the
+writer, and each thread gets its own connection.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+
+class SQLiteDatabase:
+    """Per-thread connections to one SQLite database, created with ``schema`` on first use."""
+
+    def __init__(self, path: Path, schema: str):
+        self.path = Path(path)
+        self.schema = schema
+        self._local = threading.local()
+
+    def connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode; group multi-statement writes with transaction()
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block's statements in one write transaction."""
+        conn = self.connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
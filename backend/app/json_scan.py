@@ -0,0 +1,217 @@
+"""
+Linear-time extraction of the first JSON object from model output.
+
+``find_json_span`` first lets the C JSON decoder parse from the first plausible
+object start, which covers well-formed responses. Otherwise ``JsonObjectScanner``
+walks the text once, tracking string and bracket state, and yields the first
+brace-balanced object that parses. The scanner can also be fed streamed chunks.
+If the text ends mid-object (e.g. the model hit ``max_output_tokens``), it can
+repair the object by cutting back to the last complete value and closing the
+open containers.
+"""
+import json
+import re
+from typing import Any, Dict, NamedTuple, Optional
+
+# Upper bound on the size of a candidate object; larger inputs are treated as truncated
+MAX_JSON_CHARS = 2_000_000
+
+# Characters that change scanner state outside strings
+_STRUCTURAL = re.compile(r'[{}\[\]",:]')
+# Body of a JSON string up to (not including) its closing quote or a trailing lone backslash
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*')
+_OBJECT_START = re.compile(r'\{\s*(?=["}]|$)')
+_COMPLETE_OBJECT_START = re.compile(r'\{\s*["}]')
+
+_DECODER = json.JSONDecoder()
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JsonObjectScanner:
+    """
+    Incrementally find the first complete JSON object in a stream of text.
+
+    Call ``feed`` with each chunk; it returns the parsed object once one is
+    complete. After the last chunk, ``finish`` returns the object, repairing a
+    truncated one if ``repair`` is true. ``json_text`` holds the text that was
+    parsed and ``repaired`` tells whether it had to be repaired.
+    """
+
+    def __init__(self, max_chars: int = MAX_JSON_CHARS):
+        self.max_chars = max_chars
+        self.result: Optional[Dict[str, Any]] = None
+        self.json_text: Optional[str] = None
+        self.repaired = False
+        self._text = ""
+        self._pos = 0
+        self._reset_candidate()
+
+    def _reset_candidate(self) -> None:
+        self._active = False
+        self._stack = []
+        self._expect_key = []
+        self._in_string = False
+        self._string_is_key = False
+        self._safe_end = 0
+        self._safe_closers = ""
+
+    def _mark_safe(self, end: int) -> None:
+        """Record ``end`` as a point where the object can be cut and closed."""
+        self._safe_end = end
+        self._safe_closers = "".join(_CLOSERS[c] for c in reversed(self._stack))
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Consume a chunk of text; return the object once the first complete one is found."""
+        if self.result is not None:
+            return self.result
+        self._text += chunk
+        self._scan()
+        return self.result
+
+    def finish(self, repair: bool = True) -> Optional[Dict[str, Any]]:
+        """Signal end of input; return the object, repairing a truncated one if allowed."""
+        if self.result is not None or not self._active or not repair:
+            return self.result
+        candidate = self._text[:self._safe_end] + self._safe_closers
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            return None
+        if isinstance(value, dict):
+            self.result = value
+            self.json_text = candidate
+            self.repaired = True
+        return self.result
+
+    def _start_candidate(self) -> bool:
+        """Advance to the next plausible object start; return False if more input is needed."""
+        while True:
+            start = self._text.find("{", self._pos)
+            if start == -1:
+                # Nothing worth keeping before the next chunk
+                self._text = ""
+                self._pos = 0
+                return False
+            match = _OBJECT_START.match(self._text, start)
+            if match is None:
+                # Prose such as "{for example}" rather than a JSON object
+                self._pos = start + 1
+                continue
+            if match.end() == len(self._text):
+                # Can't tell yet whether this brace opens an object
+                self._text = self._text[start:]
+                self._pos = 0
+                return False
+            # Drop everything before the candidate so offsets start at its brace
+            self._text = self._text[start:]
+            self._pos = 1
+            self._active = True
+            self._stack = ["{"]
+            self._expect_key = [True]
+            self._mark_safe(1)
+            return True
+
+    def _abandon(self, resume_at: int) -> None:
+        """Give up on the current candidate and keep searching from ``resume_at``."""
+        self._reset_candidate()
+        self._pos = resume_at
+
+    def _scan(self) -> None:
+        text = self._text
+        while self.result is None:
+            if not self._active:
+                if not self._start_candidate():
+                    return
+                text = self._text
+
+            if len(text) > self.max_chars:
+                # Treat oversized input as truncated; finish() may still repair it
+                self._text = text = text[:self.max_chars]
+                self._pos = len(text)
+                return
+
+            if self._in_string:
+                end = _STRING_BODY.match(text, self._pos).end()
+                if end >= len(text) or text[end] != '"':
+                    # String (or an escape sequence) continues in the next chunk
+                    self._pos = end
+                    return
+                self._pos = end + 1
+                self._in_string = False
+                if not self._string_is_key:
+                    self._mark_safe(self._pos)
+                continue
+
+            match = _STRUCTURAL.search(text, self._pos)
+            if match is None:
+                self._pos = len(text)
+                return
+            char = match.group()
+            index = match.start()
+            self._pos = index + 1
+            stack = self._stack
+
+            if char == '"':
+                self._in_string = True
+                self._string_is_key = stack[-1] == "{" and self._expect_key[-1]
+            elif char in "{[":
+                stack.append(char)
+                self._expect_key.append(char == "{")
+                self._mark_safe(self._pos)
+            elif char in "}]":
+                if stack[-1] != ("{" if char == "}" else "["):
+                    self._abandon(index + 1)
+                    continue
+                stack.pop()
+                self._expect_key.pop()
+                if stack:
+                    self._mark_safe(self._pos)
+                    continue
+                candidate = text[:self._pos]
+                try:
+                    self.result = json.loads(candidate)
+                    self.json_text = candidate
+                except ValueError:
+                    # Balanced but not JSON; look for another object after it
+                    self._abandon(self._pos)
+            elif char == ",":
+                # A comma always follows a complete value
+                self._mark_safe(index)
+                if stack[-1] == "{":
+                    self._expect_key[-1] = True
+            else:  # ":"
+                self._expect_key[-1] = False
+
+
+class JsonMatch(NamedTuple):
+    value: Dict[str, Any]
+    text: str
+    repaired: bool
+
+
+def find_json_span(text: str, repair: bool = True, max_chars: int = MAX_JSON_CHARS) -> Optional[JsonMatch]:
+    """Return the first JSON object in ``text`` with its source text, repairing a truncated one if allowed."""
+    text = text[:max_chars]
+    # Fast path: the C decoder parses the first well-formed object and ignores what follows
+    match = _COMPLETE_OBJECT_START.search(text)
+    if match is not None:
+        try:
+            value, end = _DECODER.raw_decode(text, match.start())
+            return JsonMatch(value, text[match.start():end], False)
+        except ValueError:
+            pass
+
+    # Slow path: prose with braces before the object, malformed candidates or truncation
+    scanner = JsonObjectScanner(max_chars=max_chars)
+    if scanner.feed(text) is None:
+        scanner.finish(repair=repair)
+    if scanner.result is None:
+        return None
+    return JsonMatch(scanner.result, scanner.json_text, scanner.repaired)
+
+
+def find_json_object(text: str, repair: bool = True, max_chars: int = MAX_JSON_CHARS) -> Optional[Dict[str, Any]]:
+    """Return the first JSON object in ``text``, repairing a truncated one if allowed."""
+    found = find_json_span(text, repair=repair, max_chars=max_chars)
+    return found.value if found else None
@@ -1,18 +1,35 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
 import os
 import sys
 from typing import Optional, List, Dict, Any
-import uvicorn
 
 # Import routers
-from app.routers import grading, rubric
+from app.routers import documents, grading, results, rubric, similarity
+from app.metrics import mark_worker_stopped, render_metrics
+from app.middleware import RequestContextMiddleware, configure_logging
+from app.pdf_text import warm_up as warm_up_extraction
+from app.responses import ORJSONResponse
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start the PDF extraction processes before the first upload needs them
+    warm_up_extraction()
+    yield
+    # Runs after uvicorn has drained open requests on shutdown
+    mark_worker_stopped()
 
 app = FastAPI(
     title="AI Assignment Grader API",
     description="API for grading assignments using AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -22,11 +39,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Assign request IDs and record request metrics (outermost middleware)
+app.add_middleware(RequestContextMiddleware)
+
 # Include routers
 app.include_router(grading.router, prefix="/api/grading", tags=["Grading"])
 app.include_router(rubric.router, prefix="/api/rubric", tags=["Rubric Analysis"])
+app.include_router(documents.router, prefix="/api/documents", tags=["Documents"])
+app.include_router(similarity.router, prefix="/api/similarity", tags=["Similarity"])
+app.include_router(results.router, prefix="/api/results", tags=["Results"])
 
 @app.get("/")
 async def root():
@@ -38,5 +62,14 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
 if __name__ == "__main__":
+    # Development server; use `python -m app.serve` for multiple workers
+    import uvicorn
+
     uvicorn.run("app.main:app", host="0.0.0.0", port=8001, reload=True) 
\ No newline at end of file
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# All metrics live in a dedicated registry so /metrics only exposes grader data
+REGISTRY = CollectorRegistry()
+
+# With several worker processes (see app.serve) each worker writes its samples
+# to this directory and /metrics aggregates them
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROCESS_DIR:
+    # prometheus_client writes here as soon as a metric is created, and
+    # fails if the directory doesn't exist (e.g. a single worker under app.serve)
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+# Buckets span fast local stages (JSON parsing) up to slow model calls
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+STAGE_SECONDS = Histogram(
+    "grader_stage_duration_seconds",
+    "Time spent in each grading pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+    registry=REGISTRY,
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "grader_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS,
+    registry=REGISTRY,
+)
+
+GEMINI_TOKENS = Counter(
+    "grader_gemini_tokens_total",
+    "Gemini tokens reported in response usage metadata",
+    ["model", "direction"],
+    registry=REGISTRY,
+)
+
+# Hit ratio per cache is rate(outcome="hit") / rate(all outcomes)
+CACHE_LOOKUPS = Counter(
+    "grader_cache_lookups_total",
+    "Cache lookups by cache name and outcome",
+    ["cache", "outcome"],
+    registry=REGISTRY,
+)
+
+IN_FLIGHT = Gauge(
+    "grader_in_flight",
+    "Work currently in progress (HTTP requests, grading jobs, rubric analyses)",
+    ["kind"],
+    registry=REGISTRY,
+    multiprocess_mode="livesum",
+)
+
+ROUTING_OUTCOMES = Counter(
+    "grader_routing_outcomes_total",
+    "Routed grading attempts by model and outcome (accepted, escalated, errors)",
+    ["model", "outcome"],
+    registry=REGISTRY,
+)
+
+RECONCILIATIONS = Counter(
+    "grader_reconciliations_total",
+    "Grading results whose deductions didn't match the grade, by how they were resolved",
+    ["method"],
+    registry=REGISTRY,
+)
+
+NEAR_DUPLICATES = Counter(
+    "grader_near_duplicate_submissions_total",
+    "Submissions found to be near-duplicates of an earlier submission of the same assignment",
+    registry=REGISTRY,
+)
+
+JSON_REPAIRS = Counter(
+    "grader_json_repairs_total",
+    "Truncated JSON objects in model responses that were repaired instead of discarded",
+    registry=REGISTRY,
+)
+
+ERRORS = Counter(
+    "grader_errors_total",
+    "Errors by pipeline stage and exception type",
+    ["stage", "type"],
+    registry=REGISTRY,
+)
+
+
+class UsageCollector:
+    """Token usage, models and stage timings of one unit of work (e.g. one grading request)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.models: List[str] = []
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.model_calls = 0
+        self.stage_seconds: Dict[str, float] = {}
+
+    def add_tokens(self, model: str, tokens: Dict[str, int]) -> None:
+        with self._lock:
+            self.model_calls += 1
+            if model not in self.models:
+                self.models.append(model)
+            self.input_tokens += tokens["input"]
+            self.output_tokens += tokens["output"]
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage] = round(self.stage_seconds.get(stage, 0.0) + seconds, 4)
+
+
+_usage: ContextVar[Optional[UsageCollector]] = ContextVar("usage", default=None)
+
+
+@contextmanager
+def collect_usage() -> Iterator[UsageCollector]:
+    """
+    Collect token usage and stage timings recorded in the block.
+
+    Threads started in the block only report to the collector if they run in
+    a copy of the caller's context (``contextvars.copy_context().run``).
+    """
+    collector = UsageCollector()
+    token = _usage.set(collector)
+    try:
+        yield collector
+    finally:
+        _usage.reset(token)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time a pipeline stage and count any exception it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERRORS.labels(stage=stage, type=type(e).__name__).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        collector = _usage.get()
+        if collector is not None:
+            collector.add_stage(stage, elapsed)
+
+
+@contextmanager
+def track_in_flight(kind: str) -> Iterator[None]:
+    """Count a unit of work as in flight for the duration of the block."""
+    gauge = IN_FLIGHT.labels(kind=kind)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+def record_token_usage(model: str, response: Any) -> Optional[dict]:
+    """Record Gemini token counts from a response's usage metadata, if present."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    tokens = {
+        "input": getattr(usage, "prompt_token_count", 0) or 0,
+        "output": getattr(usage, "candidates_token_count", 0) or 0,
+    }
+    for direction, count in tokens.items():
+        GEMINI_TOKENS.labels(model=model, direction=direction).inc(count)
+    collector = _usage.get()
+    if collector is not None:
+        collector.add_tokens(model, tokens)
+    return tokens
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    """Count a cache lookup as a hit or a miss."""
+    CACHE_LOOKUPS.labels(cache=cache, outcome="hit" if hit else "miss").inc()
+
+
+def render_metrics():
+    """Return the Prometheus exposition payload and its content type."""
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=MULTIPROCESS_DIR)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_worker_stopped() -> None:
+    """Drop this worker's live gauge samples when it exits (multi-worker mode only)."""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(os.getpid(), path=MULTIPROCESS_DIR)
@@ -0,0 +1,99 @@
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+
+from app.metrics import ERRORS, HTTP_REQUEST_SECONDS, track_in_flight
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Request ID of the request being handled in the current context ("-" outside requests)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+logger = logging.getLogger(__name__)
+
+
+def _route_template(scope) -> str:
+    """
+    Return the matched route as a template (e.g. ``/api/documents/{document_id}``).
+
+    Path parameter values are folded back into their names to keep label
+    cardinality bounded; unmatched paths share a single label.
+    """
+    if "endpoint" not in scope:
+        return "unmatched"
+    path = scope["path"]
+    for name, value in scope.get("path_params", {}).items():
+        path = path.replace(f"/{value}", "/{" + name + "}", 1)
+    return path
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every log record."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """Log to stderr with the request ID on every line."""
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that assigns each HTTP request an ID and records request metrics.
+
+    An incoming ``X-Request-ID`` header is reused so IDs can be propagated from a
+    proxy; otherwise a new one is generated. The ID is echoed in the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:128]
+                break
+        token = request_id_var.set(request_id or uuid.uuid4().hex)
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.encode(), request_id_var.get().encode())
+                ]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            with track_in_flight("http"):
+                await self.app(scope, receive, send_with_request_id)
+            if status >= 500:
+                ERRORS.labels(stage="http", type=f"http_{status}").inc()
+        except Exception as e:
+            ERRORS.labels(stage="http", type=type(e).__name__).inc()
+            logger.exception("Unhandled error for %s %s", scope["method"], scope["path"])
+            raise
+        finally:
+            HTTP_REQUEST_SECONDS.labels(
+                method=scope["method"],
+                route=_route_template(scope),
+                status=str(status),
+            ).observe(time.perf_counter() - start)
+            request_id_var.reset(token)
@@ -16,6 +16,7 @@ class GradingFeedback(BaseModel):
     strengths: List[str] = Field(..., description="List of strengths in the submission")
     point_deductions: List[PointDeduction] = Field(..., description="Areas where points were deducted")
     concept_improvements: List[ConceptImprovement] = Field(..., description="Suggestions to better grasp concepts")
+    truncated: bool = Field(False, description="The model's response was cut off and recovered; items after the cut are missing")
 
 class ImprovementSuggestion(BaseModel):
     area: str = Field(..., description="Area of improvement")
@@ -35,4 +36,106 @@ class RubricAnalysisRequest(BaseModel):
     api_key: str = Field(..., description="Google API Key")
 
 class ApiKeyModel(BaseModel):
-    api_key: str = Field(..., description="Google API Key") 
\ No newline at end of file
+    api_key: str = Field(..., description="Google API Key")
+
+class DocumentInfo(BaseModel):
+    document_id: str = Field(..., description="Document ID (SHA-256 of the PDF bytes, hex encoded)")
+    filename: Optional[str] = Field(None, description="Filename of the first upload of this document")
+    size: int = Field(..., description="Size of the PDF in bytes")
+    text_chars: Optional[int] = Field(None, description="Number of characters of extracted text")
+    created_at: str = Field(..., description="When the document was first registered (ISO 8601, UTC)")
+
+class SectionStatus(BaseModel):
+    number: str = Field(..., description="Rubric section number")
+    title: str = Field(..., description="Rubric section title")
+    points: int = Field(..., description="Points the section is worth")
+    changed: bool = Field(..., description="Whether the section's text differs from the previous submission")
+    reused: bool = Field(..., description="Whether a stored result was reused instead of calling the model")
+
+class RegradeResponse(BaseModel):
+    feedback: GradingFeedback = Field(..., description="Grading feedback for the new submission")
+    segmented: bool = Field(..., description="Whether the submission was graded section by section")
+    sections: List[SectionStatus] = Field(default_factory=list, description="Per-section status (segmented regrades only)")
+
+class ArchiveSubmissionResult(BaseModel):
+    entry: str = Field(..., description="Name of the submission's entry in the archive")
+    student: str = Field(..., description="Student name or login parsed from the entry name")
+    student_id: Optional[str] = Field(None, description="LMS user ID or username parsed from the entry name")
+    lms: Optional[str] = Field(None, description="LMS whose file naming the entry follows (canvas, moodle, blackboard)")
+    sha256: Optional[str] = Field(None, description="SHA-256 of the submission PDF")
+    status: str = Field(..., description="graded or failed")
+    numerical_grade: Optional[int] = Field(None, description="Grade out of 100 (graded submissions)")
+    feedback: Optional[GradingFeedback] = Field(None, description="Grading feedback (graded submissions)")
+    error: Optional[str] = Field(None, description="Why the submission could not be graded (failed submissions)")
+
+class ClusterMember(BaseModel):
+    submission_key: str = Field(..., description="Key of the indexed submission")
+    label: Optional[str] = Field(None, description="Filename or document ID the submission was graded under")
+
+class DuplicateCluster(BaseModel):
+    members: List[ClusterMember] = Field(..., description="Submissions in the cluster")
+    max_similarity: float = Field(..., description="Highest estimated similarity between two members")
+    min_similarity: float = Field(..., description="Lowest estimated similarity among the linking pairs")
+
+class StoredResultSummary(BaseModel):
+    id: int = Field(..., description="Result ID")
+    assignment_hash: str = Field(..., description="SHA-256 of the assignment's extracted text (whitespace-normalised)")
+    submission_hash: str = Field(..., description="SHA-256 of the submission's extracted text (whitespace-normalised)")
+    student: Optional[str] = Field(None, description="Student name or ID the result was stored under")
+    numerical_grade: int = Field(..., description="Grade out of 100")
+    model: Optional[str] = Field(None, description="Model(s) that produced the result, comma-separated")
+    prompt_version: Optional[str] = Field(None, description="Version of the grading prompt template")
+    input_tokens: int = Field(..., description="Prompt tokens used")
+    output_tokens: int = Field(..., description="Response tokens used")
+    latency_ms: Optional[float] = Field(None, description="Time taken to grade, in milliseconds")
+    stage_seconds: Dict[str, float] = Field(default_factory=dict, description="Seconds spent in each pipeline stage")
+    source: str = Field(..., description="Where the result was produced (api, streamlit, ...)")
+    created_at: str = Field(..., description="When the result was stored (ISO 8601, UTC)")
+
+class StoredResult(StoredResultSummary):
+    feedback: GradingFeedback = Field(..., description="The grading feedback")
+
+class ResultPage(BaseModel):
+    items: List[StoredResultSummary] = Field(..., description="Results on this page, newest first")
+    total: int = Field(..., description="Number of results matching the filters")
+    limit: int = Field(..., description="Page size")
+    offset: int = Field(..., description="Offset of the first result on this page")
+
+class ResultAggregate(BaseModel):
+    count: int = Field(..., description="Number of results")
+    mean_grade: Optional[float] = Field(None, description="Mean grade")
+    min_grade: Optional[int] = Field(None, description="Lowest grade")
+    max_grade: Optional[int] = Field(None, description="Highest grade")
+    grade_histogram: Dict[str, int] = Field(default_factory=dict, description="Number of results per 10-point grade band")
+    input_tokens: int = Field(..., description="Total prompt tokens used")
+    output_tokens: int = Field(..., description="Total response tokens used")
+    mean_latency_ms: Optional[float] = Field(None, description="Mean time taken to grade, in milliseconds")
+
+class GradeDistribution(BaseModel):
+    count: int = Field(..., description="Number of results")
+    mean: Optional[float] = Field(None, description="Mean grade")
+    median: Optional[float] = Field(None, description="Median grade")
+    std: Optional[float] = Field(None, description="Standard deviation of the grades")
+    min: Optional[int] = Field(None, description="Lowest grade")
+    max: Optional[int] = Field(None, description="Highest grade")
+    percentiles: Dict[str, float] = Field(default_factory=dict, description="10th, 25th, 75th and 90th percentile grades")
+    histogram: Dict[str, int] = Field(default_factory=dict, description="Number of results per 10-point grade band")
+
+class DeductionAreaStats(BaseModel):
+    area: str = Field(..., description="Deduction area (most common spelling)")
+    occurrences: int = Field(..., description="Number of deductions in this area")
+    results: int = Field(..., description="Number of results with a deduction in this area")
+    share_of_results: float = Field(..., description="Fraction of results with a deduction in this area")
+    total_points: float = Field(..., description="Total points deducted in this area")
+    mean_points: float = Field(..., description="Mean points lost per deduction in this area")
+    mean_points_per_result: float = Field(..., description="Mean points lost in this area across all results")
+
+class ConceptFrequency(BaseModel):
+    concept: str = Field(..., description="Concept (most common spelling)")
+    results: int = Field(..., description="Number of results suggesting an improvement for this concept")
+    share_of_results: float = Field(..., description="Fraction of results suggesting an improvement for this concept")
+
+class ClassAnalytics(BaseModel):
+    grades: GradeDistribution = Field(..., description="Grade distribution")
+    deduction_areas: List[DeductionAreaStats] = Field(..., description="Most common deduction areas")
+    concepts: List[ConceptFrequency] = Field(..., description="Most frequently suggested concept improvements")
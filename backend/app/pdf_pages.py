@@ -0,0 +1,125 @@
+"""
+Single pages of PDFs, for viewing a document a page at a time.
+
+``PageCache.page`` cuts one page out of a PDF as a small PDF of its own,
+scaled to the requested zoom, so a viewer only sends the pages being looked
+at instead of the whole file. Pages are cached by (document hash, page,
+zoom) up to ``PAGE_CACHE_BYTES``, the parsed documents of the last few
+documents are kept, and ``prefetch`` renders neighbouring pages in the
+background. PyPDF2 is imported on first use.
+"""
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_BYTES = int(os.environ.get("GRADER_PAGE_CACHE_BYTES", 64 * 1024 * 1024))
+
+# Returns the bytes of a document; only called when it isn't parsed already
+DocumentLoader = Callable[[], bytes]
+
+
+class RenderedPage(NamedTuple):
+    """One page as a standalone PDF, and its size in points after zooming."""
+
+    data: bytes
+    width: float
+    height: float
+
+
+class PageCache:
+    """
+    Thread-safe cache of rendered pages, shared by every viewer in the process.
+
+    Documents are identified by a hash of their content, so a page is
+    rendered once however many sessions show it.
+    """
+
+    def __init__(self, max_bytes: int = PAGE_CACHE_BYTES, max_documents: int = 4, prefetch_workers: int = 2):
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self.prefetch_workers = prefetch_workers
+        self._pages: "OrderedDict[Tuple[str, int, float], RenderedPage]" = OrderedDict()
+        self._size = 0
+        # digest -> (PdfReader, lock); a reader isn't safe to use from two threads at once
+        self._documents: "OrderedDict[str, Tuple[Any, threading.Lock]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _document(self, digest: str, load: DocumentLoader) -> Tuple[Any, threading.Lock]:
+        with self._lock:
+            document = self._documents.get(digest)
+            if document is not None:
+                self._documents.move_to_end(digest)
+                return document
+        import PyPDF2
+
+        # Parsed outside the lock; if two threads race, the first one stored wins
+        reader = PyPDF2.PdfReader(io.BytesIO(load()))
+        with self._lock:
+            document = self._documents.setdefault(digest, (reader, threading.Lock()))
+            self._documents.move_to_end(digest)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return document
+
+    def page_count(self, digest: str, load: DocumentLoader) -> int:
+        reader, lock = self._document(digest, load)
+        with lock:
+            return len(reader.pages)
+
+    def page(self, digest: str, load: DocumentLoader, page: int, zoom: float = 1.0) -> RenderedPage:
+        """Return page ``page`` (0-based) of a document, scaled by ``zoom``; raises IndexError past the end."""
+        key = (digest, page, zoom)
+        with self._lock:
+            rendered = self._pages.get(key)
+            if rendered is not None:
+                self._pages.move_to_end(key)
+                return rendered
+        rendered = self._render(digest, load, page, zoom)
+        with self._lock:
+            if key not in self._pages:
+                self._pages[key] = rendered
+                self._size += len(rendered.data)
+            while self._size > self.max_bytes and len(self._pages) > 1:
+                _, evicted = self._pages.popitem(last=False)
+                self._size -= len(evicted.data)
+        return rendered
+
+    def _render(self, digest: str, load: DocumentLoader, page: int, zoom: float) -> RenderedPage:
+        import PyPDF2
+
+        reader, lock = self._document(digest, load)
+        with lock:
+            writer = PyPDF2.PdfWriter()
+            # add_page copies the page into the writer, so scaling leaves the reader's page alone
+            copied = writer.add_page(reader.pages[page])
+            if zoom != 1.0:
+                copied.scale_by(zoom)
+            output = io.BytesIO()
+            writer.write(output)
+        return RenderedPage(output.getvalue(), float(copied.mediabox.width), float(copied.mediabox.height))
+
+    def prefetch(self, digest: str, load: DocumentLoader, pages: Iterable[int], zoom: float = 1.0) -> None:
+        """Render ``pages`` in the background if they aren't cached; pages past either end are skipped."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.prefetch_workers, thread_name_prefix="pdf-pages")
+            missing = [page for page in pages if page >= 0 and (digest, page, zoom) not in self._pages]
+        for page in missing:
+            self._executor.submit(self._prefetch_page, digest, load, page, zoom)
+
+    def _prefetch_page(self, digest: str, load: DocumentLoader, page: int, zoom: float) -> None:
+        try:
+            if page < self.page_count(digest, load):
+                self.page(digest, load, page, zoom)
+        except Exception:
+            logger.debug("Could not prefetch page %d of %s", page, digest, exc_info=True)
+
+
+page_cache = PageCache()
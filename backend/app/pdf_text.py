@@ -0,0 +1,95 @@
+"""
+PDF text extraction that runs in worker processes.
+
+PyPDF2 is pure Python, so extracting several PDFs in threads doesn't overlap
+the work. ``extract_in_pool`` runs each extraction in a shared pool of spawned
+processes instead, so the assignment, solution and submission of a request are
+parsed at the same time and the wait is the slowest parse, not the sum.
+PyPDF2 is only imported where a PDF is parsed, so workers start quickly.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+# Worker processes per server/app process; 0 extracts in the calling thread
+EXTRACT_WORKERS = int(os.environ.get("GRADER_EXTRACT_WORKERS", min(3, os.cpu_count() or 1)))
+
+# File objects can only be extracted in the calling process
+PdfSource = Union[bytes, str, Path, BinaryIO]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def extract_pdf_text(source: PdfSource, require_text: bool = True) -> str:
+    """
+    Extract the text of a PDF given as bytes, a file path or a binary file.
+
+    With ``require_text``, raises ValueError if the PDF has no pages or a page
+    has no extractable text (e.g. a scanned page).
+    """
+    import PyPDF2
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    elif isinstance(source, Path):
+        source = str(source)
+    reader = PyPDF2.PdfReader(source)
+    if require_text and len(reader.pages) == 0:
+        raise ValueError("PDF file is empty")
+    text = ""
+    for page in reader.pages:
+        page_text = page.extract_text()
+        if require_text and not page_text:
+            raise ValueError("Could not extract text from PDF - it may be scanned or image-based")
+        text += (page_text or "") + "\n"
+    return text
+
+
+def extraction_pool(replace_broken: bool = False) -> Optional[ProcessPoolExecutor]:
+    """Return the shared extraction pool (started on first use), or None if disabled."""
+    global _pool
+    if EXTRACT_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if replace_broken and _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            # spawn rather than fork: the caller may be a threaded server
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _import_pdf_library() -> None:
+    import PyPDF2  # noqa: F401
+
+
+def warm_up() -> None:
+    """Start the pool's worker processes and import PyPDF2 in them, without waiting."""
+    pool = extraction_pool()
+    if pool is not None:
+        for _ in range(EXTRACT_WORKERS):
+            pool.submit(_import_pdf_library)
+
+
+def extract_in_pool(source: PdfSource, require_text: bool = True) -> Future:
+    """Start extracting a PDF (bytes or a file path) in the pool; returns a future for its text."""
+    pool = extraction_pool()
+    if pool is not None:
+        try:
+            return pool.submit(extract_pdf_text, source, require_text)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a new pool
+            return extraction_pool(replace_broken=True).submit(extract_pdf_text, source, require_text)
+    future: Future = Future()
+    try:
+        future.set_result(extract_pdf_text(source, require_text))
+    except Exception as e:
+        future.set_exception(e)
+    return future
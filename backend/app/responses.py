@@ -0,0 +1,24 @@
+"""
+JSON response classes backed by orjson.
+
+``ORJSONResponse`` is the app's default response class. Endpoints that return
+large lists can build the JSON elsewhere (e.g. in SQLite) and send it as is
+with ``RawJSONResponse``, skipping per-item models entirely.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already serialized JSON (str or bytes)."""
+
+    media_type = "application/json"
@@ -0,0 +1,254 @@
+"""
+Persistent history of grading results.
+
+Every grade produced by the API or the Streamlit app is stored with the
+``GradingFeedback`` JSON, the models used, the prompt template version, token
+usage and latencies. Rows are keyed by hashes of the extracted assignment and
+submission text and indexed by assignment, student and time, so dashboards and
+re-exports can be served from here instead of re-running paid grading calls.
+Segmented grades also keep each section's result with the submission, so a
+later regrade can reuse the sections that didn't change.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .db import SQLiteDatabase
+
+RESULTS_PATH = Path(os.environ.get("GRADER_RESULTS_PATH", Path(tempfile.gettempdir()) / "grader-results.sqlite3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    assignment_hash TEXT NOT NULL,
+    submission_hash TEXT NOT NULL,
+    student TEXT,
+    numerical_grade INTEGER NOT NULL,
+    feedback TEXT NOT NULL,
+    model TEXT,
+    prompt_version TEXT,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL,
+    stage_seconds TEXT,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_assignment ON results (assignment_hash, created_at);
+CREATE INDEX IF NOT EXISTS results_by_student ON results (student, created_at);
+CREATE INDEX IF NOT EXISTS results_by_submission ON results (submission_hash);
+CREATE INDEX IF NOT EXISTS results_by_time ON results (created_at);
+-- Deductions and concept improvements, flattened for analytics
+CREATE TABLE IF NOT EXISTS result_items (
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    points REAL
+);
+CREATE INDEX IF NOT EXISTS result_items_by_result ON result_items (result_id, kind);
+-- Per-section results of segmented grades, so a resubmission can reuse its unchanged sections
+CREATE TABLE IF NOT EXISTS section_results (
+    assignment_hash TEXT NOT NULL,
+    submission_hash TEXT NOT NULL,
+    number TEXT NOT NULL,
+    section_key TEXT NOT NULL,
+    feedback TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (assignment_hash, submission_hash, number)
+);
+"""
+
+# A result summary as a JSON object, built by SQLite so listing results creates no
+# per-row Python objects
+_SUMMARY_JSON = (
+    "json_object('id', id, 'assignment_hash', assignment_hash, 'submission_hash', submission_hash, "
+    "'student', student, 'numerical_grade', numerical_grade, 'model', model, 'prompt_version', prompt_version, "
+    "'input_tokens', input_tokens, 'output_tokens', output_tokens, 'latency_ms', latency_ms, "
+    "'stage_seconds', json(coalesce(stage_seconds, '{}')), 'source', source, "
+    "'created_at', strftime('%Y-%m-%dT%H:%M:%f+00:00', created_at, 'unixepoch'))"
+)
+
+
+def content_hash(text: str) -> str:
+    """Key for extracted document text; whitespace differences don't change it."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def _filters(
+    assignment_hash: Optional[str] = None,
+    student: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+) -> Tuple[str, List[Any]]:
+    clauses, params = [], []
+    if assignment_hash:
+        clauses.append("assignment_hash = ?")
+        params.append(assignment_hash)
+    if student:
+        clauses.append("student = ?")
+        params.append(student)
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class ResultsStore:
+    """SQLite-backed store of grading results, shared by all processes on the machine."""
+
+    def __init__(self, path: Path = RESULTS_PATH):
+        self.db = SQLiteDatabase(path, _SCHEMA)
+
+    def record(
+        self,
+        assignment_text: str,
+        submission_text: str,
+        feedback: Dict[str, Any],
+        source: str,
+        student: Optional[str] = None,
+        model: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        latency_ms: Optional[float] = None,
+        stage_seconds: Optional[Dict[str, float]] = None,
+    ) -> int:
+        """Store a grading result and return its ID."""
+        items = [
+            ("deduction", str(d.get("area", "")), d.get("points")) for d in feedback.get("point_deductions", [])
+        ] + [
+            ("concept", str(c.get("concept", "")), None) for c in feedback.get("concept_improvements", [])
+        ]
+        with self.db.transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO results (assignment_hash, submission_hash, student, numerical_grade, feedback, model, "
+                "prompt_version, input_tokens, output_tokens, latency_ms, stage_seconds, source, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    content_hash(assignment_text),
+                    content_hash(submission_text),
+                    student,
+                    int(feedback["numerical_grade"]),
+                    json.dumps(feedback),
+                    model,
+                    prompt_version,
+                    input_tokens,
+                    output_tokens,
+                    latency_ms,
+                    json.dumps(stage_seconds or {}),
+                    source,
+                    time.time(),
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO result_items (result_id, kind, label, points) VALUES (?, ?, ?, ?)",
+                [(cursor.lastrowid, kind, label, points) for kind, label, points in items],
+            )
+        return cursor.lastrowid
+
+    def record_sections(
+        self,
+        assignment_text: str,
+        submission_text: str,
+        sections: List[Tuple[str, str, Dict[str, Any]]],
+    ) -> None:
+        """
+        Store a submission's per-section results as (section number, section key, feedback),
+        replacing any stored for the same sections.
+        """
+        assignment_hash, submission_hash, now = content_hash(assignment_text), content_hash(submission_text), time.time()
+        with self.db.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO section_results "
+                "(assignment_hash, submission_hash, number, section_key, feedback, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (assignment_hash, submission_hash, number, section_key, json.dumps(feedback), now)
+                    for number, section_key, feedback in sections
+                ],
+            )
+
+    def section_results(self, assignment_text: str, submission_text: str) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """Return section number -> (section key, feedback) for a submission's stored section results."""
+        rows = self.db.connect().execute(
+            "SELECT number, section_key, feedback FROM section_results WHERE assignment_hash = ? AND submission_hash = ?",
+            (content_hash(assignment_text), content_hash(submission_text)),
+        )
+        return {number: (section_key, json.loads(feedback)) for number, section_key, feedback in rows}
+
+    def get_json(self, result_id: int) -> Optional[str]:
+        """Return a stored result including its feedback as a JSON object, or None."""
+        row = self.db.connect().execute(
+            f"SELECT json_set({_SUMMARY_JSON}, '$.feedback', json(feedback)) FROM results WHERE id = ?", (result_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, result_id: int) -> Optional[Dict[str, Any]]:
+        """Return a stored result including its feedback, or None."""
+        stored = self.get_json(result_id)
+        return json.loads(stored) if stored is not None else None
+
+    def list_json(self, limit: int = 50, offset: int = 0, **filters) -> Tuple[str, int]:
+        """Return one page of result summaries, newest first, as a JSON array, and the total number of matches."""
+        where, params = _filters(**filters)
+        conn = self.db.connect()
+        (total,) = conn.execute(f"SELECT count(*) FROM results{where}", params).fetchone()
+        rows = conn.execute(
+            f"SELECT {_SUMMARY_JSON} FROM results{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        )
+        return "[" + ",".join(summary for (summary,) in rows) + "]", total
+
+    def aggregate(self, **filters) -> Dict[str, Any]:
+        """Summary statistics over matching results."""
+        where, params = _filters(**filters)
+        conn = self.db.connect()
+        count, mean, low, high, input_tokens, output_tokens, latency = conn.execute(
+            "SELECT count(*), avg(numerical_grade), min(numerical_grade), max(numerical_grade), "
+            f"coalesce(sum(input_tokens), 0), coalesce(sum(output_tokens), 0), avg(latency_ms) FROM results{where}",
+            params,
+        ).fetchone()
+        histogram = {
+            f"{bucket * 10}-{bucket * 10 + 9 if bucket < 9 else 100}": n
+            for bucket, n in conn.execute(
+                f"SELECT min(numerical_grade / 10, 9) AS bucket, count(*) FROM results{where} GROUP BY bucket ORDER BY bucket",
+                params,
+            )
+        }
+        return {
+            "count": count,
+            "mean_grade": round(mean, 2) if mean is not None else None,
+            "min_grade": low,
+            "max_grade": high,
+            "grade_histogram": histogram,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "mean_latency_ms": round(latency, 1) if latency is not None else None,
+        }
+
+    def grades(self, **filters) -> List[Tuple[int, int]]:
+        """Return (result ID, grade) for every matching result."""
+        where, params = _filters(**filters)
+        return self.db.connect().execute(f"SELECT id, numerical_grade FROM results{where}", params).fetchall()
+
+    def items(self, kind: str, **filters) -> List[Tuple[int, str, Optional[float]]]:
+        """
+        Return (result ID, label, points) for every deduction (``kind="deduction"``,
+        labelled by area) or concept improvement (``kind="concept"``) of matching results.
+        """
+        where, params = _filters(**filters)
+        # The filters only need the results table's indexes, not its (wide) rows
+        matching = f" AND result_id IN (SELECT id FROM results{where})" if where else ""
+        return self.db.connect().execute(
+            f"SELECT result_id, label, points FROM result_items WHERE kind = ?{matching}",
+            [kind] + params,
+        ).fetchall()
+
+
+results_store = ResultsStore()
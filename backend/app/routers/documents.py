@@ -0,0 +1,49 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Response
+import logging
+
+from app.models import DocumentInfo
+from app.services.documents import DocumentNotFound, document_registry, register_upload
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.post("", response_model=DocumentInfo)
+async def upload_document(document: UploadFile = File(...)):
+    """
+    Register a PDF so later requests can reference it by ID instead of re-uploading it.
+    
+    Uploading a document that is already registered is cheap and returns the existing entry.
+    
+    - **document**: PDF file to register
+    """
+    try:
+        return await register_upload(document)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Error registering document")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.head("/{document_id}")
+async def probe_document(document_id: str):
+    """
+    Check whether a document is registered without transferring it.
+    
+    - **document_id**: SHA-256 of the PDF bytes (hex)
+    """
+    # A probed document is about to be used, so it counts as recently used
+    if not document_registry.touch(document_id):
+        return Response(status_code=404)
+    return Response(status_code=200)
+
+@router.get("/{document_id}", response_model=DocumentInfo)
+async def get_document(document_id: str):
+    """
+    Get metadata for a registered document.
+    
+    - **document_id**: SHA-256 of the PDF bytes (hex)
+    """
+    try:
+        return document_registry.get_info(document_id)
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
@@ -1,23 +1,44 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
 from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, List, Optional
 import io
+import os
 from pathlib import Path
 from pydantic import ValidationError
+import asyncio
 import json
+import time
 import zipfile
+import logging
 from datetime import datetime
 
-from app.models import GradingFeedback, GradeRequest
-from app.services.ai_service import grade_assignment
-from app.utils import extract_text_from_pdf, generate_results_pdf, export_to_docx
+from app.metrics import collect_usage, track_in_flight
+from app.models import ArchiveSubmissionResult, GradingFeedback, GradeRequest, RegradeResponse
+from app.pdf_text import extract_in_pool
+from app.services.ai_service import preload_model_client
+from app.services.grading import grade_texts, store_result
+from app.services.reconcile import reconcile_feedback
+from app.services.routing import model_router, routing_stats
+from app.services.segmentation import regrade_segmented
+from app.services.documents import DocumentNotFound, resolve_document_text
+from app.services.ingest import ArchiveSubmission, list_submissions, read_submission
+from app.utils import (
+    calculate_score_breakdown,
+    export_to_docx,
+    generate_results_pdf,
+)
 
 # Get the directory of the current file
 CURRENT_DIR = Path(__file__).parent
 # Go up three levels (routers -> app -> backend -> project_root) then into 'data'
 DATA_DIR = CURRENT_DIR.parent.parent.parent / "data"
 
+# Submissions of an archive graded at once
+ARCHIVE_CONCURRENCY = int(os.environ.get("GRADER_ARCHIVE_CONCURRENCY", 4))
+
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.get("/sample-files")
 async def get_sample_files():
@@ -67,65 +88,303 @@ async def get_sample_files():
         raise e
     except Exception as e:
         # Catch other potential errors (e.g., file reading issues)
-        print(f"Error creating zip file: {e}") # Add logging for debugging
+        logger.exception("Error creating zip file: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error creating sample file archive: {str(e)}")
 
 @router.post("/grade-assignment", response_model=GradingFeedback)
 async def grade_assignment_endpoint(
-    assignment: UploadFile = File(...),
-    solution: UploadFile = File(...),
-    submission: UploadFile = File(...),
+    assignment: Optional[UploadFile] = File(None),
+    solution: Optional[UploadFile] = File(None),
+    submission: Optional[UploadFile] = File(None),
     api_key: str = Form(...),
     include_grading_advice: bool = Form(False),
-    grading_advice: Optional[str] = Form(None)
+    grading_advice: Optional[str] = Form(None),
+    assignment_id: Optional[str] = Form(None),
+    solution_id: Optional[str] = Form(None),
+    submission_id: Optional[str] = Form(None),
+    segmented: bool = Form(False),
+    reuse_similar: bool = Form(False),
+    student: Optional[str] = Form(None)
 ):
     """
     Grade an assignment based on the provided files and options.
     
-    - **assignment**: PDF file containing the assignment details and rubric
-    - **solution**: PDF file containing the solution
-    - **submission**: PDF file containing the student submission
+    Each document can be uploaded directly or referenced by the ID returned from
+    `POST /api/documents`, so repeated assignment/solution files need not be re-sent.
+    
+    - **assignment** / **assignment_id**: PDF file (or document ID) containing the assignment details and rubric
+    - **solution** / **solution_id**: PDF file (or document ID) containing the solution
+    - **submission** / **submission_id**: PDF file (or document ID) containing the student submission
     - **api_key**: Google API key for Gemini
     - **include_grading_advice**: Whether to include grading advice in the prompt
     - **grading_advice**: Custom grading advice to include in the prompt
+    - **segmented**: Grade each rubric section separately and in parallel, then merge the results
+      (falls back to grading the whole submission if the rubric can't be split into sections)
+    - **reuse_similar**: Reuse the result of an earlier, near-identical submission of the same
+      assignment instead of calling the model (near-duplicates are always detected and logged)
+    - **student**: Student name or ID stored with the result in the results history
+      (defaults to the submission's filename or document ID)
     """
-    try:
-        # Extract text from PDFs
-        assignment_content = await assignment.read()
-        solution_content = await solution.read()
-        submission_content = await submission.read()
-        
-        # Reset file pointers
-        assignment.file.seek(0)
-        solution.file.seek(0)
-        submission.file.seek(0)
-        
-        # Extract text
-        assignment_text = extract_text_from_pdf(io.BytesIO(assignment_content))
-        solution_text = extract_text_from_pdf(io.BytesIO(solution_content))
-        submission_text = extract_text_from_pdf(io.BytesIO(submission_content))
-        
-        if not all([assignment_text, solution_text, submission_text]):
-            raise HTTPException(
-                status_code=400, 
-                detail="Failed to extract text from one or more PDF files. Please ensure they are text-based PDFs."
+    with track_in_flight("grading"):
+        try:
+            # Resolve each document to its (cached) extracted text, extracting new ones in parallel
+            assignment_text, solution_text, submission_text, _ = await asyncio.gather(
+                resolve_document_text(assignment, assignment_id, "assignment"),
+                resolve_document_text(solution, solution_id, "solution"),
+                resolve_document_text(submission, submission_id, "submission"),
+                run_in_threadpool(preload_model_client)
             )
+        except DocumentNotFound as e:
+            raise HTTPException(status_code=404, detail=f"Document not found: {e.args[0]}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Grade the assignment
-        result = grade_assignment(
-            assignment_text=assignment_text,
-            solution_text=solution_text,
-            submission_text=submission_text,
-            api_key=api_key,
-            include_grading_advice=include_grading_advice,
-            grading_advice=grading_advice
+        submission_label = submission.filename if submission is not None else submission_id
+        # Grading blocks on model calls, so it runs in a worker thread
+        return await run_in_threadpool(
+            _grade_texts,
+            assignment_text, solution_text, submission_text, api_key, include_grading_advice, grading_advice,
+            segmented=segmented, submission_label=submission_label, reuse_similar=reuse_similar,
+            student=student or submission_label
+        )
+
+def _grade_texts(
+    assignment_text: str,
+    solution_text: str,
+    submission_text: str,
+    api_key: str,
+    include_grading_advice: bool,
+    grading_advice: Optional[str],
+    segmented: bool = False,
+    submission_label: Optional[str] = None,
+    reuse_similar: bool = False,
+    student: Optional[str] = None
+) -> GradingFeedback:
+    """Grade the submission from the extracted document texts (see app.services.grading), raising HTTP errors."""
+    if not all([assignment_text, solution_text, submission_text]):
+        raise HTTPException(
+            status_code=400, 
+            detail="Failed to extract text from one or more PDF files. Please ensure they are text-based PDFs."
+        )
+    try:
+        return grade_texts(
+            assignment_text, solution_text, submission_text, api_key, include_grading_advice, grading_advice,
+            segmented=segmented, submission_label=submission_label, reuse_similar=reuse_similar, student=student
         )
-        
-        return result
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/grade-archive")
+async def grade_archive_endpoint(
+    archive: UploadFile = File(...),
+    assignment: Optional[UploadFile] = File(None),
+    solution: Optional[UploadFile] = File(None),
+    api_key: str = Form(...),
+    include_grading_advice: bool = Form(False),
+    grading_advice: Optional[str] = Form(None),
+    assignment_id: Optional[str] = Form(None),
+    solution_id: Optional[str] = Form(None),
+    segmented: bool = Form(False)
+):
+    """
+    Grade every PDF in a ZIP of submissions, such as a Canvas, Moodle or Blackboard export.
+
+    The archive's entries are read one at a time, without extracting the archive,
+    and the student is parsed from each entry's name (LMS file naming, else the
+    top-level folder or file name). Non-PDF entries are skipped.
+
+    Responds with one `ArchiveSubmissionResult` JSON object per line
+    (`application/x-ndjson`) as each submission finishes, so results arrive while
+    the rest of the archive is being graded. A submission that can't be read,
+    extracted or graded gets a line with status `failed` and doesn't stop the others.
+
+    - **archive**: ZIP file of submission PDFs
+    - **assignment** / **assignment_id**, **solution** / **solution_id**, **api_key**,
+      **include_grading_advice**, **grading_advice**, **segmented**: as for `/grade-assignment`
+    """
+    try:
+        assignment_text, solution_text, _ = await asyncio.gather(
+            resolve_document_text(assignment, assignment_id, "assignment"),
+            resolve_document_text(solution, solution_id, "solution"),
+            run_in_threadpool(preload_model_client)
+        )
+    except DocumentNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Document not found: {e.args[0]}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not assignment_text or not solution_text:
+        raise HTTPException(status_code=400, detail="Failed to extract text from the assignment or solution PDF.")
+
+    try:
+        # Only the archive's central directory is read here
+        zip_file = await run_in_threadpool(zipfile.ZipFile, archive.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="The archive is not a ZIP file")
+    submissions = list_submissions(zip_file)
+    if not submissions:
+        zip_file.close()
+        raise HTTPException(status_code=400, detail="The archive contains no PDF submissions")
+
+    return StreamingResponse(
+        _grade_archive(
+            zip_file, submissions, assignment_text, solution_text, api_key, include_grading_advice, grading_advice,
+            segmented=segmented
+        ),
+        media_type="application/x-ndjson"
+    )
+
+async def _grade_archive(
+    zip_file: zipfile.ZipFile,
+    submissions: List[ArchiveSubmission],
+    assignment_text: str,
+    solution_text: str,
+    api_key: str,
+    include_grading_advice: bool,
+    grading_advice: Optional[str],
+    segmented: bool = False
+) -> AsyncIterator[str]:
+    """Grade the archive's submissions, ARCHIVE_CONCURRENCY at a time, yielding each result as a line of JSON."""
+    grading = asyncio.Semaphore(ARCHIVE_CONCURRENCY)
+
+    async def grade_one(submission: ArchiveSubmission) -> ArchiveSubmissionResult:
+        name = submission.name
+        result = ArchiveSubmissionResult(
+            entry=submission.entry, student=name.student, student_id=name.student_id, lms=name.lms, status="failed"
+        )
+        async with grading:
+            try:
+                data, result.sha256 = await run_in_threadpool(read_submission, zip_file, submission)
+            except (ValueError, zipfile.BadZipFile) as e:
+                result.error = f"Could not read the submission: {e}"
+                return result
+            try:
+                submission_text = await asyncio.wrap_future(extract_in_pool(data))
+            except Exception as e:
+                result.error = f"Error extracting text from PDF: {e}"
+                return result
+            try:
+                feedback = await run_in_threadpool(
+                    grade_texts,
+                    assignment_text, solution_text, submission_text, api_key, include_grading_advice, grading_advice,
+                    segmented=segmented, submission_label=submission.entry, student=name.student
+                )
+            except Exception as e:
+                result.error = str(e)
+                return result
+        result.status = "graded"
+        result.numerical_grade = feedback.numerical_grade
+        result.feedback = feedback
+        return result
+
+    tasks = [asyncio.ensure_future(grade_one(submission)) for submission in submissions]
+    try:
+        with track_in_flight("grading"):
+            for finished in asyncio.as_completed(tasks):
+                yield (await finished).model_dump_json() + "\n"
+    finally:
+        # The client went away, or everything is done
+        for task in tasks:
+            task.cancel()
+        zip_file.close()
+
+@router.post("/regrade", response_model=RegradeResponse)
+async def regrade_endpoint(
+    previous_submission_id: str = Form(...),
+    assignment: Optional[UploadFile] = File(None),
+    solution: Optional[UploadFile] = File(None),
+    submission: Optional[UploadFile] = File(None),
+    api_key: str = Form(...),
+    include_grading_advice: bool = Form(False),
+    grading_advice: Optional[str] = Form(None),
+    assignment_id: Optional[str] = Form(None),
+    solution_id: Optional[str] = Form(None),
+    submission_id: Optional[str] = Form(None),
+    student: Optional[str] = Form(None)
+):
+    """
+    Regrade a resubmission, sending only the rubric sections that changed to the model.
+    
+    The new submission is split into rubric sections and compared with the previously graded
+    version. Sections whose text is unchanged reuse their stored results. If the documents
+    can't be segmented, the whole submission is regraded.
+    
+    - **previous_submission_id**: Document ID of the previously graded submission
+    - **submission** / **submission_id**: The new submission (PDF or document ID)
+    - **assignment** / **assignment_id**, **solution** / **solution_id**: As for `/grade-assignment`
+    - **api_key**: Google API key for Gemini
+    - **include_grading_advice** / **grading_advice**, **student**: As for `/grade-assignment`
+    """
+    with track_in_flight("grading"):
+        try:
+            assignment_text, solution_text, previous_text, submission_text, _ = await asyncio.gather(
+                resolve_document_text(assignment, assignment_id, "assignment"),
+                resolve_document_text(solution, solution_id, "solution"),
+                resolve_document_text(None, previous_submission_id, "previous_submission"),
+                resolve_document_text(submission, submission_id, "submission"),
+                run_in_threadpool(preload_model_client)
+            )
+        except DocumentNotFound as e:
+            raise HTTPException(status_code=404, detail=f"Document not found: {e.args[0]}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        student = student or (submission.filename if submission is not None else submission_id)
+        return await run_in_threadpool(
+            _regrade_texts,
+            assignment_text, solution_text, previous_text, submission_text, api_key,
+            include_grading_advice, grading_advice, student
+        )
+
+def _regrade_texts(
+    assignment_text: str,
+    solution_text: str,
+    previous_text: str,
+    submission_text: str,
+    api_key: str,
+    include_grading_advice: bool,
+    grading_advice: Optional[str],
+    student: Optional[str]
+) -> RegradeResponse:
+    """Regrade a resubmission from the extracted document texts and store the result."""
+    started = time.perf_counter()
+    with collect_usage() as usage:
+        try:
+            regraded = regrade_segmented(
+                model_router,
+                assignment_text,
+                solution_text,
+                previous_text,
+                submission_text,
+                api_key,
+                include_grading_advice=include_grading_advice,
+                grading_advice=grading_advice
+            )
+            if regraded is not None:
+                regraded = (reconcile_feedback(regraded[0], api_key), regraded[1])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+    
+    if regraded is None:
+        feedback = _grade_texts(
+            assignment_text, solution_text, submission_text, api_key, include_grading_advice, grading_advice,
+            student=student
+        )
+        return RegradeResponse(feedback=feedback, segmented=False)
+    
+    feedback, sections = regraded
+    store_result(assignment_text, submission_text, feedback, student, usage, started)
+    return RegradeResponse(feedback=feedback, segmented=True, sections=sections)
+
+@router.get("/model-stats")
+async def get_model_stats():
+    """
+    Get per-model routing statistics for this worker process.
+    
+    For each model tier: attempts, how many results were accepted, escalated
+    to the next tier or failed, and the mean latency per attempt.
+    """
+    return {"tiers": model_router.tiers, "models": routing_stats.snapshot()}
+
 @router.post("/calculate-total-score")
 async def calculate_total_score(grading_feedback: GradingFeedback):
     """
@@ -134,29 +393,7 @@ async def calculate_total_score(grading_feedback: GradingFeedback):
     - **grading_feedback**: The grading feedback object
     """
     try:
-        # Calculate total deductions
-        total_deducted = 0
-        for deduction in grading_feedback.point_deductions:
-            total_deducted += deduction.points
-        
-        # Calculate final score
-        final_score = 100 - total_deducted
-        
-        # Check for discrepancy
-        if final_score != grading_feedback.numerical_grade:
-            return {
-                "calculated_score": final_score,
-                "reported_score": grading_feedback.numerical_grade,
-                "discrepancy": True,
-                "total_deductions": total_deducted
-            }
-        else:
-            return {
-                "calculated_score": final_score,
-                "reported_score": grading_feedback.numerical_grade,
-                "discrepancy": False,
-                "total_deductions": total_deducted
-            }
+        return calculate_score_breakdown(grading_feedback)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -190,4 +427,4 @@ async def download_docx(result: GradingFeedback):
             headers={"Content-Disposition": f"attachment; filename=grading-result-{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"}
         )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,127 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, Optional
+from datetime import datetime
+import io
+import logging
+
+from app.analytics import class_analytics
+from app.models import ClassAnalytics, GradingFeedback, ResultAggregate, ResultPage, StoredResult
+from app.responses import RawJSONResponse
+from app.results_store import content_hash, results_store
+from app.services.documents import DocumentNotFound, document_registry
+from app.utils import export_to_csv, export_to_docx, generate_results_pdf
+
+# The routes are plain functions because they block on SQLite, pandas and report
+# rendering: FastAPI runs them in its threadpool instead of on the event loop
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+EXPORTS = {
+    "pdf": (generate_results_pdf, "application/pdf"),
+    "docx": (export_to_docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "csv": (export_to_csv, "text/csv"),
+}
+
+def _filters(
+    assignment_id: Optional[str],
+    assignment_hash: Optional[str],
+    student: Optional[str],
+    since: Optional[datetime],
+    until: Optional[datetime]
+) -> Dict[str, Any]:
+    """Turn query parameters into results store filters."""
+    if assignment_id:
+        try:
+            assignment_hash = content_hash(document_registry.get_text(assignment_id))
+        except DocumentNotFound:
+            raise HTTPException(status_code=404, detail=f"Document not found: {assignment_id}")
+    return {
+        "assignment_hash": assignment_hash,
+        "student": student,
+        "since": since.timestamp() if since else None,
+        "until": until.timestamp() if until else None,
+    }
+
+@router.get("", response_model=ResultPage)
+def list_results(
+    assignment_id: Optional[str] = Query(None, description="Document ID of the assignment"),
+    assignment_hash: Optional[str] = Query(None, description="Hash of the assignment's extracted text"),
+    student: Optional[str] = Query(None, description="Student name or ID"),
+    since: Optional[datetime] = Query(None, description="Only results stored at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only results stored before this time"),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0)
+):
+    """
+    List stored grading results, newest first.
+
+    Results can be filtered by assignment (document ID or text hash), student and time.
+    Items omit the feedback; fetch a result by ID for the full feedback.
+    """
+    filters = _filters(assignment_id, assignment_hash, student, since, until)
+    items, total = results_store.list_json(limit=limit, offset=offset, **filters)
+    # The page is assembled from JSON built by the store rather than validated item by item
+    return RawJSONResponse(f'{{"items":{items},"total":{total},"limit":{limit},"offset":{offset}}}')
+
+@router.get("/aggregate", response_model=ResultAggregate)
+def aggregate_results(
+    assignment_id: Optional[str] = Query(None, description="Document ID of the assignment"),
+    assignment_hash: Optional[str] = Query(None, description="Hash of the assignment's extracted text"),
+    student: Optional[str] = Query(None, description="Student name or ID"),
+    since: Optional[datetime] = Query(None, description="Only results stored at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only results stored before this time")
+):
+    """
+    Get grade statistics, a grade histogram, token totals and mean latency for stored results.
+
+    Takes the same filters as listing results.
+    """
+    return results_store.aggregate(**_filters(assignment_id, assignment_hash, student, since, until))
+
+@router.get("/analytics", response_model=ClassAnalytics)
+def get_class_analytics(
+    assignment_id: Optional[str] = Query(None, description="Document ID of the assignment"),
+    assignment_hash: Optional[str] = Query(None, description="Hash of the assignment's extracted text"),
+    student: Optional[str] = Query(None, description="Student name or ID"),
+    since: Optional[datetime] = Query(None, description="Only results stored at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only results stored before this time"),
+    top: int = Query(20, ge=1, le=100, description="Number of deduction areas and concepts to return")
+):
+    """
+    Get class-level analytics for stored results: the grade distribution, the most common
+    deduction areas with the points lost in each, and the most frequently suggested concepts.
+
+    Takes the same filters as listing results. Areas and concepts that differ only in case
+    or whitespace are counted together.
+    """
+    return class_analytics(top=top, **_filters(assignment_id, assignment_hash, student, since, until))
+
+@router.get("/{result_id}", response_model=StoredResult)
+def get_result(result_id: int):
+    """Get a stored grading result, including its feedback."""
+    stored = results_store.get_json(result_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Result not found: {result_id}")
+    return RawJSONResponse(stored)
+
+@router.get("/{result_id}/download")
+def download_result(result_id: int, format: str = Query("pdf", pattern="^(pdf|docx|csv)$")):
+    """Download a stored grading result as PDF, DOCX or CSV without regrading."""
+    stored = results_store.get(result_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"Result not found: {result_id}")
+    export, media_type = EXPORTS[format]
+    try:
+        exported = export(GradingFeedback.model_validate(stored["feedback"]))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not exported:
+        raise HTTPException(status_code=500, detail=f"Failed to generate {format.upper()}")
+    if isinstance(exported, io.StringIO):
+        exported = io.BytesIO(exported.getvalue().encode("utf-8"))
+    return StreamingResponse(
+        exported,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=grading-result-{result_id}.{format}"}
+    )
@@ -1,70 +1,77 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
-import io
+import logging
 
+from app.metrics import track_in_flight
 from app.models import RubricAnalysisResponse, RubricAnalysisRequest
 from app.services.ai_service import analyze_rubric
-from app.utils import extract_text_from_pdf
+from app.services.documents import DocumentNotFound, resolve_document_text
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/analyze", response_model=RubricAnalysisResponse)
 async def analyze_rubric_endpoint(
-    assignment: UploadFile = File(...),
-    api_key: str = Form(...)
+    assignment: Optional[UploadFile] = File(None),
+    api_key: str = Form(...),
+    assignment_id: Optional[str] = Form(None)
 ):
     """
     Analyze a rubric/assignment to provide improvement recommendations and grading advice.
     
     - **assignment**: PDF file containing the assignment details and rubric
+    - **assignment_id**: ID of a registered document to use instead of uploading the PDF
     - **api_key**: Google API key for Gemini
     """
+    with track_in_flight("rubric_analysis"):
+        return await _analyze_rubric(assignment, assignment_id, api_key)
+
+async def _analyze_rubric(assignment: Optional[UploadFile], assignment_id: Optional[str], api_key: str):
+    """Run the rubric analysis pipeline for an uploaded or registered assignment."""
     try:
-        print(f"Starting rubric analysis with file: {assignment.filename}")
-        
-        # Extract text from PDF
-        assignment_content = await assignment.read()
-        print(f"Read {len(assignment_content)} bytes from PDF")
-        
-        # Reset file pointers
-        assignment.file.seek(0)
+        logger.info("Starting rubric analysis with %s", assignment_id or (assignment and assignment.filename))
         
-        # Extract text
-        print("Attempting to extract text from PDF...")
-        assignment_text = extract_text_from_pdf(io.BytesIO(assignment_content))
+        # Extract text (served from the document registry when already known)
+        try:
+            assignment_text = await resolve_document_text(assignment, assignment_id, "assignment")
+        except DocumentNotFound as e:
+            raise HTTPException(status_code=404, detail=f"Document not found: {e.args[0]}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         if not assignment_text:
-            print("Failed to extract text from PDF")
+            logger.warning("Failed to extract text from PDF")
             raise HTTPException(
                 status_code=400, 
                 detail="Failed to extract text from the PDF file. Please ensure it is a text-based PDF."
             )
         
-        print(f"Successfully extracted {len(assignment_text)} characters from PDF")
+        logger.info("Successfully extracted %d characters from PDF", len(assignment_text))
         
         # Analyze the rubric
-        print("Starting AI analysis...")
-        result = analyze_rubric(
+        logger.info("Starting AI analysis...")
+        result = await run_in_threadpool(
+            analyze_rubric,
             assignment_rubric_text=assignment_text,
             api_key=api_key
         )
         
         if not result:
-            print("AI analysis returned no results")
+            logger.warning("AI analysis returned no results")
             raise HTTPException(
                 status_code=500,
                 detail="Failed to analyze rubric. The AI service returned no results."
             )
         
-        print("Successfully completed rubric analysis")
+        logger.info("Successfully completed rubric analysis")
         return result
         
-    except HTTPException:
-        print("HTTP Exception raised:", str(e))
+    except HTTPException as e:
+        logger.warning("HTTP Exception raised: %s", e.detail)
         raise
     except Exception as e:
-        print(f"Unexpected error during rubric analysis: {str(e)}")
-        print(f"Error type: {type(e)}")
+        logger.exception("Unexpected error during rubric analysis (%s): %s", type(e).__name__, str(e))
         error_msg = str(e)
         if "API key" in error_msg.lower():
             raise HTTPException(
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+import logging
+
+from app.models import DuplicateCluster
+from app.services.documents import DocumentNotFound, document_registry
+from app.services.similarity import similarity_index, text_hash
+
+# Plain function: it blocks on PDF extraction and SQLite, so FastAPI runs it in
+# its threadpool instead of on the event loop
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("/clusters", response_model=List[DuplicateCluster])
+def get_clusters(
+    assignment_id: str = Query(..., description="Document ID of the assignment"),
+    threshold: Optional[float] = Query(None, ge=0, le=1, description="Minimum estimated similarity (default: GRADER_DUPLICATE_SIMILARITY)")
+):
+    """
+    Get clusters of near-duplicate submissions graded for an assignment, largest first.
+    
+    Clusters can indicate group work, shared templates or copied submissions.
+    
+    - **assignment_id**: Document ID of the assignment PDF
+    - **threshold**: Minimum estimated (MinHash) similarity for two submissions to be linked
+    """
+    try:
+        assignment_text = document_registry.get_text(assignment_id)
+    except DocumentNotFound:
+        raise HTTPException(status_code=404, detail=f"Document not found: {assignment_id}")
+    return similarity_index.clusters(text_hash(assignment_text), threshold)
@@ -1,20 +1,69 @@
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
+import os
 import re
 import json
+import logging
 from typing import Dict, Any, Optional
 
-from app.models import GradingFeedback, RubricAnalysisResponse
+from pydantic import ValidationError
+
+from app.json_scan import find_json_span
+from app.metrics import JSON_REPAIRS, record_token_usage, track_stage
+from app.models import ConceptImprovement, GradingFeedback, PointDeduction, RubricAnalysisResponse
+from app.services.cache import cache_key, shared_cache
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = 'gemini-2.0-flash'
+# Bump when the grading prompt template changes; stored with each result
+PROMPT_VERSION = '1'
+
+# google.generativeai takes over a second to import, so it is loaded on first
+# use rather than at module import time.
+def _load_genai():
+    """Import and return the google.generativeai module."""
+    import google.generativeai as genai
+    return genai
+
+def preload_model_client() -> None:
+    """
+    Import the Gemini SDK ahead of the first model call (e.g. while documents are extracted).
+
+    Import errors are left for the model call to report.
+    """
+    try:
+        _load_genai()
+    except ImportError:
+        pass
+
+def _configure_genai(genai, api_key: str) -> None:
+    """
+    Configure the Gemini client.
+
+    If GEMINI_API_ENDPOINT is set (e.g. http://127.0.0.1:8765 for the benchmark
+    fake server), requests go to that endpoint over REST instead of Google's API.
+    """
+    endpoint = os.environ.get("GEMINI_API_ENDPOINT")
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+    else:
+        genai.configure(api_key=api_key)
 
 # Rubric Analysis
 def analyze_rubric(assignment_rubric_text: str, api_key: str) -> RubricAnalysisResponse:
     """Analyze the rubric/assignment to provide improvement recommendations and grading advice."""
+    key = cache_key(GEMINI_MODEL, assignment_rubric_text)
+    cached = shared_cache.get("rubric", key)
+    if cached is not None:
+        return RubricAnalysisResponse.model_validate_json(cached)
+
     try:
+        genai = _load_genai()
+
         # Configure the API
-        genai.configure(api_key=api_key)
+        _configure_genai(genai, api_key)
         
         # Initialize the model with Gemini 2.0 Flash
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = genai.GenerativeModel(GEMINI_MODEL)
         
         # Create the prompt
         prompt = f"""
@@ -37,8 +86,10 @@ def analyze_rubric(assignment_rubric_text: str, api_key: str) -> RubricAnalysisR
         """
         
         # Generate response
-        response = model.generate_content(prompt)
-        response_text = response.text
+        with track_stage("rubric_model_call"):
+            response = model.generate_content(prompt)
+            response_text = response.text
+        record_token_usage(GEMINI_MODEL, response)
         
         # Extract the two sections
         improvements_section = ""
@@ -54,14 +105,156 @@ def analyze_rubric(assignment_rubric_text: str, api_key: str) -> RubricAnalysisR
         if advice_match:
             advice_section = advice_match.group(1).strip()
         
-        return RubricAnalysisResponse(
+        result = RubricAnalysisResponse(
             improvements=improvements_section,
             advice=advice_section,
             full_response=response_text
         )
+        shared_cache.set("rubric", key, result.model_dump_json())
+        return result
     except Exception as e:
         raise Exception(f"Error analyzing rubric: {str(e)}")
 
+# Prompt Construction
+def build_grading_prompt(
+    assignment_text: str, 
+    solution_text: str, 
+    submission_text: str, 
+    include_grading_advice: bool = False, 
+    grading_advice: Optional[str] = None,
+    max_points: int = 100
+) -> str:
+    """
+    Build the full grading prompt from the extracted document texts.
+
+    ``max_points`` is the score the grade is out of: 100 for a whole
+    assignment, or a rubric section's points when grading one section.
+    """
+    # Create the base prompt
+    prompt = f"""
+    You are an expert teacher grading an assignment. Please grade the following student submission 
+    based on the assignment requirements and provided solution.
+    
+    Assignment Requirements (including rubric):
+    {assignment_text}
+    
+    Solution:
+    {solution_text}
+    
+    Student Submission:
+    {submission_text}
+    """
+    
+    # Include grading advice if requested
+    if include_grading_advice and grading_advice:
+        prompt += f"""
+        
+        IMPORTANT GRADING ADVICE:
+        {grading_advice}
+        """
+    
+    # Add structured output instructions
+    example_grade = max_points * 85 // 100
+    prompt += f"""
+    
+    Please provide a detailed evaluation focusing on:
+    1. Overall grade with clear justification
+    2. Specific strengths shown in the submission
+    3. EXPLICIT point deductions - exactly where and why points were lost
+    4. Concept-focused improvement suggestions that would help the student better understand the material
+    
+    IMPORTANT: The total points deducted MUST exactly equal ({max_points} - final_grade). For example, if you assign a grade of {example_grade}/{max_points}, you must show exactly {max_points - example_grade} points of deductions with specific reasons.
+    
+    Your response should be provided as structured JSON following this schema:
+    
+    class PointDeduction:
+        area: str  # Area where points were deducted
+        points: int  # Number of points deducted
+        reason: str  # Reason for the deduction
+    
+    class ConceptImprovement:
+        concept: str  # Concept that needs better understanding
+        suggestion: str  # Specific suggestion to improve understanding
+    
+    class GradingFeedback:
+        numerical_grade: int  # Numerical grade from 0-{max_points}
+        overall_assessment: str  # Overall assessment of the submission
+        strengths: list[str]  # List of strengths in the submission
+        point_deductions: list[PointDeduction]  # Areas where points were deducted
+        concept_improvements: list[ConceptImprovement]  # Suggestions to better grasp concepts
+    
+    Please respond with ONLY a valid JSON object following this schema. Make sure your total point deductions logically explain how you arrived at the final grade and EXACTLY add up to ({max_points} - numerical_grade).
+    """
+    
+    return prompt
+
+# Response Parsing
+def _drop_incomplete_items(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop list items cut off by truncation from a repaired grading response."""
+    item_models = {"point_deductions": PointDeduction, "concept_improvements": ConceptImprovement}
+    for field, item_model in item_models.items():
+        complete = []
+        for item in data.get(field, []):
+            try:
+                complete.append(item_model(**item))
+            except Exception:
+                continue
+        data[field] = complete
+    data.setdefault("strengths", [])
+    return data
+
+def _validate_json_slice(text_response: str) -> Optional[GradingFeedback]:
+    """
+    Validate the text from the first "{" to the last "}" (before any closing code
+    fence) straight into a GradingFeedback.
+
+    pydantic parses and validates the JSON in one pass without building
+    intermediate dicts. Returns None if that text isn't a single JSON object
+    (prose with braces, several objects, truncation); schema errors are raised.
+    """
+    start = text_response.find("{")
+    # Ignore anything after a closing code fence (models often add prose with braces)
+    fence = text_response.find("```", start)
+    end = text_response.rfind("}", start, fence if fence >= 0 else len(text_response))
+    if start < 0 or end < start:
+        return None
+    try:
+        return GradingFeedback.model_validate_json(text_response[start:end + 1])
+    except ValidationError as e:
+        if any(error["type"] == "json_invalid" for error in e.errors()):
+            return None
+        raise Exception(f"Error parsing structured response: {str(e)}")
+
+def parse_grading_feedback(text_response: str) -> GradingFeedback:
+    """
+    Extract and validate the GradingFeedback JSON object from a model response.
+
+    A response truncated at the output token limit is repaired when possible:
+    the JSON is closed after its last complete value, incomplete list items
+    are dropped, and the result is marked ``truncated`` (deductions may be
+    missing, so its grade must not be recomputed from them).
+    """
+    # Fast path: the response is one JSON object, possibly wrapped in a code fence
+    result = _validate_json_slice(text_response)
+    if result is not None:
+        return result
+    
+    found = find_json_span(text_response)
+    if found is None:
+        raise Exception("Could not find valid JSON in the response")
+    data = found.value
+    if found.repaired:
+        JSON_REPAIRS.inc()
+        logger.warning("Repaired truncated grading response (%d characters)", len(text_response))
+        data = _drop_incomplete_items(data)
+        data["truncated"] = True
+    
+    try:
+        # Validate with Pydantic
+        return GradingFeedback(**data)
+    except Exception as e:
+        raise Exception(f"Error parsing structured response: {str(e)}")
+
 # Assignment Grading
 def grade_assignment(
     assignment_text: str, 
@@ -69,12 +262,38 @@ def grade_assignment(
     submission_text: str, 
     api_key: str, 
     include_grading_advice: bool = False, 
-    grading_advice: Optional[str] = None
+    grading_advice: Optional[str] = None,
+    model_name: str = GEMINI_MODEL,
+    max_points: int = 100
 ) -> GradingFeedback:
-    """Grade the assignment using Gemini with structured output."""
+    """
+    Grade the assignment using Gemini with structured output.
+
+    Results are cached in the shared cache by model and prompt, so identical
+    requests handled by any worker skip the model call.
+    """
     try:
+        # Build the prompt
+        with track_stage("prompt_build"):
+            prompt = build_grading_prompt(
+                assignment_text,
+                solution_text,
+                submission_text,
+                include_grading_advice=include_grading_advice,
+                grading_advice=grading_advice,
+                max_points=max_points
+            )
+        
+        key = cache_key(model_name, prompt)
+        cached = shared_cache.get("result", key)
+        if cached is not None:
+            return GradingFeedback.model_validate_json(cached)
+        
+        genai = _load_genai()
+        from google.generativeai.types import HarmCategory, HarmBlockThreshold
+
         # Configure the API
-        genai.configure(api_key=api_key)
+        _configure_genai(genai, api_key)
         
         # Initialize the model with Gemini 2.0 Flash
         generation_config = {
@@ -92,91 +311,68 @@ def grade_assignment(
         }
         
         model = genai.GenerativeModel(
-            model_name='gemini-2.0-flash',
+            model_name=model_name,
             generation_config=generation_config,
             safety_settings=safety_settings
         )
         
-        # Create the base prompt
-        prompt = f"""
-        You are an expert teacher grading an assignment. Please grade the following student submission 
-        based on the assignment requirements and provided solution.
-        
-        Assignment Requirements (including rubric):
-        {assignment_text}
-        
-        Solution:
-        {solution_text}
-        
-        Student Submission:
-        {submission_text}
-        """
+        # Generate structured response
+        with track_stage("model_call"):
+            response = model.generate_content(prompt)
+            text_response = response.text
+        record_token_usage(model_name, response)
         
-        # Include grading advice if requested
-        if include_grading_advice and grading_advice:
-            prompt += f"""
+        # Extract and validate the JSON part of the response
+        with track_stage("json_parse"):
+            result = parse_grading_feedback(text_response)
+        shared_cache.set("result", key, result.model_dump_json())
+        return result
             
-            IMPORTANT GRADING ADVICE:
-            {grading_advice}
-            """
-        
-        # Add structured output instructions
-        prompt += """
-        
-        Please provide a detailed evaluation focusing on:
-        1. Overall grade with clear justification
-        2. Specific strengths shown in the submission
-        3. EXPLICIT point deductions - exactly where and why points were lost
-        4. Concept-focused improvement suggestions that would help the student better understand the material
-        
-        IMPORTANT: The total points deducted MUST exactly equal (100 - final_grade). For example, if you assign a grade of 85/100, you must show exactly 15 points of deductions with specific reasons.
-        
-        Your response should be provided as structured JSON following this schema:
-        
-        class PointDeduction:
-            area: str  # Area where points were deducted
-            points: int  # Number of points deducted
-            reason: str  # Reason for the deduction
-        
-        class ConceptImprovement:
-            concept: str  # Concept that needs better understanding
-            suggestion: str  # Specific suggestion to improve understanding
-        
-        class GradingFeedback:
-            numerical_grade: int  # Numerical grade from 0-100
-            overall_assessment: str  # Overall assessment of the submission
-            strengths: list[str]  # List of strengths in the submission
-            point_deductions: list[PointDeduction]  # Areas where points were deducted
-            concept_improvements: list[ConceptImprovement]  # Suggestions to better grasp concepts
+    except Exception as e:
+        raise Exception(f"Error grading assignment: {str(e)}") 
+
+# Result Repair
+def build_repair_prompt(feedback: GradingFeedback, problem: str) -> str:
+    """Build a short prompt asking the model to make a grading result internally consistent."""
+    return f"""
+    The following grading result is internally inconsistent: {problem}.
+    
+    The points in point_deductions must add up to exactly (100 - numerical_grade).
+    Correct the result so that they do, changing as little as possible: adjust numerical_grade
+    and/or the points of individual deductions, and keep all other fields unchanged.
+    
+    Grading result:
+    {feedback.model_dump_json()}
+    
+    Please respond with ONLY the corrected JSON object.
+    """
+
+def repair_grading_feedback(
+    feedback: GradingFeedback,
+    problem: str,
+    api_key: str,
+    model_name: str = GEMINI_MODEL
+) -> GradingFeedback:
+    """
+    Ask the model to fix an inconsistent grading result.
+
+    Only the prior JSON and the problem are sent, not the documents, so the
+    call costs a few hundred tokens rather than a full regrade.
+    """
+    try:
+        genai = _load_genai()
+        _configure_genai(genai, api_key)
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config={"temperature": 0, "max_output_tokens": 8192}
+        )
         
-        Please respond with ONLY a valid JSON object following this schema. Make sure your total point deductions logically explain how you arrived at the final grade and EXACTLY add up to (100 - numerical_grade).
-        """
+        with track_stage("repair_model_call"):
+            response = model.generate_content(build_repair_prompt(feedback, problem))
+            text_response = response.text
+        record_token_usage(model_name, response)
         
-        # Generate structured response
-        response = model.generate_content(prompt)
-        text_response = response.text
-        
-        # Extract the JSON part from the response
-        json_match = re.search(r'```json\s*(.*?)\s*```', text_response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Try to find JSON without code blocks
-            json_match = re.search(r'\{.*\}', text_response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
-            else:
-                # If no JSON found, return the raw text
-                raise Exception("Could not find valid JSON in the response")
-        
-        try:
-            # Parse the JSON
-            data = json.loads(json_str)
-            # Validate with Pydantic
-            grading_feedback = GradingFeedback(**data)
-            return grading_feedback
-        except Exception as e:
-            raise Exception(f"Error parsing structured response: {str(e)}")
-            
+        with track_stage("json_parse"):
+            return parse_grading_feedback(text_response)
     except Exception as e:
-        raise Exception(f"Error grading assignment: {str(e)}") 
\ No newline at end of file
+        raise Exception(f"Error repairing grading result: {str(e)}")
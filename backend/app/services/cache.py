@@ -0,0 +1,100 @@
+"""
+Result cache shared by all worker processes.
+
+Entries live in a SQLite database in WAL mode, so any number of uvicorn
+workers (and readers) can use it concurrently and a result computed by one
+worker is a hit for all of them. Extracted text is shared the same way through
+the document registry's directory (see ``app.services.documents``).
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.db import SQLiteDatabase
+from app.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = Path(os.environ.get("GRADER_CACHE_PATH", Path(tempfile.gettempdir()) / "grader-cache.sqlite3"))
+# Seconds a cached result stays valid; 0 disables result caching
+CACHE_TTL = float(os.environ.get("GRADER_CACHE_TTL", 7 * 24 * 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+"""
+
+
+def cache_key(*parts: str) -> str:
+    """Return a stable key (hex SHA-256) for the given parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class SharedCache:
+    """
+    Namespaced string cache in a SQLite database shared across processes.
+
+    Cache failures are logged and treated as misses so they never fail a
+    grading request.
+    """
+
+    def __init__(self, path: Path, ttl: float = CACHE_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.db = SQLiteDatabase(self.path, _SCHEMA)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        return self.db.connect()
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        """Return the cached value, or None if it is missing or expired."""
+        if not self.enabled:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND created_at >= ?",
+                (namespace, key, time.time() - self.ttl),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Cache lookup in %s failed: %s", self.path, e)
+            row = None
+        record_cache_lookup(namespace, row is not None)
+        return row[0] if row else None
+
+    def set(self, namespace: str, key: str, value: str) -> None:
+        """Store a value, replacing any existing entry."""
+        if not self.enabled:
+            return
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, value, time.time()),
+            )
+        except sqlite3.Error as e:
+            logger.warning("Cache write to %s failed: %s", self.path, e)
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; return how many were removed."""
+        cursor = self._connect().execute("DELETE FROM cache WHERE created_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+
+shared_cache = SharedCache(CACHE_PATH)
@@ -0,0 +1,274 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple, Union
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
+
+from app.metrics import record_cache_lookup
+from app.models import DocumentInfo
+from app.utils import extract_text_from_file
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_DIR = Path(os.environ.get("GRADER_DOCUMENT_DIR", Path(tempfile.gettempdir()) / "grader-documents"))
+# Uploads larger than this are spooled to a temporary file instead of held in memory
+SPOOL_MAX_MEMORY = int(os.environ.get("GRADER_SPOOL_MAX_MEMORY", 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Total size of the registered PDFs and their text; past it, the least recently
+# used documents are removed
+DOCUMENT_MAX_BYTES = int(os.environ.get("GRADER_DOCUMENT_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+# Starlette spools each uploaded file as it parses the request; that spool is the
+# only copy of an upload outside the registry (the attribute was max_file_size
+# before Starlette 0.40)
+setattr(
+    MultiPartParser,
+    "spool_max_size" if hasattr(MultiPartParser, "spool_max_size") else "max_file_size",
+    SPOOL_MAX_MEMORY,
+)
+
+_DOCUMENT_ID = re.compile(r"^[0-9a-f]{64}$")
+
+
+class DocumentNotFound(KeyError):
+    """Raised when a document ID is not in the registry."""
+
+
+def compute_document_id(content: bytes) -> str:
+    """Return the document ID (hex SHA-256) for PDF bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def _write_atomic(path: Path, data: Union[bytes, BinaryIO]) -> None:
+    """Write ``data`` (bytes or a readable file) to ``path`` so concurrent readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f, UPLOAD_CHUNK_SIZE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+class DocumentRegistry:
+    """
+    Content-addressed store of uploaded PDFs and their extracted text.
+
+    Each document is stored once under its SHA-256, so clients can upload a
+    PDF once (or probe for it by hash) and reference it by ID afterwards.
+    Extracted text is cached beside the PDF and shared by every request that
+    references the document.
+
+    The registry holds up to ``max_bytes``; registering a document past that
+    removes the least recently used ones. Use is tracked by the PDF's
+    modification time, so it is shared by every process using the directory.
+    A removed document is reported as not found, and clients upload it again.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = DOCUMENT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._evict_lock = threading.Lock()
+
+    def _base(self, document_id: str) -> Path:
+        if not _DOCUMENT_ID.match(document_id):
+            raise DocumentNotFound(document_id)
+        return self.root / document_id[:2] / document_id
+
+    def pdf_path(self, document_id: str) -> Path:
+        return self._base(document_id).with_suffix(".pdf")
+
+    def exists(self, document_id: str) -> bool:
+        try:
+            return self.pdf_path(document_id).exists()
+        except DocumentNotFound:
+            return False
+
+    def touch(self, document_id: str) -> bool:
+        """Mark a document as recently used; returns whether it is registered."""
+        try:
+            os.utime(self.pdf_path(document_id))
+            return True
+        except (DocumentNotFound, FileNotFoundError):
+            return False
+
+    def get_info(self, document_id: str) -> DocumentInfo:
+        """Return metadata for a registered document."""
+        try:
+            return DocumentInfo(**json.loads(self._base(document_id).with_suffix(".json").read_text()))
+        except FileNotFoundError:
+            raise DocumentNotFound(document_id)
+
+    def put_bytes(self, content: bytes, filename: Optional[str] = None) -> DocumentInfo:
+        """
+        Register PDF bytes and extract their text, unless already registered.
+
+        Raises ValueError if no text can be extracted from the PDF.
+        """
+        return self.put_file(io.BytesIO(content), compute_document_id(content), len(content), filename)
+
+    def put_file(self, pdf_file: BinaryIO, document_id: str, size: int, filename: Optional[str] = None) -> DocumentInfo:
+        """
+        Register a PDF from a seekable file whose SHA-256 is already known.
+
+        The file is copied in chunks to a staging file in the registry, so it
+        is never loaded into memory as a whole, and its text is extracted from
+        there in the extraction process pool. Blocks until extraction is done.
+        Raises ValueError if no text can be extracted from the PDF.
+        """
+        if self.touch(document_id):
+            record_cache_lookup("document", True)
+            return self.get_info(document_id)
+        record_cache_lookup("document", False)
+
+        base = self._base(document_id)
+        base.parent.mkdir(parents=True, exist_ok=True)
+        fd, staging = tempfile.mkstemp(dir=base.parent, prefix=f".{document_id}.", suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(pdf_file, f, UPLOAD_CHUNK_SIZE)
+            # Extract before registering so unreadable PDFs are never registered
+            text = extract_text_from_file(staging)
+            info = DocumentInfo(
+                document_id=document_id,
+                filename=filename,
+                size=size,
+                text_chars=len(text),
+                created_at=datetime.now(timezone.utc).isoformat(),
+            )
+            _write_atomic(base.with_suffix(".txt"), text.encode("utf-8"))
+            _write_atomic(base.with_suffix(".json"), info.model_dump_json().encode("utf-8"))
+            # The PDF is moved in last: its presence marks the document as registered
+            os.replace(staging, base.with_suffix(".pdf"))
+        except BaseException:
+            if os.path.exists(staging):
+                os.unlink(staging)
+            raise
+        logger.info("Registered document %s (%s, %d bytes)", document_id, filename, size)
+        self._evict(keep=document_id)
+        return info
+
+    def _evict(self, keep: str) -> None:
+        """Remove the least recently used documents, other than ``keep``, until the registry fits in max_bytes."""
+        with self._evict_lock:
+            documents = []
+            total = 0
+            for pdf in self.root.glob("??/*.pdf"):
+                if pdf.name.startswith("."):
+                    # A staging file
+                    continue
+                try:
+                    stat = pdf.stat()
+                except FileNotFoundError:
+                    continue
+                size = stat.st_size + sum(_file_size(pdf.with_suffix(suffix)) for suffix in (".txt", ".json"))
+                documents.append((stat.st_mtime, pdf.stem, size))
+                total += size
+            for _, document_id, size in sorted(documents):
+                if total <= self.max_bytes:
+                    break
+                if document_id == keep:
+                    continue
+                self._remove(document_id)
+                total -= size
+                logger.info("Evicted document %s (%d bytes)", document_id, size)
+
+    def _remove(self, document_id: str) -> None:
+        base = self._base(document_id)
+        # The PDF goes first: without it the document is no longer registered
+        for suffix in (".pdf", ".txt", ".json"):
+            base.with_suffix(suffix).unlink(missing_ok=True)
+
+    def get_text(self, document_id: str) -> str:
+        """Return the extracted text of a registered document."""
+        base = self._base(document_id)
+        if not self.touch(document_id):
+            raise DocumentNotFound(document_id)
+        try:
+            text = base.with_suffix(".txt").read_text(encoding="utf-8")
+            record_cache_lookup("extraction", True)
+            return text
+        except FileNotFoundError:
+            pass
+
+        # The text file is missing (e.g. cleaned up); re-extract from the stored PDF
+        record_cache_lookup("extraction", False)
+        text = extract_text_from_file(self.pdf_path(document_id))
+        _write_atomic(base.with_suffix(".txt"), text.encode("utf-8"))
+        return text
+
+
+document_registry = DocumentRegistry(DOCUMENT_DIR)
+
+
+def _hash_file(f: BinaryIO) -> Tuple[str, int]:
+    """Return the hex SHA-256 and size of a seekable file, read in chunks, and rewind it."""
+    digest = hashlib.sha256()
+    size = 0
+    f.seek(0)
+    while True:
+        chunk = f.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    f.seek(0)
+    return digest.hexdigest(), size
+
+
+def _register_file(f: BinaryIO, filename: Optional[str]) -> DocumentInfo:
+    document_id, size = _hash_file(f)
+    return document_registry.put_file(f, document_id, size, filename=filename)
+
+
+async def register_upload(upload: UploadFile) -> DocumentInfo:
+    """
+    Register an uploaded PDF without buffering it in memory.
+
+    Starlette has already spooled the upload (in memory up to
+    ``SPOOL_MAX_MEMORY`` bytes, on disk beyond that). That file is hashed in
+    place and handed to the registry as is, so the registry's staging file is
+    the only copy made, and already registered documents are recognised from
+    the hash alone. Hashing and registration (and extraction) run in a worker
+    thread, so concurrent uploads are extracted in parallel without blocking
+    the event loop.
+    """
+    return await run_in_threadpool(_register_file, upload.file, upload.filename)
+
+
+async def resolve_document_text(upload: Optional[UploadFile], document_id: Optional[str], label: str) -> str:
+    """
+    Return the extracted text for a document given either an upload or a registry ID.
+
+    Uploads are registered as a side effect, so identical files uploaded later
+    reuse the stored text. Raises DocumentNotFound for unknown IDs and
+    ValueError if neither is given or the PDF has no extractable text.
+    """
+    if document_id:
+        return await run_in_threadpool(document_registry.get_text, document_id)
+    if upload is None:
+        raise ValueError(f"Provide either the {label} PDF or {label}_id")
+    info = await register_upload(upload)
+    return await run_in_threadpool(document_registry.get_text, info.document_id)
@@ -0,0 +1,133 @@
+"""
+The grading pipeline shared by the API routes and the command-line grader.
+
+``grade_texts`` takes the extracted text of the assignment, solution and
+submission, checks for near-duplicate submissions, grades (segmented or
+whole, escalating through the model tiers), reconciles the grade with the
+deductions and stores the result in the results history.
+"""
+import logging
+import sqlite3
+import time
+from typing import Optional
+
+from app.metrics import UsageCollector, collect_usage
+from app.models import GradingFeedback
+from app.results_store import results_store
+from app.services.ai_service import PROMPT_VERSION
+from app.services.reconcile import reconcile_feedback
+from app.services.routing import model_router
+from app.services.segmentation import grade_segmented
+from app.services.similarity import check_submission, record_submission, reusable_result
+
+logger = logging.getLogger(__name__)
+
+
+def store_result(
+    assignment_text: str,
+    submission_text: str,
+    result: GradingFeedback,
+    student: Optional[str],
+    usage: UsageCollector,
+    started: float,
+    source: str = "api"
+) -> Optional[int]:
+    """Add a grading result to the results history; storage errors never fail grading."""
+    try:
+        return results_store.record(
+            assignment_text,
+            submission_text,
+            result.model_dump(),
+            source=source,
+            student=student,
+            model=",".join(usage.models) or None,
+            prompt_version=PROMPT_VERSION,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            latency_ms=round((time.perf_counter() - started) * 1000, 1),
+            stage_seconds=usage.stage_seconds,
+        )
+    except sqlite3.Error as e:
+        logger.warning("Could not store grading result: %s", e)
+        return None
+
+
+def grade_texts(
+    assignment_text: str,
+    solution_text: str,
+    submission_text: str,
+    api_key: str,
+    include_grading_advice: bool = False,
+    grading_advice: Optional[str] = None,
+    segmented: bool = False,
+    submission_label: Optional[str] = None,
+    reuse_similar: bool = False,
+    student: Optional[str] = None,
+    source: str = "api"
+) -> GradingFeedback:
+    """
+    Grade a submission from the extracted document texts and store the result.
+
+    Raises ValueError if any of the texts is empty; model and parsing errors
+    are raised as they are.
+    """
+    if not all([assignment_text, solution_text, submission_text]):
+        raise ValueError("Failed to extract text from one or more PDF files. Please ensure they are text-based PDFs.")
+
+    started = time.perf_counter()
+    with collect_usage() as usage:
+        result = _run_grading(
+            assignment_text, solution_text, submission_text, api_key, include_grading_advice, grading_advice,
+            segmented=segmented, submission_label=submission_label, reuse_similar=reuse_similar
+        )
+    store_result(assignment_text, submission_text, result, student or submission_label, usage, started, source=source)
+    return result
+
+
+def _run_grading(
+    assignment_text: str,
+    solution_text: str,
+    submission_text: str,
+    api_key: str,
+    include_grading_advice: bool,
+    grading_advice: Optional[str],
+    segmented: bool = False,
+    submission_label: Optional[str] = None,
+    reuse_similar: bool = False
+) -> GradingFeedback:
+    # Look for near-duplicates among earlier submissions of this assignment
+    check = check_submission(assignment_text, submission_text, submission_label)
+    if reuse_similar and check is not None:
+        reused = reusable_result(check)
+        if reused is not None:
+            record_submission(check, reused)
+            return reused
+
+    result = None
+    if segmented:
+        result = grade_segmented(
+            model_router,
+            assignment_text,
+            solution_text,
+            submission_text,
+            api_key,
+            include_grading_advice=include_grading_advice,
+            grading_advice=grading_advice
+        )
+
+    if result is None:
+        # Grade the assignment, escalating to stronger models if needed
+        result = model_router.grade(
+            assignment_text=assignment_text,
+            solution_text=solution_text,
+            submission_text=submission_text,
+            api_key=api_key,
+            include_grading_advice=include_grading_advice,
+            grading_advice=grading_advice
+        )
+
+    # Make the grade and the deductions agree without a full regrade
+    result = reconcile_feedback(result, api_key)
+    if check is not None:
+        record_submission(check, result)
+    return result
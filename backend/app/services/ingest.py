@@ -0,0 +1,108 @@
+"""
+Streaming ingestion of LMS submission archives.
+
+Canvas, Moodle and Blackboard export an assignment's submissions as one ZIP,
+with the student encoded in each entry's name. ``list_submissions`` finds
+the PDF entries from the ZIP's central directory, so other entries (feedback
+files, receipts, images) are skipped without being decompressed, and parses
+the student from each name. ``read_submission`` then reads one entry at a
+time in chunks, hashing it on the way, so grading can start on the first
+submission while the rest of the archive is still unread, and nothing is
+extracted to disk.
+"""
+import hashlib
+import os
+import re
+import zipfile
+from pathlib import PurePosixPath
+from typing import List, NamedTuple, Optional, Tuple
+
+# Entries larger than this are rejected rather than read into memory
+MAX_SUBMISSION_BYTES = int(os.environ.get("GRADER_MAX_SUBMISSION_BYTES", 100 * 1024 * 1024))
+READ_CHUNK_SIZE = 256 * 1024
+
+# Canvas: lastfirst[_LATE]_<user id>_<submission id>_<file name>
+_CANVAS = re.compile(r"^(?:.*/)?(?P<student>[^_/]+?)(?:_LATE)?_(?P<student_id>\d+)_\d+_(?P<filename>[^/]+)$")
+# Moodle: <full name>_<participant id>_assignsubmission_file_[/]<file name>
+_MOODLE = re.compile(r"^(?:.*/)?(?P<student>[^/]+?)_(?P<student_id>\d+)_assignsubmission_file_/?(?P<filename>[^/]+)$")
+# Blackboard: <assignment>_<username>_attempt_<YYYY-MM-DD-HH-MM-SS>_<file name>
+_BLACKBOARD = re.compile(r"^(?:.*/)?.*_(?P<student_id>[^_/]+)_attempt_\d{4}(?:-\d{2}){5}_(?P<filename>[^/]+)$")
+
+
+class SubmissionName(NamedTuple):
+    """Who an archive entry belongs to, as far as its name says."""
+
+    student: str  # name or login as the LMS writes it
+    student_id: Optional[str]  # LMS user/participant ID or username
+    lms: Optional[str]  # "canvas", "moodle", "blackboard", or None for other archives
+    filename: str  # the file name the student uploaded
+
+
+class ArchiveSubmission(NamedTuple):
+    """A PDF entry in a submissions archive."""
+
+    entry: str
+    name: SubmissionName
+    size: int
+
+
+def parse_submission_name(entry: str) -> SubmissionName:
+    """
+    Parse the student from an archive entry name.
+
+    Names that don't follow an LMS convention are attributed to their
+    top-level folder (``alice/hw5.pdf``), or else to the file name.
+    """
+    match = _MOODLE.match(entry)
+    if match:
+        return SubmissionName(match["student"], match["student_id"], "moodle", match["filename"])
+    match = _BLACKBOARD.match(entry)
+    if match:
+        return SubmissionName(match["student_id"], match["student_id"], "blackboard", match["filename"])
+    match = _CANVAS.match(entry)
+    if match:
+        return SubmissionName(match["student"], match["student_id"], "canvas", match["filename"])
+    path = PurePosixPath(entry)
+    student = path.parts[0] if len(path.parts) > 1 else path.stem
+    return SubmissionName(student, None, None, path.name)
+
+
+def list_submissions(archive: zipfile.ZipFile) -> List[ArchiveSubmission]:
+    """List the PDF entries of an archive in archive order, without reading them."""
+    submissions = []
+    for info in archive.infolist():
+        path = PurePosixPath(info.filename)
+        if (
+            info.is_dir()
+            or path.suffix.lower() != ".pdf"
+            or path.parts[0] == "__MACOSX"
+            or path.name.startswith(".")
+        ):
+            continue
+        submissions.append(ArchiveSubmission(info.filename, parse_submission_name(info.filename), info.file_size))
+    return submissions
+
+
+def read_submission(archive: zipfile.ZipFile, submission: ArchiveSubmission, max_bytes: int = MAX_SUBMISSION_BYTES) -> Tuple[bytes, str]:
+    """
+    Read an entry in chunks, hashing it as it is read; returns (bytes, hex SHA-256).
+
+    Raises ValueError if the entry is larger than ``max_bytes`` (checked as it
+    is decompressed too, as the size in the archive can't be trusted).
+    """
+    if submission.size > max_bytes:
+        raise ValueError(f"{submission.entry} is larger than {max_bytes} bytes")
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    with archive.open(submission.entry) as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"{submission.entry} is larger than {max_bytes} bytes")
+            digest.update(chunk)
+            chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
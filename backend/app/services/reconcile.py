@@ -0,0 +1,92 @@
+"""
+Reconcile grading results whose deductions don't add up to the grade.
+
+The model is asked for deductions totalling exactly ``100 - numerical_grade``
+but doesn't always comply. Instead of regrading from scratch, an inconsistent
+result is fixed by the cheapest method that works:
+
+1. a local, deterministic fix under ``GRADER_RECONCILE_POLICY``:
+   ``deductions`` (default) recomputes the grade from the deductions when that
+   gives a grade in 0-100; ``model`` skips the local fix; ``off`` disables
+   reconciliation entirely (the discrepancy is only reported, as before);
+2. a small repair call that sends only the prior JSON and the discrepancy.
+
+If both fail, the original result is returned unchanged.
+
+Results recovered from a truncated response (``truncated``) have lost the
+deductions after the cut, so the local fix would raise their grade. They
+skip it, and a repair is only accepted if it doesn't raise the grade; the
+result stays marked as truncated either way.
+"""
+import logging
+import os
+from typing import Optional
+
+from app.metrics import RECONCILIATIONS
+from app.models import GradingFeedback
+from app.services.ai_service import GEMINI_MODEL, repair_grading_feedback
+from app.utils import calculate_score_breakdown
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_POLICIES = ("deductions", "model", "off")
+RECONCILE_POLICY = os.environ.get("GRADER_RECONCILE_POLICY", "deductions")
+REPAIR_MODEL = os.environ.get("GRADER_REPAIR_MODEL", GEMINI_MODEL)
+
+if RECONCILE_POLICY not in RECONCILE_POLICIES:
+    logger.warning("Unknown GRADER_RECONCILE_POLICY %r; using 'deductions'", RECONCILE_POLICY)
+    RECONCILE_POLICY = "deductions"
+
+
+def describe_discrepancy(feedback: GradingFeedback) -> Optional[str]:
+    """Return a description of the arithmetic discrepancy, or None if there is none."""
+    breakdown = calculate_score_breakdown(feedback)
+    if not breakdown["discrepancy"]:
+        return None
+    return (
+        f"the deductions total {breakdown['total_deductions']} points, so the grade should be "
+        f"{breakdown['calculated_score']}, but numerical_grade is {breakdown['reported_score']}"
+    )
+
+
+def reconcile_locally(feedback: GradingFeedback, policy: str = RECONCILE_POLICY) -> Optional[GradingFeedback]:
+    """Apply the configured deterministic fix; return None if it can't produce a valid result."""
+    if policy != "deductions" or feedback.truncated:
+        return None
+    calculated = calculate_score_breakdown(feedback)["calculated_score"]
+    if not 0 <= calculated <= 100:
+        return None
+    return feedback.model_copy(update={"numerical_grade": calculated})
+
+
+def reconcile_feedback(feedback: GradingFeedback, api_key: str, policy: str = RECONCILE_POLICY) -> GradingFeedback:
+    """Return ``feedback`` with its grade and deductions made consistent, if possible."""
+    problem = describe_discrepancy(feedback)
+    if problem is None or policy == "off":
+        return feedback
+
+    fixed = reconcile_locally(feedback, policy)
+    if fixed is not None:
+        RECONCILIATIONS.labels(method="local").inc()
+        logger.info("Reconciled grading result locally: %s", problem)
+        return fixed
+
+    try:
+        repaired = repair_grading_feedback(feedback, problem, api_key, model_name=REPAIR_MODEL)
+    except Exception as e:
+        logger.warning("Repair call failed: %s", e)
+        repaired = None
+    if feedback.truncated and repaired is not None:
+        if repaired.numerical_grade > feedback.numerical_grade:
+            logger.warning("Ignoring repair of a truncated result that raises its grade to %d", repaired.numerical_grade)
+            repaired = None
+        else:
+            repaired = repaired.model_copy(update={"truncated": True})
+    if repaired is not None and describe_discrepancy(repaired) is None:
+        RECONCILIATIONS.labels(method="model").inc()
+        logger.info("Reconciled grading result with a repair call: %s", problem)
+        return repaired
+
+    RECONCILIATIONS.labels(method="failed").inc()
+    logger.warning("Could not reconcile grading result: %s", problem)
+    return feedback
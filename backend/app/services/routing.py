@@ -0,0 +1,128 @@
+"""
+Route each grading request through a list of models, cheapest first.
+
+A submission is graded by the first tier; the result is only escalated to the
+next (stronger) tier if it fails validation: the response can't be parsed into
+a valid ``GradingFeedback`` (e.g. an out-of-range grade) or its deductions
+don't add up to ``100 - numerical_grade``. The last tier's result is returned
+as is.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.metrics import ROUTING_OUTCOMES
+from app.models import GradingFeedback
+from app.services.ai_service import grade_assignment
+from app.utils import calculate_score_breakdown
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_TIERS = "gemini-2.0-flash-lite,gemini-2.0-flash"
+MODEL_TIERS = [m.strip() for m in os.environ.get("GRADER_MODEL_TIERS", DEFAULT_MODEL_TIERS).split(",") if m.strip()]
+
+
+def validation_problem(feedback: GradingFeedback, max_points: int = 100) -> Optional[str]:
+    """Return why a grading result should be escalated, or None if it is acceptable."""
+    if feedback.numerical_grade > max_points:
+        return f"grade {feedback.numerical_grade} exceeds the maximum of {max_points}"
+    breakdown = calculate_score_breakdown(feedback, max_points)
+    if breakdown["discrepancy"]:
+        return (
+            f"deductions total {breakdown['total_deductions']} but the grade is "
+            f"{breakdown['reported_score']} (expected {breakdown['calculated_score']})"
+        )
+    if any(d.points < 0 for d in feedback.point_deductions):
+        return "negative point deduction"
+    return None
+
+
+class RoutingStats:
+    """Per-model counts and latency of routed grading attempts (this process only)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[str, Dict[str, float]] = {}
+
+    def record(self, model: str, outcome: str, seconds: float) -> None:
+        ROUTING_OUTCOMES.labels(model=model, outcome=outcome).inc()
+        with self._lock:
+            stats = self._models.setdefault(model, {"attempts": 0, "accepted": 0, "escalated": 0, "errors": 0, "seconds": 0.0})
+            stats["attempts"] += 1
+            stats[outcome] += 1
+            stats["seconds"] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                model: {
+                    "attempts": stats["attempts"],
+                    "accepted": stats["accepted"],
+                    "escalated": stats["escalated"],
+                    "errors": stats["errors"],
+                    "mean_latency_s": round(stats["seconds"] / stats["attempts"], 4),
+                }
+                for model, stats in self._models.items()
+            }
+
+
+class ModelRouter:
+    """Grade with the cheapest model tier whose result passes validation."""
+
+    def __init__(self, tiers: List[str], stats: RoutingStats):
+        if not tiers:
+            raise ValueError("At least one model tier is required")
+        self.tiers = tiers
+        self.stats = stats
+
+    def grade(
+        self,
+        assignment_text: str,
+        solution_text: str,
+        submission_text: str,
+        api_key: str,
+        include_grading_advice: bool = False,
+        grading_advice: Optional[str] = None,
+        max_points: int = 100
+    ) -> GradingFeedback:
+        fallback: Optional[GradingFeedback] = None
+        error: Optional[Exception] = None
+        for i, model in enumerate(self.tiers):
+            last_tier = i == len(self.tiers) - 1
+            start = time.perf_counter()
+            try:
+                result = grade_assignment(
+                    assignment_text=assignment_text,
+                    solution_text=solution_text,
+                    submission_text=submission_text,
+                    api_key=api_key,
+                    include_grading_advice=include_grading_advice,
+                    grading_advice=grading_advice,
+                    model_name=model,
+                    max_points=max_points
+                )
+            except Exception as e:
+                # Includes responses that fail GradingFeedback validation
+                self.stats.record(model, "errors", time.perf_counter() - start)
+                logger.warning("Grading with %s failed: %s", model, e)
+                error = e
+                continue
+
+            problem = validation_problem(result, max_points)
+            if problem is None or last_tier:
+                self.stats.record(model, "accepted", time.perf_counter() - start)
+                return result
+            self.stats.record(model, "escalated", time.perf_counter() - start)
+            logger.info("Escalating from %s: %s", model, problem)
+            fallback = result
+
+        # Every remaining tier failed outright; an unvalidated result beats none
+        if fallback is not None:
+            return fallback
+        raise error
+
+
+routing_stats = RoutingStats()
+model_router = ModelRouter(MODEL_TIERS, routing_stats)
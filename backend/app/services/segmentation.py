@@ -0,0 +1,296 @@
+"""
+Segmented grading: grade each rubric section separately and merge the results.
+
+The rubric's section headings (e.g. "Problem 2: Decompose & Difference — 20 pts")
+define the sections and their points. The solution and submission are split at
+headings with the same numbers ("Problem 2 –", "Question 2 –", ...), and each
+section is graded out of its own points with a much smaller prompt. Sections
+are graded concurrently, and a failed section is retried on its own. The
+per-section results are merged into one ``GradingFeedback`` out of 100.
+
+Segmentation is only used when it is unambiguous: the rubric's section points
+must add up to 100 and every section must be found in the submission.
+Otherwise the caller should grade the whole documents in one prompt.
+
+Each section's result is stored with the submission in the results store.
+``regrade_segmented`` compares a resubmission with the previous version
+section by section, takes the unchanged sections' results from the previous
+version's record and only sends the changed sections to the model.
+"""
+import contextvars
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.metrics import track_stage
+from app.models import ConceptImprovement, GradingFeedback, PointDeduction, SectionStatus
+from app.results_store import results_store
+from app.services.cache import cache_key
+from app.services.routing import ModelRouter
+
+logger = logging.getLogger(__name__)
+
+SECTION_CONCURRENCY = int(os.environ.get("GRADER_SECTION_CONCURRENCY", 4))
+SECTION_RETRIES = int(os.environ.get("GRADER_SECTION_RETRIES", 1))
+
+_SECTION_WORDS = r"(?:Problem|Question|Exercise|Task|Part)"
+# A section heading such as "Problem 2:", "Question 2 –" or "Part 2."
+_HEADING = re.compile(_SECTION_WORDS + r"\s*#?\s*(\d+)\s*[:.)\-–—]")
+# A rubric heading with points, e.g. "Problem 1: Explore & Visualize — 25 pts"
+_RUBRIC_HEADING = re.compile(
+    _SECTION_WORDS + r"\s*#?\s*(\d+)\s*[:.)\-–—]\s*([^\n•]{0,120}?)\s*[-–—(]\s*(\d+)\s*(?:pts|points)\b",
+    re.IGNORECASE,
+)
+
+
+class Section(NamedTuple):
+    number: str
+    title: str
+    points: int
+    assignment_text: str
+    solution_text: str
+    submission_text: str
+
+
+def section_fingerprint(text: str) -> str:
+    """Hash of a section's text that ignores whitespace differences from re-extraction."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def section_result_key(section: Section, include_grading_advice: bool, grading_advice: Optional[str]) -> str:
+    """Key under which a section's accepted result is stored."""
+    advice = grading_advice if include_grading_advice and grading_advice else ""
+    return cache_key(
+        str(section.points),
+        section_fingerprint(section.assignment_text),
+        section_fingerprint(section.solution_text),
+        section_fingerprint(section.submission_text),
+        advice,
+    )
+
+
+def split_sections(text: str) -> Tuple[str, Dict[str, str]]:
+    """
+    Split text at section headings.
+
+    Returns the text before the first heading and a mapping of section number
+    to its text. Text under repeated headings with the same number is joined.
+    """
+    matches = list(_HEADING.finditer(text))
+    if not matches:
+        return text, {}
+    sections: Dict[str, str] = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        number = str(int(match.group(1)))
+        chunk = text[match.start():end].strip()
+        sections[number] = f"{sections[number]}\n{chunk}" if number in sections else chunk
+    return text[:matches[0].start()].strip(), sections
+
+
+def rubric_sections(assignment_text: str) -> Dict[str, Tuple[str, int]]:
+    """Return section number -> (title, points) from the rubric's headings."""
+    found: Dict[str, Tuple[str, int]] = {}
+    for match in _RUBRIC_HEADING.finditer(assignment_text):
+        number = str(int(match.group(1)))
+        found.setdefault(number, (match.group(2).strip(), int(match.group(3))))
+    return found
+
+
+def segment_documents(assignment_text: str, solution_text: str, submission_text: str) -> Optional[List[Section]]:
+    """Return the aligned rubric sections, or None if the documents can't be segmented reliably."""
+    rubric = rubric_sections(assignment_text)
+    if len(rubric) < 2:
+        return None
+    if sum(points for _, points in rubric.values()) != 100:
+        logger.info("Rubric section points don't add up to 100; not segmenting")
+        return None
+
+    assignment_preamble, assignment_parts = split_sections(assignment_text)
+    _, solution_parts = split_sections(solution_text)
+    _, submission_parts = split_sections(submission_text)
+    missing = [number for number in rubric if number not in submission_parts]
+    if missing:
+        logger.info("Sections %s not found in the submission; not segmenting", ", ".join(missing))
+        return None
+
+    sections = []
+    for number, (title, points) in rubric.items():
+        sections.append(Section(
+            number=number,
+            title=title,
+            points=points,
+            assignment_text=(
+                f"{assignment_preamble}\n\n"
+                f"Grade ONLY section {number} ({title}), worth {points} points:\n"
+                f"{assignment_parts.get(number, '')}"
+            ),
+            # Without a matching solution section, give the grader the whole solution
+            solution_text=solution_parts.get(number, solution_text),
+            submission_text=submission_parts[number],
+        ))
+    return sections
+
+
+def merge_section_feedback(sections: List[Section], results: List[GradingFeedback]) -> GradingFeedback:
+    """Combine per-section results into one GradingFeedback out of 100."""
+    strengths: List[str] = []
+    deductions: List[PointDeduction] = []
+    improvements: List[ConceptImprovement] = []
+    seen_concepts = set()
+    assessments = []
+    for section, result in zip(sections, results):
+        label = f"Section {section.number}" + (f" ({section.title})" if section.title else "")
+        assessments.append(f"{label}, {result.numerical_grade}/{section.points}: {result.overall_assessment}")
+        strengths.extend(result.strengths)
+        deductions.extend(
+            d.model_copy(update={"area": f"{label}: {d.area}"}) for d in result.point_deductions
+        )
+        for improvement in result.concept_improvements:
+            if improvement.concept.lower() not in seen_concepts:
+                seen_concepts.add(improvement.concept.lower())
+                improvements.append(improvement)
+    return GradingFeedback(
+        numerical_grade=min(100, sum(result.numerical_grade for result in results)),
+        overall_assessment="\n\n".join(assessments),
+        strengths=strengths,
+        point_deductions=deductions,
+        concept_improvements=improvements,
+        truncated=any(result.truncated for result in results),
+    )
+
+
+def grade_sections(
+    router: ModelRouter,
+    sections: List[Section],
+    api_key: str,
+    include_grading_advice: bool = False,
+    grading_advice: Optional[str] = None
+) -> List[GradingFeedback]:
+    """Grade sections concurrently; each failed section is retried up to SECTION_RETRIES times."""
+    def grade_one(section: Section) -> GradingFeedback:
+        for attempt in range(SECTION_RETRIES + 1):
+            try:
+                return router.grade(
+                    assignment_text=section.assignment_text,
+                    solution_text=section.solution_text,
+                    submission_text=section.submission_text,
+                    api_key=api_key,
+                    include_grading_advice=include_grading_advice,
+                    grading_advice=grading_advice,
+                    max_points=section.points
+                )
+            except Exception as e:
+                if attempt == SECTION_RETRIES:
+                    raise Exception(f"Section {section.number}: {e}")
+                logger.warning("Retrying section %s after error: %s", section.number, e)
+
+    # Each section runs in a copy of the caller's context so usage collection
+    # and the request ID carry over to the worker threads
+    with ThreadPoolExecutor(max_workers=max(1, SECTION_CONCURRENCY)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, grade_one, section) for section in sections]
+        return [future.result() for future in futures]
+
+
+def store_section_results(
+    assignment_text: str,
+    submission_text: str,
+    sections: List[Section],
+    results: List[GradingFeedback],
+    include_grading_advice: bool,
+    grading_advice: Optional[str]
+) -> None:
+    """Store a submission's section results for later regrades; storage errors never fail grading."""
+    try:
+        results_store.record_sections(assignment_text, submission_text, [
+            (section.number, section_result_key(section, include_grading_advice, grading_advice), result.model_dump())
+            for section, result in zip(sections, results)
+        ])
+    except sqlite3.Error as e:
+        logger.warning("Could not store section results: %s", e)
+
+
+def grade_segmented(
+    router: ModelRouter,
+    assignment_text: str,
+    solution_text: str,
+    submission_text: str,
+    api_key: str,
+    include_grading_advice: bool = False,
+    grading_advice: Optional[str] = None
+) -> Optional[GradingFeedback]:
+    """Grade section by section; return None if the documents can't be segmented."""
+    with track_stage("segment"):
+        sections = segment_documents(assignment_text, solution_text, submission_text)
+    if sections is None:
+        return None
+    logger.info("Grading %d sections concurrently", len(sections))
+    results = grade_sections(router, sections, api_key, include_grading_advice, grading_advice)
+    store_section_results(assignment_text, submission_text, sections, results, include_grading_advice, grading_advice)
+    return merge_section_feedback(sections, results)
+
+
+def regrade_segmented(
+    router: ModelRouter,
+    assignment_text: str,
+    solution_text: str,
+    previous_submission_text: str,
+    submission_text: str,
+    api_key: str,
+    include_grading_advice: bool = False,
+    grading_advice: Optional[str] = None
+) -> Optional[Tuple[GradingFeedback, List[SectionStatus]]]:
+    """
+    Regrade a resubmission, sending only sections that changed to the model.
+
+    Returns the merged result and each section's status, or None if the
+    documents can't be segmented. Unchanged sections reuse the results stored
+    with the previous version; if one has none (e.g. the previous version was
+    graded whole, or with a different solution or grading advice), it is
+    graded too.
+    """
+    with track_stage("segment"):
+        sections = segment_documents(assignment_text, solution_text, submission_text)
+        _, previous_parts = split_sections(previous_submission_text)
+    if sections is None:
+        return None
+
+    try:
+        previous_results = results_store.section_results(assignment_text, previous_submission_text)
+    except sqlite3.Error as e:
+        logger.warning("Could not load the previous section results: %s", e)
+        previous_results = {}
+    results: Dict[str, GradingFeedback] = {}
+    statuses = []
+    for section in sections:
+        changed = (
+            section.number not in previous_parts
+            or section_fingerprint(previous_parts[section.number]) != section_fingerprint(section.submission_text)
+        )
+        previous = previous_results.get(section.number)
+        # The stored key also covers the section's rubric, solution and grading advice
+        key = section_result_key(section, include_grading_advice, grading_advice)
+        if not changed and previous is not None and previous[0] == key:
+            results[section.number] = GradingFeedback.model_validate(previous[1])
+        statuses.append(SectionStatus(
+            number=section.number,
+            title=section.title,
+            points=section.points,
+            changed=changed,
+            reused=section.number in results,
+        ))
+
+    to_grade = [section for section in sections if section.number not in results]
+    for section, result in zip(to_grade, grade_sections(router, to_grade, api_key, include_grading_advice, grading_advice)):
+        results[section.number] = result
+    logger.info(
+        "Regraded %d of %d sections (%d changed)",
+        len(to_grade), len(sections), sum(status.changed for status in statuses),
+    )
+    ordered = [results[section.number] for section in sections]
+    store_section_results(assignment_text, submission_text, sections, ordered, include_grading_advice, grading_advice)
+    return merge_section_feedback(sections, ordered), statuses
@@ -0,0 +1,273 @@
+"""
+Near-duplicate detection for submissions of the same assignment.
+
+Each graded submission's text is reduced to word 5-gram shingles and a MinHash
+signature, and indexed with locality-sensitive hashing (LSH) bands in a SQLite
+database shared by all workers. A new submission is compared only with the
+submissions it shares a band with, so lookups stay cheap as a section grows.
+
+Near-duplicates (group work, shared templates, copies) are logged and counted,
+can be listed as clusters for the instructor, and can optionally reuse the
+grading result of a very similar earlier submission instead of calling the
+model again.
+"""
+import hashlib
+import logging
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app.db import SQLiteDatabase
+from app.metrics import NEAR_DUPLICATES
+from app.models import GradingFeedback
+from app.services.cache import cache_key, shared_cache
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_PATH = Path(os.environ.get("GRADER_SIMILARITY_PATH", Path(tempfile.gettempdir()) / "grader-similarity.sqlite3"))
+# Estimated Jaccard similarity above which submissions are flagged as near-duplicates
+DUPLICATE_SIMILARITY = float(os.environ.get("GRADER_DUPLICATE_SIMILARITY", 0.8))
+# Similarity above which a prior result may be reused (when the request asks for it)
+REUSE_SIMILARITY = float(os.environ.get("GRADER_REUSE_SIMILARITY", 0.95))
+
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 similarity almost always share a band
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 61) - 1
+# Fixed seed so signatures computed by different processes are comparable
+_rng = random.Random(20240501)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    assignment_key TEXT NOT NULL,
+    submission_key TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    label TEXT,
+    signature BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (assignment_key, submission_key)
+);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    assignment_key TEXT NOT NULL,
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    submission_key TEXT NOT NULL,
+    PRIMARY KEY (assignment_key, band, bucket, submission_key)
+);
+"""
+
+
+def text_hash(text: str) -> str:
+    """Hash of a text that ignores case and whitespace differences."""
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def shingles(text: str) -> Set[int]:
+    """Return the 64-bit hashes of the text's overlapping word 5-grams."""
+    words = re.findall(r"\w+", text.lower())
+    grams = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))]
+    return {int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams}
+
+
+def minhash(text: str) -> List[int]:
+    """Return the MinHash signature of a text."""
+    hashes = shingles(text)
+    return [min((a * x + b) % _PRIME for x in hashes) for a, b in _PERMUTATIONS]
+
+
+def estimate_similarity(a: List[int], b: List[int]) -> float:
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _band_buckets(signature: List[int]) -> List[str]:
+    return [
+        hashlib.blake2b(array("Q", signature[band * ROWS:(band + 1) * ROWS]).tobytes(), digest_size=8).hexdigest()
+        for band in range(BANDS)
+    ]
+
+
+class SimilarSubmission(NamedTuple):
+    submission_key: str
+    label: Optional[str]
+    similarity: float
+    exact: bool
+
+
+class SubmissionCheck(NamedTuple):
+    assignment_key: str
+    submission_key: str
+    text_hash: str
+    label: Optional[str]
+    signature: List[int]
+    matches: List[SimilarSubmission]
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of submission texts, partitioned by assignment."""
+
+    def __init__(self, path: Path, threshold: float = DUPLICATE_SIMILARITY):
+        self.db = SQLiteDatabase(path, _SCHEMA)
+        self.threshold = threshold
+
+    def _load(self, assignment_key: str, submission_keys: Set[str]) -> Dict[str, Tuple]:
+        conn = self.db.connect()
+        rows = {}
+        for key in submission_keys:
+            row = conn.execute(
+                "SELECT submission_key, text_hash, label, signature FROM submissions "
+                "WHERE assignment_key = ? AND submission_key = ?",
+                (assignment_key, key),
+            ).fetchone()
+            if row is not None:
+                rows[key] = row
+        return rows
+
+    def find_similar(self, assignment_key: str, signature: List[int], text_hash_: str, exclude: str) -> List[SimilarSubmission]:
+        """Return indexed submissions at or above the threshold, most similar first."""
+        conn = self.db.connect()
+        candidates = set()
+        for band, bucket in enumerate(_band_buckets(signature)):
+            candidates.update(
+                key for (key,) in conn.execute(
+                    "SELECT submission_key FROM lsh_buckets WHERE assignment_key = ? AND band = ? AND bucket = ?",
+                    (assignment_key, band, bucket),
+                )
+            )
+        candidates.discard(exclude)
+
+        matches = []
+        for key, (_, other_hash, label, blob) in self._load(assignment_key, candidates).items():
+            similarity = estimate_similarity(signature, array("Q", blob).tolist())
+            if similarity >= self.threshold:
+                matches.append(SimilarSubmission(key, label, round(similarity, 3), other_hash == text_hash_))
+        return sorted(matches, key=lambda m: m.similarity, reverse=True)
+
+    def add(self, check: SubmissionCheck) -> None:
+        """Index a submission (replacing an earlier entry with the same key)."""
+        with self.db.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO submissions "
+                "(assignment_key, submission_key, text_hash, label, signature, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (check.assignment_key, check.submission_key, check.text_hash, check.label,
+                 array("Q", check.signature).tobytes(), time.time()),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (assignment_key, band, bucket, submission_key) VALUES (?, ?, ?, ?)",
+                [(check.assignment_key, band, bucket, check.submission_key)
+                 for band, bucket in enumerate(_band_buckets(check.signature))],
+            )
+
+    def clusters(self, assignment_key: str, threshold: Optional[float] = None) -> List[Dict]:
+        """Group an assignment's submissions into clusters of near-duplicates."""
+        threshold = self.threshold if threshold is None else threshold
+        conn = self.db.connect()
+        signatures = {
+            key: (label, array("Q", blob).tolist())
+            for key, label, blob in conn.execute(
+                "SELECT submission_key, label, signature FROM submissions WHERE assignment_key = ?", (assignment_key,)
+            )
+        }
+        parent = {key: key for key in signatures}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        # Only pairs that share an LSH bucket are compared
+        pair_similarity = {}
+        groups = conn.execute(
+            "SELECT group_concat(submission_key) FROM lsh_buckets WHERE assignment_key = ? "
+            "GROUP BY band, bucket HAVING count(*) > 1",
+            (assignment_key,),
+        )
+        for (members,) in groups:
+            members = sorted(key for key in members.split(",") if key in signatures)
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) in pair_similarity:
+                        continue
+                    similarity = estimate_similarity(signatures[a][1], signatures[b][1])
+                    pair_similarity[(a, b)] = similarity
+                    if similarity >= threshold:
+                        parent[find(a)] = find(b)
+
+        clustered: Dict[str, List[str]] = {}
+        for key in signatures:
+            clustered.setdefault(find(key), []).append(key)
+        result = []
+        for members in clustered.values():
+            if len(members) < 2:
+                continue
+            members.sort()
+            similarities = [
+                pair_similarity[(a, b)] for i, a in enumerate(members) for b in members[i + 1:]
+                if (a, b) in pair_similarity and pair_similarity[(a, b)] >= threshold
+            ]
+            result.append({
+                "members": [{"submission_key": key, "label": signatures[key][0]} for key in members],
+                "max_similarity": round(max(similarities), 3),
+                "min_similarity": round(min(similarities), 3),
+            })
+        return sorted(result, key=lambda c: len(c["members"]), reverse=True)
+
+
+similarity_index = SimilarityIndex(SIMILARITY_PATH)
+
+
+def check_submission(assignment_text: str, submission_text: str, label: Optional[str] = None) -> Optional[SubmissionCheck]:
+    """
+    Compute a submission's signature and find its near-duplicates among earlier submissions.
+
+    Returns None if the index is unavailable; similarity checks never fail grading.
+    """
+    assignment_key = text_hash(assignment_text)
+    submission_hash = text_hash(submission_text)
+    submission_key = cache_key(submission_hash, label or "")
+    signature = minhash(submission_text)
+    try:
+        matches = similarity_index.find_similar(assignment_key, signature, submission_hash, exclude=submission_key)
+    except sqlite3.Error as e:
+        logger.warning("Similarity lookup failed: %s", e)
+        return None
+    if matches:
+        NEAR_DUPLICATES.inc()
+        logger.warning(
+            "Submission %s is a near-duplicate of %s",
+            label or submission_key[:12],
+            ", ".join(f"{m.label or m.submission_key[:12]} ({m.similarity:.0%})" for m in matches[:5]),
+        )
+    return SubmissionCheck(assignment_key, submission_key, submission_hash, label, signature, matches)
+
+
+def reusable_result(check: SubmissionCheck) -> Optional[GradingFeedback]:
+    """Return the stored result of the most similar earlier submission at or above REUSE_SIMILARITY."""
+    for match in check.matches:
+        if match.similarity < REUSE_SIMILARITY:
+            break
+        stored = shared_cache.get("similar_result", cache_key(check.assignment_key, match.submission_key))
+        if stored is not None:
+            logger.info("Reusing the result of %s (%.0f%% similar)", match.label or match.submission_key[:12], match.similarity * 100)
+            return GradingFeedback.model_validate_json(stored)
+    return None
+
+
+def record_submission(check: SubmissionCheck, result: GradingFeedback) -> None:
+    """Index a graded submission and keep its result for reuse by near-duplicates."""
+    try:
+        similarity_index.add(check)
+    except sqlite3.Error as e:
+        logger.warning("Could not index submission: %s", e)
+    shared_cache.set("similar_result", cache_key(check.assignment_key, check.submission_key), result.model_dump_json())
@@ -0,0 +1,217 @@
+"""
+Watching a directory for new and changed submission PDFs.
+
+``DirectoryWatcher.poll`` returns the PDFs under a directory (searched
+recursively) that were added or changed and then kept the same size and
+modification time for ``debounce_seconds``, so a file that is still being
+copied or uploaded is picked up once, after its last write. Changes are
+noticed with inotify on Linux (through ctypes, so without extra
+dependencies), and otherwise, or with ``use_inotify=False`` (e.g. for
+network filesystems, where inotify misses remote writes), by rescanning the
+directory every ``poll_interval`` seconds.
+"""
+import ctypes
+import logging
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_SECONDS = float(os.environ.get("GRADER_WATCH_DEBOUNCE_SECONDS", 5))
+POLL_INTERVAL_SECONDS = float(os.environ.get("GRADER_WATCH_POLL_SECONDS", 5))
+
+# From <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# (size, modification time in ns)
+Signature = Tuple[int, int]
+
+
+class _Inotify:
+    """Minimal inotify binding: watches directories and reports the paths in them that changed."""
+
+    _EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; followed by the name
+
+    def __init__(self):
+        # The running process's symbols include libc's; AttributeError where there is no inotify
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._directories: Dict[int, Path] = {}
+
+    def add_watch(self, directory: Path) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), str(directory))
+        self._directories[wd] = directory
+
+    def read(self, timeout: float) -> Tuple[List[Path], List[Path], bool]:
+        """Wait up to ``timeout`` seconds for events; returns (changed files, new directories, whether events were lost)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], [], False
+        changed, directories, overflowed = [], [], False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            name = data[offset + self._EVENT.size:offset + self._EVENT.size + length].rstrip(b"\0")
+            offset += self._EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+            elif mask & IN_IGNORED:
+                # The directory was removed
+                self._directories.pop(wd, None)
+            elif wd in self._directories and name:
+                path = self._directories[wd] / os.fsdecode(name)
+                if not mask & IN_ISDIR:
+                    changed.append(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    directories.append(path)
+        return changed, directories, overflowed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _is_submission(path: Path) -> bool:
+    # Dotfiles are usually partial copies (rsync, editors)
+    return path.suffix.lower() == ".pdf" and not path.name.startswith(".")
+
+
+def _signature(path: Path) -> Optional[Signature]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DirectoryWatcher:
+    """
+    Reports submission PDFs under ``root`` once they are new or changed and stable.
+
+    Every PDF already in the directory is reported once at the start. Not
+    thread-safe: call ``poll`` from one thread.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        debounce_seconds: float = DEBOUNCE_SECONDS,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+        use_inotify: bool = True
+    ):
+        self.root = Path(root)
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        # Changed files waiting to settle: path -> (signature, when it was first seen)
+        self._pending: Dict[Path, Tuple[Signature, float]] = {}
+        # Signature of each file when it was last reported
+        self._reported: Dict[Path, Signature] = {}
+        self._next_scan = 0.0
+        self._inotify: Optional[_Inotify] = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify()
+                self._watch_tree(self.root)
+            except (OSError, AttributeError) as e:
+                logger.info("inotify is unavailable (%s); rescanning %s every %gs", e, self.root, poll_interval)
+                if self._inotify is not None:
+                    self._inotify.close()
+                    self._inotify = None
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._inotify is not None else "polling"
+
+    def _watch_tree(self, directory: Path) -> None:
+        # Watch before listing, so nothing created in between is missed
+        for current, _, files in os.walk(directory):
+            self._inotify.add_watch(Path(current))
+            for name in files:
+                self._mark(Path(current) / name)
+
+    def _scan(self) -> None:
+        self._next_scan = time.monotonic() + self.poll_interval
+        for current, _, files in os.walk(self.root):
+            for name in files:
+                self._mark(Path(current) / name)
+
+    def _mark(self, path: Path) -> None:
+        """Note that ``path`` may have changed; it is reported once it has settled."""
+        if not _is_submission(path):
+            return
+        signature = _signature(path)
+        if signature is None:
+            # Removed or moved away
+            self._pending.pop(path, None)
+            self._reported.pop(path, None)
+            return
+        if self._reported.get(path) == signature:
+            self._pending.pop(path, None)
+            return
+        pending = self._pending.get(path)
+        if pending is None or pending[0] != signature:
+            self._pending[path] = (signature, time.monotonic())
+
+    def poll(self, timeout: float = 1.0) -> List[Path]:
+        """Wait up to ``timeout`` seconds for changes; return the files that have settled since the last call."""
+        if self._inotify is not None:
+            changed, directories, overflowed = self._inotify.read(timeout)
+            for directory in directories:
+                try:
+                    self._watch_tree(directory)
+                except OSError as e:
+                    logger.warning("Could not watch %s: %s", directory, e)
+            for path in changed:
+                self._mark(path)
+            if overflowed:
+                logger.warning("Missed changes in %s; rescanning", self.root)
+                self._scan()
+        else:
+            time.sleep(max(0.0, min(timeout, self._next_scan - time.monotonic())))
+            if time.monotonic() >= self._next_scan:
+                self._scan()
+
+        ready = []
+        now = time.monotonic()
+        for path, (signature, since) in list(self._pending.items()):
+            if now - since < self.debounce_seconds:
+                continue
+            # No changes seen for a while; check the file itself before reporting it
+            current = _signature(path)
+            if current is None:
+                del self._pending[path]
+            elif current != signature:
+                self._pending[path] = (current, now)
+            else:
+                del self._pending[path]
+                self._reported[path] = signature
+                ready.append(path)
+        return sorted(ready)
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
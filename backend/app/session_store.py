@@ -0,0 +1,210 @@
+"""
+Disk-backed storage for large Streamlit session values.
+
+Uploaded PDFs, extracted text and rendered results are written once to a
+content-addressed directory (by SHA-256, like the document registry) and
+session state only keeps a small ``StoredBlob`` handle. Each session may
+reference up to ``SESSION_QUOTA_BYTES``; past that its least recently used
+blobs are released. Sessions idle for ``SESSION_IDLE_SECONDS`` release
+everything, and a blob is deleted once no session references it, so memory
+and disk use follow the sessions doing work rather than every open tab.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+SESSION_DIR = Path(os.environ.get("GRADER_SESSION_DIR", Path(tempfile.gettempdir()) / "grader-sessions"))
+SESSION_QUOTA_BYTES = int(os.environ.get("GRADER_SESSION_QUOTA_BYTES", 64 * 1024 * 1024))
+SESSION_IDLE_SECONDS = int(os.environ.get("GRADER_SESSION_IDLE_SECONDS", 2 * 60 * 60))
+# Idle sessions are looked for at most this often, on the next store operation
+SWEEP_INTERVAL_SECONDS = 60
+
+
+class BlobEvicted(KeyError):
+    """Raised when a handle's blob is no longer in the store."""
+
+
+class StoredBlob(NamedTuple):
+    """Handle to bytes in the session store; cheap to keep in session state."""
+
+    digest: str
+    size: int
+    name: Optional[str] = None
+
+
+class _Session:
+    __slots__ = ("blobs", "used", "last_seen")
+
+    def __init__(self):
+        # digest -> size, least recently used first
+        self.blobs: "OrderedDict[str, int]" = OrderedDict()
+        self.used = 0
+        self.last_seen = time.time()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write ``data`` to ``path`` so concurrent readers never see a partial file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class SessionStore:
+    """
+    Content-addressed blob store with per-session quotas.
+
+    Sessions are identified by any string (the app uses an ID kept in
+    session state). Blobs are shared between sessions that store the same
+    bytes and reference-counted, so releasing one session's handle never
+    removes a blob another session still uses. Bookkeeping is in memory:
+    blobs left behind by a previous process are removed once idle.
+    """
+
+    def __init__(self, root: Path, quota_bytes: int = SESSION_QUOTA_BYTES, idle_seconds: int = SESSION_IDLE_SECONDS):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self.idle_seconds = idle_seconds
+        self._sessions: Dict[str, _Session] = {}
+        # digest -> number of sessions referencing it
+        self._refs: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+        self._orphans_removed = False
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _session(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        session.last_seen = time.time()
+        return session
+
+    def _release(self, session: _Session, digest: str) -> None:
+        session.used -= session.blobs.pop(digest)
+        self._refs[digest] -= 1
+        if self._refs[digest] == 0:
+            del self._refs[digest]
+            self._path(digest).unlink(missing_ok=True)
+
+    def put(self, session_id: str, data: bytes, name: Optional[str] = None) -> StoredBlob:
+        """
+        Store ``data`` for a session and return its handle.
+
+        If the session goes over its quota, its least recently used blobs are
+        released (never the one just stored), and their handles stop working.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        with self._lock:
+            self._sweep_if_due()
+            if digest in self._refs and path.exists():
+                os.utime(path)
+            else:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _write_atomic(path, data)
+            session = self._session(session_id)
+            if digest in session.blobs:
+                session.blobs.move_to_end(digest)
+            else:
+                session.blobs[digest] = len(data)
+                session.used += len(data)
+                self._refs[digest] = self._refs.get(digest, 0) + 1
+            while session.used > self.quota_bytes and len(session.blobs) > 1:
+                self._release(session, next(iter(session.blobs)))
+        return StoredBlob(digest, len(data), name)
+
+    def put_text(self, session_id: str, text: str, name: Optional[str] = None) -> StoredBlob:
+        """Store text (UTF-8) for a session and return its handle."""
+        return self.put(session_id, text.encode("utf-8"), name)
+
+    def exists(self, session_id: str, blob: StoredBlob) -> bool:
+        """Whether the session still holds ``blob``."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session is not None and blob.digest in session.blobs
+
+    def get(self, session_id: str, blob: StoredBlob) -> bytes:
+        """Return a blob's bytes, marking it as recently used; raises BlobEvicted if it was released."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or blob.digest not in session.blobs:
+                raise BlobEvicted(blob.digest)
+            session.blobs.move_to_end(blob.digest)
+            session.last_seen = time.time()
+            path = self._path(blob.digest)
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                raise BlobEvicted(blob.digest)
+        return path.read_bytes()
+
+    def get_text(self, session_id: str, blob: StoredBlob) -> str:
+        return self.get(session_id, blob).decode("utf-8")
+
+    def touch(self, session_id: str) -> None:
+        """Mark a session as active (the app calls this on every script run)."""
+        with self._lock:
+            self._sweep_if_due()
+            self._session(session_id)
+
+    def end_session(self, session_id: str) -> None:
+        """Release everything a session stored."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                for digest in list(session.blobs):
+                    self._release(session, digest)
+
+    def usage(self, session_id: str) -> int:
+        """Bytes currently stored for a session."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.used if session is not None else 0
+
+    def sweep(self) -> int:
+        """Release the blobs of sessions idle for ``idle_seconds``; returns the number of sessions ended."""
+        with self._lock:
+            return self._sweep()
+
+    def _sweep_if_due(self) -> None:
+        if time.monotonic() >= self._next_sweep:
+            self._sweep()
+
+    def _sweep(self) -> int:
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL_SECONDS
+        cutoff = time.time() - self.idle_seconds
+        idle = [session_id for session_id, session in self._sessions.items() if session.last_seen < cutoff]
+        for session_id in idle:
+            session = self._sessions.pop(session_id)
+            for digest in list(session.blobs):
+                self._release(session, digest)
+        if not self._orphans_removed:
+            self._remove_orphans(cutoff)
+            self._orphans_removed = True
+        return len(idle)
+
+    def _remove_orphans(self, cutoff: float) -> None:
+        # Blobs from a previous process that no one has used since the cutoff
+        if not self.root.exists():
+            return
+        for path in self.root.glob("??/*"):
+            try:
+                if path.name not in self._refs and path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+session_store = SessionStore(SESSION_DIR)
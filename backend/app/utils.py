@@ -1,38 +1,48 @@
-import PyPDF2
 import io
+import csv
 import base64
 import json
 import re
 import os
 from pathlib import Path
 import tempfile
-from typing import Optional, Dict, Any, List, BinaryIO
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from docx import Document
-from docx.shared import Inches
+from typing import Optional, Dict, Any, List, BinaryIO, Union
+import logging
 import traceback
 
+from app.json_scan import find_json_span
+from app.pdf_text import extract_in_pool, extract_pdf_text
+from app.metrics import JSON_REPAIRS, track_stage
+
+logger = logging.getLogger(__name__)
+
+# PyPDF2, ReportLab and python-docx are imported inside the functions that use
+# them so that importing this module (e.g. to serve /health) stays cheap.
+
 # PDF Processing
+@track_stage("pdf_extract")
 def extract_text_from_pdf(pdf_file: BinaryIO) -> Optional[str]:
     """Extract text from a PDF file."""
-    text = ""
     try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        if len(pdf_reader.pages) == 0:
-            raise ValueError("PDF file is empty")
-            
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if not page_text:
-                raise ValueError("Could not extract text from PDF - it may be scanned or image-based")
-            text += page_text + "\n"
-        return text
+        return extract_pdf_text(pdf_file)
+    except Exception as e:
+        error_msg = f"Error extracting text from PDF: {str(e)}"
+        logger.warning(error_msg)
+        raise ValueError(error_msg)
+
+@track_stage("pdf_extract")
+def extract_text_from_file(path: Union[str, Path]) -> str:
+    """
+    Extract text from a PDF on disk in the extraction process pool.
+
+    Blocks until the text is ready, so call it from a worker thread; several
+    threads waiting on the pool extract in parallel.
+    """
+    try:
+        return extract_in_pool(str(path)).result()
     except Exception as e:
         error_msg = f"Error extracting text from PDF: {str(e)}"
-        print(error_msg)
+        logger.warning(error_msg)
         raise ValueError(error_msg)
 
 # File Operations
@@ -53,31 +63,47 @@ def encode_file_to_base64(file_content: bytes) -> str:
 
 # JSON Parsing
 def extract_json_from_text(text: str) -> Optional[Dict[str, Any]]:
-    """Extract JSON from text response."""
-    # Try to find JSON in code blocks
-    json_match = re.search(r'```json\s*(.*?)\s*```', text, re.DOTALL)
-    if json_match:
-        json_str = json_match.group(1)
-    else:
-        # Try to find JSON without code blocks
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
-        else:
-            # If no JSON found, return None
-            return None
-    
-    try:
-        # Parse the JSON
-        return json.loads(json_str)
-    except Exception as e:
-        print(f"Error parsing JSON: {str(e)}")
+    """Extract the first JSON object from text response, repairing a truncated one."""
+    found = find_json_span(text)
+    if found is None:
         return None
+    if found.repaired:
+        JSON_REPAIRS.inc()
+        logger.warning("Repaired truncated JSON in model response")
+    return found.value
+
+# Score Calculation
+def calculate_score_breakdown(grading_feedback: Any, max_points: int = 100) -> Dict[str, Any]:
+    """Compare the reported grade with ``max_points`` (100) minus the sum of the point deductions."""
+    # Calculate total deductions
+    total_deducted = 0
+    for deduction in grading_feedback.point_deductions:
+        total_deducted += deduction.points
+    
+    # Calculate final score
+    final_score = max_points - total_deducted
+    
+    return {
+        "calculated_score": final_score,
+        "reported_score": grading_feedback.numerical_grade,
+        "discrepancy": final_score != grading_feedback.numerical_grade,
+        "total_deductions": total_deducted
+    }
 
 # Document Generation
+@track_stage("render_pdf")
 def generate_results_pdf(results: Dict[str, Any]) -> Optional[io.BytesIO]:
     """Generate a PDF of the grading results."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
     try:
+        # Convert Pydantic model to dict if needed
+        if hasattr(results, 'dict'):
+            results = results.dict()
+        
         # Create a BytesIO object to save the PDF
         pdf_buffer = io.BytesIO()
         
@@ -209,13 +235,16 @@ def generate_results_pdf(results: Dict[str, Any]) -> Optional[io.BytesIO]:
         
         return pdf_buffer
     except Exception as e:
-        print(f"Error generating PDF: {str(e)}")
+        logger.error(f"Error generating PDF: {str(e)}")
         return None
 
+@track_stage("render_docx")
 def export_to_docx(results: Dict[str, Any]) -> Optional[io.BytesIO]:
     """Export grading results to a Word document."""
+    from docx import Document
+
     try:
-        print(f"Starting DOCX generation with results: {results}")  # Debug log
+        logger.debug("Starting DOCX generation with results: %s", results)
         doc = Document()
         doc.add_heading('Assignment Grading Results', 0)
         
@@ -227,19 +256,19 @@ def export_to_docx(results: Dict[str, Any]) -> Optional[io.BytesIO]:
             results = results.dict()
         
         if 'numerical_grade' in results:
-            print(f"Processing numerical grade: {results['numerical_grade']}")  # Debug log
+            logger.debug("Processing numerical grade: %s", results['numerical_grade'])
             doc.add_paragraph(f'Grade: {results["numerical_grade"]}/100')
             
             # Overall Assessment
             doc.add_heading('Overall Assessment', level=1)
             overall_assessment = results.get('overall_assessment', 'No assessment available')
-            print(f"Processing overall assessment: {overall_assessment}")  # Debug log
+            logger.debug("Processing overall assessment: %s", overall_assessment)
             doc.add_paragraph(overall_assessment)
             
             # Strengths
             doc.add_heading('Strengths', level=1)
             strengths = results.get('strengths', [])
-            print(f"Processing strengths: {strengths}")  # Debug log
+            logger.debug("Processing strengths: %s", strengths)
             for i, strength in enumerate(strengths, 1):
                 doc.add_paragraph(f"{i}. {strength}", style='List Number')
             
@@ -247,7 +276,7 @@ def export_to_docx(results: Dict[str, Any]) -> Optional[io.BytesIO]:
             doc.add_heading('Point Deductions', level=1)
             total_deducted = 0
             deductions = results.get('point_deductions', [])
-            print(f"Processing deductions: {deductions}")  # Debug log
+            logger.debug("Processing deductions: %s", deductions)
             for i, deduction in enumerate(deductions, 1):
                 try:
                     if isinstance(deduction, dict):
@@ -270,7 +299,7 @@ def export_to_docx(results: Dict[str, Any]) -> Optional[io.BytesIO]:
                     p = doc.add_paragraph(f"{i}. {area} (-{points} points): ", style='List Number')
                     p.add_run(f"{reason}")
                 except Exception as e:
-                    print(f"Error processing deduction {i}: {str(e)}")  # Debug log
+                    logger.warning("Error processing deduction %s: %s", i, str(e))
                     doc.add_paragraph(f"{i}. {str(deduction)}", style='List Number')
             
             # Grade Calculation
@@ -287,7 +316,7 @@ def export_to_docx(results: Dict[str, Any]) -> Optional[io.BytesIO]:
             # Improvement Suggestions
             doc.add_heading('Concept Improvement Suggestions', level=1)
             improvements = results.get('concept_improvements', [])
-            print(f"Processing improvements: {improvements}")  # Debug log
+            logger.debug("Processing improvements: %s", improvements)
             for i, improvement in enumerate(improvements, 1):
                 try:
                     if isinstance(improvement, dict):
@@ -306,12 +335,12 @@ def export_to_docx(results: Dict[str, Any]) -> Optional[io.BytesIO]:
                     p = doc.add_paragraph(f"{i}. {concept}: ", style='List Number')
                     p.add_run(f"{suggestion}")
                 except Exception as e:
-                    print(f"Error processing improvement {i}: {str(e)}")  # Debug log
+                    logger.warning("Error processing improvement %s: %s", i, str(e))
                     doc.add_paragraph(f"{i}. {str(improvement)}", style='List Number')
         else:
             # Raw response
             raw_response = results.get("raw_response", "No results available")
-            print(f"Processing raw response: {raw_response}")  # Debug log
+            logger.debug("Processing raw response: %s", raw_response)
             doc.add_paragraph(raw_response)
         
         # Save to a BytesIO object
@@ -319,9 +348,58 @@ def export_to_docx(results: Dict[str, Any]) -> Optional[io.BytesIO]:
         doc.save(docx_file)
         docx_file.seek(0)
         
-        print("DOCX generation completed successfully")  # Debug log
+        logger.debug("DOCX generation completed successfully")
         return docx_file
     except Exception as e:
-        print(f"Error generating DOCX: {str(e)}")
-        print(f"Full traceback: {traceback.format_exc()}")  # Debug log
-        return None 
\ No newline at end of file
+        logger.error(f"Error generating DOCX: {str(e)}")
+        logger.debug("Full traceback: %s", traceback.format_exc())
+        return None
+
+@track_stage("render_csv")
+def export_to_csv(results: Dict[str, Any]) -> Optional[io.StringIO]:
+    """Export grading results to a CSV file."""
+    # Convert Pydantic model to dict if needed
+    if hasattr(results, 'dict'):
+        results = results.dict()
+    
+    if 'numerical_grade' not in results:
+        return None
+    
+    csv_file = io.StringIO()
+    writer = csv.writer(csv_file)
+    
+    # Write header row
+    writer.writerow(["Category", "Details"])
+    
+    # Grade
+    writer.writerow(["Grade", f"{results['numerical_grade']}/100"])
+    
+    # Overall Assessment
+    writer.writerow(["Overall Assessment", results.get('overall_assessment', '')])
+    
+    # Strengths
+    for i, strength in enumerate(results.get('strengths', []), 1):
+        writer.writerow([f"Strength {i}", strength])
+    
+    # Point Deductions
+    total_deducted = 0
+    for i, deduction in enumerate(results.get('point_deductions', []), 1):
+        area = deduction.get('area', f'Area {i}')
+        points = deduction.get('points', 0)
+        reason = deduction.get('reason', 'No reason provided')
+        total_deducted += points
+        writer.writerow([f"Deduction {i}", f"{area} (-{points} points): {reason}"])
+    
+    # Grade Calculation
+    writer.writerow(["Starting Points", "100"])
+    writer.writerow(["Total Points Deducted", f"-{total_deducted}"])
+    writer.writerow(["Final Score", f"{results['numerical_grade']}"])
+    
+    # Improvement Suggestions
+    for i, improvement in enumerate(results.get('concept_improvements', []), 1):
+        concept = improvement.get('concept', f'Concept {i}')
+        suggestion = improvement.get('suggestion', 'No suggestion provided')
+        writer.writerow([f"Improvement {i}", f"{concept}: {suggestion}"])
+    
+    csv_file.seek(0)
+    return csv_file
@@ -0,0 +1,215 @@
+"""
+Local stand-in for the Gemini ``generateContent`` REST endpoint.
+
+Point the backend at it with ``GEMINI_API_ENDPOINT=http://127.0.0.1:<port>``.
+Latency, jitter and error rate are configurable, and grading prompts are
+answered with a canned ``GradingFeedback`` JSON document so no quota is used.
+
+Run standalone:
+    python -m benchmarks.fake_gemini --port 8765 --latency 0.8 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+DEFAULT_FEEDBACK: Dict[str, Any] = {
+    "numerical_grade": 78,
+    "overall_assessment": (
+        "The submission identifies the correct ARIMA order and fits the model, "
+        "but the residual diagnostics and forecast interpretation are incomplete."
+    ),
+    "strengths": [
+        "Correctly differenced the series to achieve stationarity",
+        "Used ACF/PACF plots to justify the model order",
+        "Clear and well-organised code",
+    ],
+    "point_deductions": [
+        {"area": "Residual diagnostics", "points": 10, "reason": "Ljung-Box test not reported or interpreted."},
+        {"area": "Forecast interpretation", "points": 8, "reason": "Prediction intervals are shown but not discussed."},
+        {"area": "Model comparison", "points": 4, "reason": "AIC comparison covers only two candidate models."},
+    ],
+    "concept_improvements": [
+        {"concept": "Residual whiteness", "suggestion": "Review why uncorrelated residuals indicate an adequate fit."},
+        {"concept": "Forecast uncertainty", "suggestion": "Relate interval width to the forecast horizon."},
+    ],
+}
+
+RUBRIC_RESPONSE = (
+    "## RUBRIC IMPROVEMENT RECOMMENDATIONS\n"
+    "- Give explicit point values for each diagnostic check.\n"
+    "- Define what counts as an adequate interpretation of the forecast.\n\n"
+    "## GRADING ADVICE\n"
+    "- Check that stationarity is tested before the model order is chosen.\n"
+    "- Do not penalise alternative but justified model orders.\n"
+)
+
+# Rough token estimate used to populate usageMetadata
+CHARS_PER_TOKEN = 4
+
+ERROR_RESPONSES = [
+    (429, "RESOURCE_EXHAUSTED", "Resource has been exhausted (e.g. check quota)."),
+    (500, "INTERNAL", "An internal error has occurred."),
+    (503, "UNAVAILABLE", "The model is overloaded. Please try again later."),
+]
+
+GENERATE_PATH = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^:]+):generateContent")
+
+
+class FakeGeminiServer:
+    """A threaded HTTP server that imitates Gemini's generateContent endpoint."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.5,
+        jitter: float = 0.1,
+        error_rate: float = 0.0,
+        feedback: Optional[Dict[str, Any]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.feedback = feedback or DEFAULT_FEEDBACK
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeGeminiServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _next_outcome(self):
+        """Pick this request's delay and, if it should fail, its error."""
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            error = None
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                error = self.random.choice(ERROR_RESPONSES)
+        return delay, error
+
+    def _response_text(self, prompt: str) -> str:
+        if "RUBRIC IMPROVEMENT RECOMMENDATIONS" in prompt:
+            return RUBRIC_RESPONSE
+        return "```json\n" + json.dumps(self.feedback, indent=2) + "\n```"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                match = GENERATE_PATH.match(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not match:
+                    self._send(404, {"error": {"code": 404, "message": f"Unknown path {self.path}", "status": "NOT_FOUND"}})
+                    return
+
+                request = json.loads(body or b"{}")
+                prompt = "".join(
+                    part.get("text", "")
+                    for content in request.get("contents", [])
+                    for part in content.get("parts", [])
+                )
+                delay, error = server._next_outcome()
+                time.sleep(delay)
+
+                if error:
+                    code, status, message = error
+                    self._send(code, {"error": {"code": code, "message": message, "status": status}})
+                    return
+
+                text = server._response_text(prompt)
+                prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+                output_tokens = len(text) // CHARS_PER_TOKEN
+                self._send(200, {
+                    "candidates": [{
+                        "content": {"parts": [{"text": text}], "role": "model"},
+                        "finishReason": "STOP",
+                        "index": 0,
+                    }],
+                    "usageMetadata": {
+                        "promptTokenCount": prompt_tokens,
+                        "candidatesTokenCount": output_tokens,
+                        "totalTokenCount": prompt_tokens + output_tokens,
+                    },
+                    "modelVersion": match.group("model"),
+                })
+
+            def _send(self, code: int, payload: Dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Gemini server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Standard deviation of the latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail (0-1)")
+    parser.add_argument("--feedback", help="Path to a GradingFeedback JSON file to return for grading prompts")
+    args = parser.parse_args()
+
+    feedback = None
+    if args.feedback:
+        with open(args.feedback) as f:
+            feedback = json.load(f)
+
+    server = FakeGeminiServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        feedback=feedback,
+    )
+    print(f"Fake Gemini listening on {server.endpoint} (set GEMINI_API_ENDPOINT to this URL)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Microbenchmarks and regression gate for the per-request CPU hot paths.
+
+Commands (from backend/):
+    python -m benchmarks.micro run                   measure and print
+    python -m benchmarks.micro save                  measure and overwrite baselines.json
+    python -m benchmarks.micro compare [--threshold 0.25]
+                                                     measure and exit 1 if any case's best
+                                                     time is more than 25% slower than its baseline
+
+Use ``--filter`` to select cases by substring. Baselines are machine-specific:
+re-run ``save`` on the machine that runs ``compare`` (e.g. the CI runner) after
+an intentional performance change.
+"""
+import argparse
+import asyncio
+import io
+import json
+import platform
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict
+
+from benchmarks.fake_gemini import DEFAULT_FEEDBACK
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines.json"
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+PDF_FILES = {
+    "assignment": "arima_hw5_assignment_and_rubric.pdf",
+    "solution": "arima_hw5_solution_perfect.pdf",
+    "submission": "arima_hw5_student_Cplus.pdf",
+}
+
+# Roughly 8k output tokens at ~4 characters per token
+LARGE_RESPONSE_CHARS = 32_000
+
+
+def _large_feedback() -> dict:
+    """A GradingFeedback document padded with deductions to about 8k tokens of JSON."""
+    feedback = json.loads(json.dumps(DEFAULT_FEEDBACK))
+    template = feedback["point_deductions"][0]
+    deductions = []
+    i = 0
+    while len(json.dumps(dict(feedback, point_deductions=deductions), indent=2)) < LARGE_RESPONSE_CHARS:
+        i += 1
+        deductions.append({
+            "area": f"{template['area']} {i}",
+            "points": 1,
+            "reason": f"{template['reason']} {{see item {i}}} " * 3,
+        })
+    feedback["point_deductions"] = deductions
+    feedback["numerical_grade"] = max(0, 100 - len(deductions))
+    return feedback
+
+
+def _model_response(feedback: dict) -> str:
+    """Wrap feedback the way Gemini typically answers: prose, then a fenced JSON block."""
+    return (
+        "Here is the evaluation of the submission in the requested format.\n\n"
+        "```json\n" + json.dumps(feedback, indent=2) + "\n```\n\n"
+        "Let me know if you need anything else {for example, a rubric breakdown}."
+    )
+
+
+def build_cases() -> Dict[str, Callable[[], object]]:
+    """Return benchmark case name -> zero-argument callable."""
+    from app.models import GradingFeedback
+    from app.routers.grading import calculate_total_score
+    from app.services.ai_service import parse_grading_feedback
+    from app.utils import (
+        export_to_csv,
+        export_to_docx,
+        extract_json_from_text,
+        extract_text_from_pdf,
+        generate_results_pdf,
+    )
+
+    cases: Dict[str, Callable[[], object]] = {}
+
+    for name, filename in PDF_FILES.items():
+        content = (DATA_DIR / filename).read_bytes()
+        cases[f"extract_text_from_pdf[{name}]"] = lambda content=content: extract_text_from_pdf(io.BytesIO(content))
+
+    small_response = _model_response(DEFAULT_FEEDBACK)
+    large_response = _model_response(_large_feedback())
+    cases["extract_json_from_text[small]"] = lambda: extract_json_from_text(small_response)
+    cases["extract_json_from_text[8k_tokens]"] = lambda: extract_json_from_text(large_response)
+    cases["parse_grading_feedback[small]"] = lambda: parse_grading_feedback(small_response)
+    cases["parse_grading_feedback[8k_tokens]"] = lambda: parse_grading_feedback(large_response)
+
+    feedback = GradingFeedback(**DEFAULT_FEEDBACK)
+    cases["generate_results_pdf"] = lambda: generate_results_pdf(feedback)
+    cases["export_to_docx"] = lambda: export_to_docx(feedback)
+    cases["export_to_csv"] = lambda: export_to_csv(feedback)
+
+    loop = asyncio.new_event_loop()
+    cases["calculate_total_score"] = lambda: loop.run_until_complete(calculate_total_score(feedback))
+
+    return cases
+
+
+def measure(func: Callable[[], object], rounds: int, min_round_time: float) -> Dict[str, float]:
+    """Time ``func`` over several rounds; return best/median/mean seconds per call."""
+    func()  # warm up lazy imports and caches
+    timer = timeit.Timer(func)
+    loops = 1
+    while timer.timeit(loops) < min_round_time:
+        loops *= 2
+    per_call = [timer.timeit(loops) / loops for _ in range(rounds)]
+    return {
+        "best": min(per_call),
+        "median": statistics.median(per_call),
+        "mean": statistics.fmean(per_call),
+        "loops": loops,
+        "rounds": rounds,
+    }
+
+
+def run_cases(name_filter: str, rounds: int, min_round_time: float) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name, func in build_cases().items():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(func, rounds, min_round_time)
+        print(f"{name:<40} best {_fmt(results[name]['best'])}  median {_fmt(results[name]['median'])}", flush=True)
+    return results
+
+
+def _fmt(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:8.3f} s "
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:8.3f} ms"
+    return f"{seconds * 1e6:8.3f} us"
+
+
+def _environment() -> Dict[str, str]:
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()}
+
+
+def save(results: Dict[str, Dict[str, float]]) -> None:
+    existing = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {"cases": {}}
+    existing["environment"] = _environment()
+    existing["cases"].update(results)
+    BASELINE_PATH.write_text(json.dumps(existing, indent=2, sort_keys=True) + "\n")
+    print(f"Saved {len(results)} baselines to {BASELINE_PATH}")
+
+
+def compare(results: Dict[str, Dict[str, float]], threshold: float) -> int:
+    """Print a comparison table and return the number of regressions."""
+    if not BASELINE_PATH.exists():
+        print(f"No baselines at {BASELINE_PATH}; run 'save' first.")
+        return 1
+    baseline = json.loads(BASELINE_PATH.read_text())
+    if baseline.get("environment") != _environment():
+        print(f"Warning: baselines were recorded on {baseline.get('environment')}, "
+              f"not this machine ({_environment()}).")
+
+    regressions = 0
+    print(f"\n{'case':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        reference = baseline["cases"].get(name)
+        if reference is None:
+            print(f"{name:<40} {'-':>12} {_fmt(current['best']):>12} {'new':>8}")
+            continue
+        change = current["best"] / reference["best"] - 1
+        flag = ""
+        if change > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(f"{name:<40} {_fmt(reference['best']):>12} {_fmt(current['best']):>12} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["run", "save", "compare"])
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this string")
+    parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument("--min-round-time", type=float, default=0.2, help="Minimum seconds per round")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before compare fails")
+    args = parser.parse_args()
+
+    results = run_cases(args.filter, args.rounds, args.min_round_time)
+    if args.command == "save":
+        save(results)
+    elif args.command == "compare":
+        regressions = compare(results, args.threshold)
+        if regressions:
+            print(f"\n{regressions} case(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
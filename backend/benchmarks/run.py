@@ -0,0 +1,247 @@
+"""
+End-to-end grading benchmarks against a local fake Gemini server.
+
+Scenarios:
+    single      one grading request (after warm-up)
+    batch       N grading requests, one after another
+    concurrent  N grading requests from C concurrent clients
+    large-pdf   like concurrent, with a submission of --pages pages built from data/
+
+Targets:
+    api         the FastAPI app served by uvicorn in-process, driven over HTTP
+    service     extract_text_from_pdf + grade_assignment called directly
+
+Examples (from backend/):
+    python -m benchmarks.run single
+    python -m benchmarks.run concurrent --requests 40 --clients 8 --latency 1.0
+    python -m benchmarks.run large-pdf --pages 60 --target service --json out.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import resource
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.fake_gemini import FakeGeminiServer
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+SAMPLE_FILES = {
+    "assignment": "arima_hw5_assignment_and_rubric.pdf",
+    "solution": "arima_hw5_solution_perfect.pdf",
+    "submission": "arima_hw5_student_Cplus.pdf",
+}
+
+
+def load_documents(submission_pages: int = 0) -> Dict[str, bytes]:
+    """Load the sample PDFs, optionally replacing the submission with a large one."""
+    docs = {name: (DATA_DIR / filename).read_bytes() for name, filename in SAMPLE_FILES.items()}
+    if submission_pages:
+        docs["submission"] = build_large_pdf(submission_pages)
+    return docs
+
+
+def build_large_pdf(pages: int) -> bytes:
+    """Build a PDF of ``pages`` pages by cycling through the pages of the sample PDFs."""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    source_pages = []
+    for filename in SAMPLE_FILES.values():
+        source_pages.extend(PdfReader(str(DATA_DIR / filename)).pages)
+
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_page(source_pages[i % len(source_pages)])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ServiceTarget:
+    """Call the extraction and grading functions directly."""
+
+    name = "service"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def grade(self, docs: Dict[str, bytes]) -> bool:
+        from app.services.ai_service import grade_assignment
+        from app.utils import extract_text_from_pdf
+
+        texts = {name: extract_text_from_pdf(io.BytesIO(content)) for name, content in docs.items()}
+        grade_assignment(
+            assignment_text=texts["assignment"],
+            solution_text=texts["solution"],
+            submission_text=texts["submission"],
+            api_key="benchmark",
+        )
+        return True
+
+
+class ApiTarget:
+    """Serve the FastAPI app with uvicorn in a background thread and call it over HTTP."""
+
+    name = "api"
+
+    def __init__(self, clients: int):
+        self.port = _free_port()
+        self.clients = clients
+
+    def __enter__(self):
+        import httpx
+        import uvicorn
+        from app.main import app
+
+        # The app logs at INFO; per-request client logging would drown the report
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        self.client = httpx.Client(
+            base_url=f"http://127.0.0.1:{self.port}",
+            timeout=300,
+            limits=httpx.Limits(max_connections=self.clients),
+        )
+        return self
+
+    def __exit__(self, *exc):
+        self.client.close()
+        self.server.should_exit = True
+        self.thread.join()
+
+    def grade(self, docs: Dict[str, bytes]) -> bool:
+        files = {name: (f"{name}.pdf", content, "application/pdf") for name, content in docs.items()}
+        response = self.client.post("/api/grading/grade-assignment", files=files, data={"api_key": "benchmark"})
+        return response.status_code == 200
+
+
+def run_requests(target, docs: Dict[str, bytes], total: int, clients: int) -> Tuple[List[float], int, float]:
+    """Issue ``total`` grading requests from ``clients`` threads; return latencies, failures and wall time."""
+    def one(_):
+        start = time.perf_counter()
+        try:
+            ok = target.grade(docs)
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for latency, ok in outcomes if ok]
+    failures = sum(1 for _, ok in outcomes if not ok)
+    return latencies, failures, wall
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values``."""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in KiB on Linux and in bytes on macOS
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", choices=["single", "batch", "concurrent", "large-pdf"])
+    parser.add_argument("--target", choices=["api", "service"], default="api")
+    parser.add_argument("--requests", type=int, default=20, help="Requests to issue (batch/concurrent/large-pdf)")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients (concurrent/large-pdf)")
+    parser.add_argument("--pages", type=int, default=60, help="Submission page count for large-pdf")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed requests issued first")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake model mean latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Fake model latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake model error rate (0-1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the fake model's latency/error draws")
+    parser.add_argument("--cache", action="store_true", help="Keep the shared result cache enabled (repeats become cache hits)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    # Identical requests would otherwise be served from the result cache after the first
+    if not args.cache:
+        os.environ["GRADER_CACHE_TTL"] = "0"
+
+    total, clients, pages = {
+        "single": (1, 1, 0),
+        "batch": (args.requests, 1, 0),
+        "concurrent": (args.requests, args.clients, 0),
+        "large-pdf": (args.requests, args.clients, args.pages),
+    }[args.scenario]
+
+    docs = load_documents(submission_pages=pages)
+    rss_before = max_rss_mb()
+
+    with FakeGeminiServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, seed=args.seed
+    ) as fake:
+        os.environ["GEMINI_API_ENDPOINT"] = fake.endpoint
+        target = ApiTarget(clients) if args.target == "api" else ServiceTarget()
+        with target:
+            if args.warmup:
+                run_requests(target, docs, args.warmup, 1)
+            latencies, failures, wall = run_requests(target, docs, total, clients)
+        model_calls = fake.requests
+
+    report = {
+        "scenario": args.scenario,
+        "target": target.name,
+        "requests": total,
+        "clients": clients,
+        "submission_bytes": len(docs["submission"]),
+        "fake_latency_s": args.latency,
+        "fake_error_rate": args.error_rate,
+        "succeeded": len(latencies),
+        "failed": failures,
+        "model_calls": model_calls,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_mean_s": round(statistics.fmean(latencies), 4) if latencies else None,
+        "latency_p50_s": round(percentile(latencies, 50), 4),
+        "latency_p95_s": round(percentile(latencies, 95), 4),
+        "latency_p99_s": round(percentile(latencies, 99), 4),
+        "peak_rss_mb": round(max_rss_mb(), 1),
+        "rss_growth_mb": round(max_rss_mb() - rss_before, 1),
+    }
+
+    width = max(len(key) for key in report)
+    for key, value in report.items():
+        print(f"{key:<{width}}  {value}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ import { FaEye, FaFileDownload } from 'react-icons/fa';
 import FileUpload from '../components/FileUpload';
 import PDFViewer from '../components/PDFViewer';
 import { gradeAssignment } from '../services/gradingService';
+import { withDocuments } from '../services/documentService';
 import { loadSampleFiles, type SampleFiles } from '../services/sampleService';
 
 interface FormData {
@@ -127,19 +128,25 @@ const GradingPage: React.FC = () => {
 
     try {
       console.log('Preparing form data for submission...');
-      const formPayload = new FormData();
-      formPayload.append('api_key', formData.apiKey);
-      formPayload.append('assignment', formData.assignment);
-      formPayload.append('solution', formData.solution);
-      formPayload.append('submission', formData.submission);
-      formPayload.append('include_grading_advice', formData.includeGradingAdvice.toString());
-      
-      if (formData.includeGradingAdvice && formData.gradingAdvice) {
-        formPayload.append('grading_advice', formData.gradingAdvice);
-      }
+      // Reference documents by ID so unchanged assignment/solution PDFs are uploaded only once
+      const result = await withDocuments(
+        [formData.assignment, formData.solution, formData.submission],
+        ([assignmentId, solutionId, submissionId]) => {
+          const formPayload = new FormData();
+          formPayload.append('api_key', formData.apiKey);
+          formPayload.append('assignment_id', assignmentId);
+          formPayload.append('solution_id', solutionId);
+          formPayload.append('submission_id', submissionId);
+          formPayload.append('include_grading_advice', formData.includeGradingAdvice.toString());
+
+          if (formData.includeGradingAdvice && formData.gradingAdvice) {
+            formPayload.append('grading_advice', formData.gradingAdvice);
+          }
 
-      console.log('Submitting grading request...');
-      const result = await gradeAssignment(formPayload);
+          console.log('Submitting grading request...');
+          return gradeAssignment(formPayload);
+        }
+      );
       console.log('Received grading result:', result);
       
       // Store result in localStorage
@@ -0,0 +1,82 @@
+import axios from 'axios';
+
+const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8001/api';
+
+// Document IDs are the hex SHA-256 of the PDF bytes, computed the same way by the backend
+export const computeDocumentId = async (file: File): Promise<string> => {
+  const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map(byte => byte.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+const isRegistered = async (documentId: string): Promise<boolean> => {
+  try {
+    await axios.head(`${API_URL}/documents/${documentId}`);
+    return true;
+  } catch (error) {
+    if (axios.isAxiosError(error) && error.response?.status === 404) {
+      return false;
+    }
+    throw error;
+  }
+};
+
+const uploadDocument = async (file: File): Promise<string> => {
+  const formData = new FormData();
+  formData.append('document', file);
+  try {
+    const response = await axios.post(`${API_URL}/documents`, formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    });
+    return response.data.document_id;
+  } catch (error) {
+    if (axios.isAxiosError(error)) {
+      throw new Error(
+        `Upload of ${file.name} failed: ${error.response?.data?.detail || error.message || 'Unknown error'}`
+      );
+    }
+    throw error;
+  }
+};
+
+// Upload the file only if the backend doesn't already have it; returns its document ID
+export const ensureDocument = async (file: File): Promise<string> => {
+  const documentId = await computeDocumentId(file);
+  if (await isRegistered(documentId)) {
+    return documentId;
+  }
+  return uploadDocument(file);
+};
+
+// The backend evicts its least recently used documents past a storage cap, so a
+// document can disappear between the check in ensureDocument and its use
+export const isDocumentNotFound = (error: unknown): boolean =>
+  axios.isAxiosError(error) && error.response?.status === 404;
+
+// Run a request that references the files by document ID. If a document was
+// evicted in the meantime, upload the files again and retry once.
+export const withDocuments = async <T>(
+  files: File[],
+  request: (documentIds: string[]) => Promise<T>
+): Promise<T> => {
+  const documentIds = await Promise.all(files.map(file => ensureDocument(file)));
+  try {
+    return await request(documentIds);
+  } catch (error) {
+    if (!isDocumentNotFound(error)) {
+      throw error;
+    }
+  }
+  const uploadedIds = await Promise.all(files.map(file => uploadDocument(file)));
+  try {
+    return await request(uploadedIds);
+  } catch (error) {
+    if (axios.isAxiosError(error)) {
+      throw new Error(error.response?.data?.detail || error.message || 'Unknown error');
+    }
+    throw error;
+  }
+};
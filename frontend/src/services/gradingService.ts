@@ -1,5 +1,6 @@
 import axios from 'axios';
 import { GradingFeedback, ScoreCalculationResponse, GradingResult } from '../types/grading';
+import { isDocumentNotFound } from './documentService';
 
 const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8001/api';
 
@@ -14,6 +15,10 @@ export const gradeAssignment = async (formData: FormData): Promise<GradingFeedba
     console.log('Grading response:', response.data);
     return response.data;
   } catch (error) {
+    if (isDocumentNotFound(error)) {
+      // Left as is so withDocuments can upload the documents again and retry
+      throw error;
+    }
     console.error('Detailed grading error:', error);
     if (axios.isAxiosError(error)) {
       console.error('API Error Response:', error.response?.data);
@@ -0,0 +1,97 @@
+"""Report import-time cost for the Streamlit app and the FastAPI backend.
+
+Each entry point is imported in a fresh interpreter with ``-X importtime`` so the
+numbers reflect a cold start. For ``app.py`` only the module-level import
+statements are executed (running the whole script needs a Streamlit session).
+
+Usage:
+    python scripts/import_report.py [--top 15] [--check]
+
+With ``--check`` the script exits non-zero if any of the heavy dependencies
+that should be loaded lazily are pulled in at import time.
+"""
+import argparse
+import ast
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must only be imported when their pipeline stage first runs
+HEAVY_MODULES = ["google.generativeai", "reportlab", "docx", "PyPDF2", "pandas"]
+
+
+def streamlit_import_source() -> str:
+    """Return the module-level import statements of app.py as source code."""
+    tree = ast.parse((ROOT / "app.py").read_text())
+    imports = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(node) for node in imports)
+
+
+ENTRY_POINTS = {
+    "streamlit (app.py)": (ROOT, streamlit_import_source),
+    # Frameworks are imported first so that app.main's row shows only our own cost
+    "backend (app.main)": (ROOT / "backend", lambda: "import pydantic\nimport fastapi\nimport app.main"),
+    # A single worker in the backend image: PROMETHEUS_MULTIPROC_DIR is set, but
+    # app.serve hasn't created it
+    "backend (app.main, PROMETHEUS_MULTIPROC_DIR set)": (ROOT / "backend", lambda: (
+        "import os, tempfile\n"
+        "os.environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(tempfile.mkdtemp(), 'metrics')\n"
+        "import pydantic\nimport fastapi\nimport app.main"
+    )),
+}
+
+
+def measure(cwd: Path, source: str):
+    """Import ``source`` in a fresh interpreter and return (timings, loaded heavy modules)."""
+    probe = (
+        f"{source}\n"
+        "import sys\n"
+        f"print('\\n'.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        # Nested imports are indented; only top-level entries add up to the total
+        if len(name) - len(name.lstrip(" ")) == 1:
+            timings[name.strip()] = int(cumulative_us)
+    loaded = [m for m in proc.stdout.splitlines() if m]
+    return timings, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to show")
+    parser.add_argument("--check", action="store_true", help="Fail if a heavy module is imported eagerly")
+    args = parser.parse_args()
+
+    failed = False
+    for label, (cwd, source_fn) in ENTRY_POINTS.items():
+        timings, loaded = measure(cwd, source_fn())
+        total_ms = sum(timings.values()) / 1000
+        print(f"== {label}: {total_ms:.1f} ms")
+        for name, us in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+            print(f"   {us / 1000:9.1f} ms  {name}")
+        if loaded:
+            print(f"   eagerly loaded heavy modules: {', '.join(loaded)}")
+            failed = True
+        print()
+
+    if args.check and failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()